@@ -0,0 +1,180 @@
+import argparse
+import json
+import os
+from dataclasses import asdict
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+import backend_logic
+from customer_table import as_plain
+from investigation import MAX_TOP
+import metrics
+
+# HTTP service over backend_logic. Each uvicorn worker is its own process with
+# its own storage connections, LLM connection pool, verdict cache and threat
+# stream; the SQLite database (and the verdict cache's SQLite tier) are shared.
+#
+#   python api.py --workers 4 --port 8000
+#   REGUFLOW_API_URL=http://127.0.0.1:8000 streamlit run app.py
+
+app = FastAPI(title="ReguFlow API")
+
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    # reguflow_stage_seconds{stage="http",route="/send-message"}; the route
+    # template (not the raw path) keeps agent ids out of the label set.
+    # Streaming responses are timed up to their headers.
+    if not metrics.METRICS_ENABLED:
+        return await call_next(request)
+    with metrics.span("http") as span:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        span.labels = {"route": getattr(route, "path", "unmatched"), "method": request.method}
+    return response
+
+
+# --- REQUEST BODIES ---
+class LoginRequest(BaseModel):
+    email: str
+    password: str
+
+class MessageRequest(BaseModel):
+    agent_id: str
+    ticket_id: str
+    message: str
+
+# actor is taken from the caller as-is and written to the audit trail. The API
+# has no sessions to derive it from, so it is a claim, not an identity: keep
+# the admin routes behind something that authenticates (reverse proxy, VPN).
+class BanRequest(BaseModel):
+    user_ids: list[str]
+    actor: str = "admin"
+
+class MutationRequest(BaseModel):
+    changes: list[dict]
+    actor: str
+    reason: str = None
+
+
+def _or_error(result, status_code):
+    # backend_logic reports failures as {"status": "error", ...} dicts
+    if result.get("status") == "error":
+        return JSONResponse(result, status_code=status_code)
+    return result
+
+
+# --- AUTH ---
+@app.post("/login")
+async def login(body: LoginRequest):
+    return _or_error(backend_logic.login_logic(body.email, body.password), 401)
+
+
+# --- DATA ---
+@app.get("/customers")
+async def customers(field: str = None, value: str = None):
+    # ?field=ip&value=1.2.3.4 -> indexed lookup instead of the whole ledger
+    if field:
+        try:
+            return await run_in_threadpool(backend_logic.find_customers_logic, field, value)
+        except KeyError as e:
+            raise HTTPException(400, str(e.args[0]))
+    customers = await run_in_threadpool(backend_logic.get_customers_logic)
+    return await run_in_threadpool(as_plain, customers)
+
+@app.get("/agents")
+async def agents():
+    return await run_in_threadpool(backend_logic.get_agents_logic)
+
+@app.get("/version/{key}")
+async def version(key: str):
+    if key not in ("customers", "agents") and not key.startswith("transcript:"):
+        raise HTTPException(404, f"Unknown data key '{key}'")
+    return {"key": key, "version": await run_in_threadpool(backend_logic.data_version_logic, key)}
+
+@app.get("/agents/{agent_id}/transcript")
+async def transcript(agent_id: str, n: int = 200):
+    return await run_in_threadpool(backend_logic.get_transcript_logic, agent_id, n)
+
+
+# --- CHAT ---
+@app.post("/send-message")
+async def send_message(body: MessageRequest):
+    return await backend_logic.send_message_async(body.agent_id, body.ticket_id, body.message)
+
+@app.post("/send-message/stream")
+async def send_message_stream(body: MessageRequest):
+    # NDJSON: {"token": ...} per reply delta, then {"result": {...}} last
+    stream = await run_in_threadpool(backend_logic.send_message_stream_logic,
+                                     body.agent_id, body.ticket_id, body.message)
+
+    def lines():
+        # close() in finally: a client that disconnects mid-reply still gets
+        # its message recorded
+        with stream:
+            for token in stream:
+                yield json.dumps({"token": token}) + "\n"
+        yield json.dumps({"result": stream.result}) + "\n"
+    return StreamingResponse(iterate_in_threadpool(lines()), media_type="application/x-ndjson")
+
+
+# --- RISK FEED / INVESTIGATOR ---
+@app.get("/threats")
+async def threats():
+    found = await run_in_threadpool(backend_logic.detect_threats_logic)
+    return [asdict(t) for t in found]
+
+@app.get("/investigation")
+async def investigation(top: int = Query(20, ge=1, le=MAX_TOP), cursor: str = None, expand: str = None):
+    result = await run_in_threadpool(backend_logic.get_investigation_data_logic,
+                                     None, top, cursor, expand)
+    return _or_error(result, 404 if expand else 400)
+
+
+# --- ADMIN ACTIONS ---
+@app.post("/agents/{agent_id}/unlock")
+async def unlock(agent_id: str, actor: str = "admin"):
+    return _or_error(await run_in_threadpool(backend_logic.unlock_agent_logic, agent_id, actor), 404)
+
+@app.post("/ban")
+async def ban(body: BanRequest):
+    return await run_in_threadpool(backend_logic.ban_users_logic, body.user_ids, body.actor)
+
+@app.post("/mutations")
+async def mutations(body: MutationRequest):
+    # Atomic batch: every change applies (and is audited) or none does
+    result = await run_in_threadpool(backend_logic.apply_mutations_logic, body.changes, body.actor, body.reason)
+    return _or_error(result, 400)
+
+@app.get("/audit")
+async def audit(limit: int = 100):
+    return await run_in_threadpool(backend_logic.get_audit_logic, limit)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint(format: str = "prometheus"):
+    # Per worker process: with --workers N each scrape lands on one of them
+    if format == "json":
+        return JSONResponse({"pid": os.getpid(), **metrics.snapshot()})
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "storage": backend_logic.get_storage().name, "pid": os.getpid()}
+
+
+def main():
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Run the ReguFlow API under uvicorn.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("REGUFLOW_API_WORKERS", "2")))
+    args = parser.parse_args()
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
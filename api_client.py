@@ -0,0 +1,161 @@
+import json
+import os
+import threading
+
+import requests
+
+from detection import Threat
+
+# Drop-in stand-in for backend_logic that talks to api.py over HTTP.
+# app.py picks it when REGUFLOW_API_URL is set, so the same UI code runs
+# against a separately scaled compliance service.
+
+API_URL = os.getenv("REGUFLOW_API_URL", "http://127.0.0.1:8000").rstrip("/")
+API_TIMEOUT = float(os.getenv("REGUFLOW_API_TIMEOUT", "60"))
+
+# One pooled session per Streamlit script thread (requests.Session isn't thread-safe)
+_local = threading.local()
+
+def _session():
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+def _result(r):
+    # backend_logic's {"status": "error", ...} dicts come back with a 4xx and
+    # are returned as-is, like in-process; any other failure raises
+    if not r.ok:
+        try:
+            body = r.json()
+        except ValueError:
+            body = None
+        if isinstance(body, dict) and body.get("status") == "error":
+            return body
+        r.raise_for_status()
+    return r.json()
+
+def _get(path, **params):
+    return _result(_session().get(f"{API_URL}{path}", params=params, timeout=API_TIMEOUT))
+
+def _post(path, payload=None):
+    return _result(_session().post(f"{API_URL}{path}", json=payload, timeout=API_TIMEOUT))
+
+
+# --- SAME SIGNATURES AS backend_logic ---
+def login_logic(email, password):
+    return _post("/login", {"email": email, "password": password})
+
+def get_customers_logic():
+    return _get("/customers")
+
+def find_customers_logic(field, value):
+    return _get("/customers", field=field, value=value)
+
+def get_agents_logic():
+    return _get("/agents")
+
+def data_version_logic(key):
+    return _get(f"/version/{key}")["version"]
+
+def get_transcript_logic(agent_id, n=200):
+    return _get(f"/agents/{agent_id}/transcript", n=n)
+
+def detect_threats_logic():
+    return [Threat(**t) for t in _get("/threats")]
+
+def get_investigation_data_logic(customers=None, top=20, cursor=None, expand=None):
+    # The service only investigates its own ledger
+    if customers is not None:
+        raise ValueError("get_investigation_data_logic over HTTP can't take a customers dict")
+    params = {"top": top}
+    if cursor:
+        params["cursor"] = cursor
+    if expand:
+        params["expand"] = expand
+    return _get("/investigation", **params)
+
+def send_message_logic(agent_id, ticket_id, message):
+    return _post("/send-message", {"agent_id": agent_id, "ticket_id": ticket_id, "message": message})
+
+def unlock_agent_logic(agent_id, actor="admin"):
+    return _result(_session().post(f"{API_URL}/agents/{agent_id}/unlock", params={"actor": actor},
+                                   timeout=API_TIMEOUT))
+
+def ban_users_logic(user_ids_list, actor="admin"):
+    return _post("/ban", {"user_ids": list(user_ids_list), "actor": actor})
+
+def override_risk_logic(user_ids_list, risk_score, actor="admin"):
+    return apply_mutations_logic([{"op": "override_risk", "user_ids": list(user_ids_list),
+                                   "risk_score": risk_score}], actor)
+
+def apply_mutations_logic(changes, actor="admin", reason=None):
+    return _post("/mutations", {"changes": changes, "actor": actor, "reason": reason})
+
+def get_audit_logic(limit=100):
+    return _get("/audit", limit=limit)
+
+
+class HttpReplyStream:
+    # Same contract as backend_logic.ReplyStream: iterate for tokens, then read
+    # .result; close() (or the context manager) releases the connection, which
+    # also happens by itself once the last line is read or parsing fails
+    def __init__(self, response, result=None):
+        self._response = response
+        self.result = result
+        self._first = None
+        if result is not None:
+            self.close()
+            return
+        self._lines = response.iter_lines(decode_unicode=True)
+        # The first line is either a token (approved) or the final result (blocked / held / locked)
+        try:
+            for line in self._lines:
+                if line:
+                    event = json.loads(line)
+                    if "result" in event:
+                        self.result = event["result"]
+                        self.close()
+                    else:
+                        self._first = event["token"]
+                    break
+        except BaseException:
+            self.close()
+            raise
+
+    def __iter__(self):
+        if self._first is None:
+            return
+        try:
+            yield self._first
+            self._first = None
+            for line in self._lines:
+                if not line:
+                    continue
+                event = json.loads(line)
+                if "result" in event:
+                    self.result = event["result"]
+                    return
+                yield event["token"]
+        finally:
+            self.close()
+
+    def close(self):
+        self._response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def send_message_stream_logic(agent_id, ticket_id, message):
+    r = _session().post(f"{API_URL}/send-message/stream", stream=True, timeout=API_TIMEOUT,
+                        json={"agent_id": agent_id, "ticket_id": ticket_id, "message": message})
+    if not r.ok:
+        # Same handling as _get/_post: error dicts are results, anything else raises
+        try:
+            return HttpReplyStream(r, result=_result(r))
+        finally:
+            r.close()
+    return HttpReplyStream(r)
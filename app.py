@@ -1,6 +1,18 @@
+import os
 import streamlit as st
 import time
-import backend_logic  
+from streamlit.errors import StreamlitAPIException
+
+# REGUFLOW_API_URL set -> talk to the FastAPI service (api.py) over HTTP;
+# otherwise run the compliance engine in-process as before
+if os.getenv("REGUFLOW_API_URL"):
+    import api_client as backend_logic
+else:
+    import backend_logic
+    # In-process engine -> expose its metrics on a side port (once per process)
+    if os.getenv("REGUFLOW_METRICS_PORT"):
+        import metrics
+        metrics.serve(int(os.getenv("REGUFLOW_METRICS_PORT")))
 
 st.set_page_config(page_title="ReguFlow AEGIS", page_icon="🛡️", layout="wide")
 
@@ -68,13 +80,56 @@ def login_view():
                 else:
                     st.error("Invalid Credentials")
 
+# --- CACHED READS ---
+# Keyed on the storage's data version, which every write bumps: reruns with no
+# intervening write reuse the last result instead of reloading / rescanning.
+OVERWATCH_REFRESH = float(os.getenv("REGUFLOW_OVERWATCH_REFRESH", "5")) or None  # seconds, 0 = off
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_agents(version):
+    return backend_logic.get_agents_logic()
+
+@st.cache_data(show_spinner="AEGIS AI scanning transaction vectors...", max_entries=4)
+def load_threats(version):
+    # All detectors, one pass over the ledger - only when the customers changed
+    return backend_logic.detect_threats_logic()
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def load_transcript(agent_id, version):
+    return backend_logic.get_transcript_logic(agent_id)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def render_chat_html(agent_id, ticket_id, version):
+    ticket = load_agents(version)[agent_id]["tickets"][ticket_id]
+    chat_html = '<div class="chat-container">'
+    for msg in ticket["history"]:
+        role_class = "agent" if msg["role"] == "agent" else "customer"
+
+        # If message was blocked, show it differently
+        if msg.get("blocked"):
+            chat_html += f'<div class="bubble agent" style="background-color: #444; color: #ff444f; border: 1px solid red;">🚫 BLOCKED: {msg["text"]}</div>'
+        else:
+            chat_html += f'<div class="bubble {role_class}">{msg["text"]}</div>'
+    chat_html += '</div>'
+    return chat_html
+
+def current_agents():
+    return load_agents(backend_logic.data_version_logic("agents"))
+
+def rerun_panel():
+    # Redraw only the fragment we're in; on a full-page run fall back to the whole page
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+
 def agent_dashboard():
     user = st.session_state.user
     
-    # 1. FETCH LATEST DATA DIRECTLY
+    # 1. FETCH LATEST DATA (cached until the next write)
     try:
-        all_agents = backend_logic.get_agents_logic()
-        my_data = all_agents.get(user["id"])
+        my_data = current_agents().get(user["id"])
     except Exception as e:
         st.error(f"Data Sync Error: {e}")
         return
@@ -94,64 +149,88 @@ def agent_dashboard():
     
     # --- LEFT COLUMN: TICKET LIST ---
     with col_list:
-        st.markdown("### 📥 Active Tickets")
-        tickets = my_data.get("tickets", {})
-        
-        # Create a selection list
-        ticket_options = list(tickets.keys())
-        # Helper to show nice names in the radio button
-        def format_ticket(tid):
-            t = tickets[tid]
-            return f"{t['customer_name']} (Risk: {t['risk_score']})"
-            
-        selected_tid = st.radio("Select Chat:", ticket_options, format_func=format_ticket)
-        
-        st.divider()
-        if st.button("Logout"):
-            st.session_state.user = None
-            st.rerun()
+        tickets_panel(user)
 
     # --- RIGHT COLUMN: CHAT WINDOW ---
     with col_chat:
-        if selected_tid:
-            current_ticket = tickets[selected_tid]
-            
-            # Header
-            st.info(f"Talking to: **{current_ticket['customer_name']}**")
+        chat_pane(user)
+
+@st.fragment
+def tickets_panel(user):
+    st.markdown("### 📥 Active Tickets")
+    tickets = current_agents()[user["id"]].get("tickets", {})
+    
+    # Create a selection list
+    ticket_options = list(tickets.keys())
+    # Helper to show nice names in the radio button
+    def format_ticket(tid):
+        t = tickets[tid]
+        return f"{t['customer_name']} (Risk: {t['risk_score']})"
+        
+    selected_tid = st.radio("Select Chat:", ticket_options, format_func=format_ticket)
+    previous = st.session_state.get("selected_tid")
+    st.session_state.selected_tid = selected_tid
+    if previous is not None and previous != selected_tid:
+        # The chat pane is its own fragment - switching tickets redraws the page once
+        st.rerun()
+    
+    st.divider()
+    if st.button("Logout"):
+        st.session_state.user = None
+        st.session_state.selected_tid = None
+        st.rerun()
+
+@st.fragment
+def chat_pane(user):
+    # Sending a message reruns only this pane
+    selected_tid = st.session_state.get("selected_tid")
+    if not selected_tid:
+        return
+    version = backend_logic.data_version_logic("agents")
+    agent = load_agents(version)[user["id"]]
+    if agent["status"] == "LOCKED":
+        st.rerun()  # locked by the last message -> whole page switches to the suspended screen
+    current_ticket = agent["tickets"][selected_tid]
+    
+    # Header
+    st.info(f"Talking to: **{current_ticket['customer_name']}**")
+    
+    # Chat Container (HTML rebuilt only when the agents data changed)
+    st.markdown(render_chat_html(user["id"], selected_tid, version), unsafe_allow_html=True)
+
+    # Input Area
+    with st.form("chat_form", clear_on_submit=True):
+        user_msg = st.text_input("Reply...")
+        submitted = st.form_submit_button("Send")
+        
+        if submitted and user_msg:
+            with st.spinner("Checking compliance..."):
+                # DIRECT LOGIC CALL (returns once the message is judged)
+                stream = backend_logic.send_message_stream_logic(
+                    agent_id=user["id"], 
+                    ticket_id=selected_tid, 
+                    message=user_msg
+                )
+
+            # Approved -> show the customer's reply token by token as it arrives
+            with stream:
+                if stream.result is None:
+                    st.markdown(f'<div class="chat-container"><div class="bubble agent">{user_msg}</div></div>', unsafe_allow_html=True)
+                    reply_box = st.empty()
+                    reply_text = ""
+                    for token in stream:
+                        reply_text += token
+                        reply_box.markdown(f'<div class="chat-container"><div class="bubble customer">{reply_text}▌</div></div>', unsafe_allow_html=True)
+            res = stream.result
+
+            if res["status"] == "VIOLATION":
+                st.toast(f"❌ BLOCKED: {res['reason']}")
+            elif res["status"] == "HELD":
+                st.toast(f"⏸️ HELD: {res['reason']}")
+            elif res["status"] == "LOCKED":
+                st.error("LOCKED")
             
-            # Chat Container
-            chat_html = '<div class="chat-container">'
-            for msg in current_ticket["history"]:
-                role_class = "agent" if msg["role"] == "agent" else "customer"
-                
-                # If message was blocked, show it differently
-                if msg.get("blocked"):
-                    chat_html += f'<div class="bubble agent" style="background-color: #444; color: #ff444f; border: 1px solid red;">🚫 BLOCKED: {msg["text"]}</div>'
-                else:
-                    chat_html += f'<div class="bubble {role_class}">{msg["text"]}</div>'
-            chat_html += '</div>'
-            st.markdown(chat_html, unsafe_allow_html=True)
-
-            # Input Area
-            with st.form("chat_form", clear_on_submit=True):
-                user_msg = st.text_input("Reply...")
-                submitted = st.form_submit_button("Send")
-                
-                if submitted and user_msg:
-                    with st.spinner("Sending..."):
-                        # DIRECT LOGIC CALL
-                        res = backend_logic.send_message_logic(
-                            agent_id=user["id"], 
-                            ticket_id=selected_tid, 
-                            message=user_msg
-                        )
-                        
-                        if res["status"] == "VIOLATION":
-                            st.toast(f"❌ BLOCKED: {res['reason']}")
-                        elif res["status"] == "LOCKED":
-                            st.error("LOCKED")
-                        
-                        st.rerun() 
+            rerun_panel()
 
 def admin_dashboard():
     st.title("👮 Supervisor HQ - AEGIS Core")
@@ -160,136 +239,88 @@ def admin_dashboard():
     
     # --- TAB 1: THE INTELLIGENT FEED ---
     with tab1:
-        st.subheader("Detected Financial Crime Patterns")
-        
-        with st.spinner("AEGIS AI scanning transaction vectors..."):
-            try:
-                # DIRECT DATA FETCH
-                customers = backend_logic.get_customers_logic()
-                
-                # Filter out banned users
-                customers = {uid: u for uid, u in customers.items() if u["status"] != "BANNED"}
-                detected_threats = []
-
-                # --- DETECTION 1: IP SYNDICATE ---
-                ip_counts = {}
-                for uid, u in customers.items():
-                    ip_counts[u["ip"]] = ip_counts.get(u["ip"], []) + [u]
-                
-                for ip, users in ip_counts.items():
-                    if len(users) > 3: 
-                        detected_threats.append({
-                            "title": f"Syndicate Ring (Shared IP)",
-                            "desc": f"IP: {ip}",
-                            "users": users,
-                            "severity": "High",
-                            "color": "red"
-                        })
-
-                # --- DETECTION 2: SMURFING / STRUCTURING ---
-                smurfs = [u for uid, u in customers.items() if 9800 <= u["deposit_amount"] < 10000]
-                if len(smurfs) > 2:
-                    detected_threats.append({
-                        "title": "Structuring / Smurfing Ring",
-                        "desc": "Pattern: Multiple deposits just under $10k threshold.",
-                        "users": smurfs,
-                        "severity": "Medium",
-                        "color": "orange"
-                    })
-
-                # --- DETECTION 3: IMPOSSIBLE TRAVEL ---
-                travelers = [u for uid, u in customers.items() if "->" in u.get("last_login_location", "")]
-                if travelers:
-                    detected_threats.append({
-                        "title": "Impossible Travel Event",
-                        "desc": "User logged in from two distant countries in < 5 mins.",
-                        "users": travelers,
-                        "severity": "Critical",
-                        "color": "red"
-                    })
-
-                # --- DETECTION 4: BOT SWARM ---
-                time_counts = {}
-                for uid, u in customers.items():
-                    t = u.get("last_login_time")
-                    time_counts[t] = time_counts.get(t, []) + [u]
-                
-                for t, users in time_counts.items():
-                    if len(users) > 4: 
-                        detected_threats.append({
-                            "title": "High-Frequency Botnet",
-                            "desc": f"Timestamp Match: {t} (Precision: 1ms)",
-                            "users": users,
-                            "severity": "High",
-                            "color": "red"
-                        })
-
-                # --- RENDER CARDS ---
-                if not detected_threats:
-                    st.success("No threats detected.")
-                else:
-                    for threat in detected_threats:
-                        c = threat["color"]
-                        with st.container():
-                            st.markdown(f"""
-                            <div style="border-left: 5px solid {c}; background-color: #1e1e1e; padding: 15px; margin-bottom: 10px; border-radius: 5px;">
-                                <h3 style="margin:0; color: white;">⚠️ {threat['title']}</h3>
-                                <p style="margin:0; color: #aaa;">{threat['desc']}</p>
-                            </div>
-                            """, unsafe_allow_html=True)
-                            
-                            with st.expander(f"View {len(threat['users'])} Linked Accounts"):
-                                for u in threat['users']:
-                                    st.code(f"USER: {u['name']} | DEPOSIT: ${u['deposit_amount']} | LOC: {u.get('last_login_location', 'N/A')}")
-                                
-                                ids_to_ban = [u["id"] for u in threat['users']]
-                                
-                                if st.button(f"🚨 NEUTRALIZE THREAT", key=f"ban_{threat['title']}"):
-                                    with st.spinner("Executing Kill Chain..."):
-                                        # DIRECT LOGIC CALL
-                                        backend_logic.ban_users_logic(ids_to_ban)
-                                        
-                                        st.toast(f"🚫 {len(ids_to_ban)} Accounts Frozen.", icon="❄️")
-                                        time.sleep(1.0) 
-                                        st.rerun()
-
-            except Exception as e:
-                st.error(f"Scan Error: {e}")
+        risk_feed()
 
     # --- TAB 2: TEAM OVERWATCH ---
     with tab2:
-        st.subheader("Live Agent Governance")
-        try:
-            # DIRECT DATA FETCH
-            agents = backend_logic.get_agents_logic()
-            
-            for aid, data in agents.items():
-                status_icon = "🔒" if data["status"] == "LOCKED" else "🟢"
-                with st.expander(f"{status_icon} {data['name']}", expanded=(data["status"] == "LOCKED")):
-                    c1, c2 = st.columns([2, 1])
-                    with c1:
-                        st.markdown("**📜 Full Chat Transcript:**")
-                        chat_log = "\n".join(data.get("transcript", ["No chat history yet."]))
-                        st.text_area("Logs", chat_log, height=150, disabled=True, key=f"log_{aid}")
-                    with c2:
-                        st.markdown("**Action Panel:**")
-                        if data.get("history"): st.error(f"Last Violation: {data['history'][-1]}")
-                        if data["status"] == "LOCKED":
-                            if st.button("🔓 UNLOCK AGENT", key=f"btn_{aid}"):
-                                # DIRECT LOGIC CALL
-                                backend_logic.unlock_agent_logic(aid)
-                                
-                                st.success("Unlocked!")
-                                time.sleep(0.5) 
-                                st.rerun()
-        except Exception as e:
-            st.error(f"Sync Error: {e}")
+        overwatch()
 
     st.divider()
     if st.button("Logout", key="logout_admin"):
         st.session_state.user = None
         st.rerun()
 
+@st.fragment
+def risk_feed():
+    st.subheader("Detected Financial Crime Patterns")
+    
+    try:
+        # Cached per customers version: unlocking an agent never rescans the ledger
+        detected_threats = load_threats(backend_logic.data_version_logic("customers"))
+
+        # --- RENDER CARDS ---
+        if not detected_threats:
+            st.success("No threats detected.")
+        else:
+            for threat in detected_threats:
+                c = threat.color
+                with st.container():
+                    st.markdown(f"""
+                    <div style="border-left: 5px solid {c}; background-color: #1e1e1e; padding: 15px; margin-bottom: 10px; border-radius: 5px;">
+                        <h3 style="margin:0; color: white;">⚠️ {threat.title}</h3>
+                        <p style="margin:0; color: #aaa;">{threat.desc}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+                    
+                    with st.expander(f"View {len(threat.users)} Linked Accounts"):
+                        for u in threat.users:
+                            st.code(f"USER: {u['name']} | DEPOSIT: ${u['deposit_amount']} | LOC: {u.get('last_login_location', 'N/A')}")
+                        
+                        ids_to_ban = threat.user_ids
+                        
+                        if st.button(f"🚨 NEUTRALIZE THREAT", key=f"ban_{threat.id}"):
+                            with st.spinner("Executing Kill Chain..."):
+                                # DIRECT LOGIC CALL
+                                backend_logic.ban_users_logic(ids_to_ban, actor=st.session_state.user["id"])
+                                
+                                st.toast(f"🚫 {len(ids_to_ban)} Accounts Frozen.", icon="❄️")
+                                time.sleep(1.0) 
+                                rerun_panel()
+
+    except Exception as e:
+        st.error(f"Scan Error: {e}")
+
+@st.fragment(run_every=OVERWATCH_REFRESH)
+def overwatch():
+    # Polls on its own; each poll is a version check unless something changed
+    st.subheader("Live Agent Governance")
+    try:
+        agents = current_agents()
+        
+        for aid, data in agents.items():
+            status_icon = "🔒" if data["status"] == "LOCKED" else "🟢"
+            with st.expander(f"{status_icon} {data['name']}", expanded=(data["status"] == "LOCKED")):
+                c1, c2 = st.columns([2, 1])
+                with c1:
+                    st.markdown("**📜 Recent Chat Transcript:**")
+                    log_version = backend_logic.data_version_logic(f"transcript:{aid}")
+                    chat_log = "\n".join(load_transcript(aid, log_version) or ["No chat history yet."])
+                    # Key carries the version so the box refreshes when new lines arrive
+                    st.text_area("Logs", chat_log, height=150, disabled=True, key=f"log_{aid}_{log_version}")
+                with c2:
+                    st.markdown("**Action Panel:**")
+                    if data.get("history"): st.error(f"Last Violation: {data['history'][-1]}")
+                    if data["status"] == "LOCKED":
+                        if st.button("🔓 UNLOCK AGENT", key=f"btn_{aid}"):
+                            # DIRECT LOGIC CALL
+                            backend_logic.unlock_agent_logic(aid, actor=st.session_state.user["id"])
+                            
+                            st.success("Unlocked!")
+                            time.sleep(0.5) 
+                            rerun_panel()
+    except Exception as e:
+        st.error(f"Sync Error: {e}")
+
 # ================= ROUTER =================
 if st.session_state.user is None:
     login_view()
@@ -0,0 +1,237 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import tempfile
+import time
+from itertools import islice
+
+import backend_logic
+from llm_client import LLMUnavailable, run_async
+from storage import get_storage
+
+# Re-judges historical agent traffic against the CURRENT compliance prompt and
+# reports where the new verdict differs from what was recorded at the time.
+# Read-only: never locks agents, adds strikes or writes to tickets.
+
+BATCH_PROMPT_SUFFIX = """
+    You will receive a JSON array of agent messages, each {"id": str, "text": str}.
+    Judge EACH message independently with the rules above.
+    Output JSON only: {"verdicts": [{"id": str, "is_violation": bool, "severity": "HIGH"|"LOW", "reason": str}, ...]}
+    """
+
+TRANSCRIPT_AGENT_LINE = re.compile(r"^\[[^\]]*\] \[Ticket: [^\]]*\] AGENT: (.*)$")
+
+
+# --- MESSAGE SOURCES (generators, one message at a time) ---
+def iter_ticket_messages(agents, agent_filter=None):
+    for aid, agent in agents.items():
+        if agent_filter and aid != agent_filter:
+            continue
+        for tid, ticket in agent.get("tickets", {}).items():
+            for i, msg in enumerate(ticket.get("history", [])):
+                if msg["role"] == "agent":
+                    yield {"id": f"{aid}/{tid}/{i}", "text": msg["text"], "recorded_violation": bool(msg.get("blocked"))}
+
+def iter_transcript_messages(agents, agent_filter=None):
+    # Streams the segment log; one line of lookahead tells whether the message was blocked
+    storage = get_storage()
+    for aid in agents:
+        if agent_filter and aid != agent_filter:
+            continue
+        pending = None  # (index, agent text) waiting for its next line
+        for i, line in enumerate(storage.iter_transcript(aid)):
+            if pending:
+                yield {"id": f"{aid}/transcript/{pending[0]}", "text": pending[1],
+                       "recorded_violation": line.startswith("❌ BLOCKED")}
+                pending = None
+            m = TRANSCRIPT_AGENT_LINE.match(line)
+            if m:
+                pending = (i, m.group(1))
+        if pending:
+            yield {"id": f"{aid}/transcript/{pending[0]}", "text": pending[1], "recorded_violation": False}
+
+def iter_messages(agents, source, agent_filter=None):
+    if source in ("tickets", "all"):
+        yield from iter_ticket_messages(agents, agent_filter)
+    if source in ("transcripts", "all"):
+        yield from iter_transcript_messages(agents, agent_filter)
+
+def batched(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# --- CHECKPOINT (append-only JSONL of finished verdicts) ---
+# Rows carry the judge version, so a checkpoint from an older prompt is ignored.
+# Only diffs are kept whole; agreeing rows map to None (id only).
+def load_checkpoint(path, version):
+    done = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    row = json.loads(line)
+                    if row.get("version") == version:
+                        done[row["id"]] = row if is_diff(row) else None
+    return done
+
+
+# --- REPORT (counters in memory, diff rows spilled to a temp file) ---
+def is_diff(row):
+    return row["new_violation"] != row["recorded_violation"]
+
+class AuditReport:
+    def __init__(self, path):
+        self.path = path
+        self.judged = self.newly_flagged = self.newly_cleared = 0
+        self._diffs = tempfile.TemporaryFile("w+")
+
+    def add(self, row):
+        # row=None: a resumed row whose verdict agreed with the recorded one
+        self.judged += 1
+        if row is not None and is_diff(row):
+            if row["new_violation"]:
+                self.newly_flagged += 1
+            else:
+                self.newly_cleared += 1
+            self._diffs.write(json.dumps(row) + "\n")
+
+    def write(self, total_seen):
+        head = {
+            "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "judge_model": backend_logic.JUDGE_MODEL,
+            "messages_seen": total_seen,
+            "messages_judged": self.judged,
+            "unjudged": total_seen - self.judged,
+            "newly_flagged": self.newly_flagged,
+            "newly_cleared": self.newly_cleared,
+        }
+        # Same layout as json.dump(indent=2), with the diffs copied over line by line
+        self._diffs.seek(0)
+        with open(self.path, "w") as f:
+            f.write(json.dumps(head, indent=2)[:-2] + ',\n  "diffs": [')
+            sep = "\n    "
+            for line in self._diffs:
+                f.write(sep + json.dumps(json.loads(line), indent=2).replace("\n", "\n    "))
+                sep = ",\n    "
+            f.write("\n  ]\n}" if sep != "\n    " else "]\n}")
+        self._diffs.close()
+
+
+# --- JUDGING ---
+async def judge_batch(batch, use_rules=True):
+    # Local rules first (same pipeline as live traffic), then ONE LLM request for the rest
+    results, pending = {}, []
+    for msg in batch:
+        decision = backend_logic.local_decision(msg["text"]) if use_rules else None
+        if decision is not None:
+            results[msg["id"]] = decision
+        else:
+            pending.append(msg)
+    if not pending:
+        return results
+
+    try:
+        res = await backend_logic.llm.chat(
+            model=backend_logic.JUDGE_MODEL,
+            messages=[{"role": "system", "content": backend_logic.COMPLIANCE_PROMPT + BATCH_PROMPT_SUFFIX},
+                      {"role": "user", "content": json.dumps([{"id": m["id"], "text": m["text"]} for m in pending])}],
+            temperature=0.0,
+            timeout=backend_logic.JUDGE_TIMEOUT * 4
+        )
+        verdicts = json.loads(res.choices[0].message.content.replace("```json", "").replace("```", ""))["verdicts"]
+        by_id = {v["id"]: v for v in verdicts}
+        missing = [m for m in pending if m["id"] not in by_id]
+        for m in pending:
+            if m["id"] in by_id:
+                v = by_id[m["id"]]
+                results[m["id"]] = {k: v[k] for k in ("is_violation", "severity", "reason") if k in v}
+    except (LLMUnavailable, ValueError, KeyError, TypeError):
+        missing = pending
+
+    # Anything the packed request didn't cover is judged one by one, outside
+    # the live verdict cache
+    for m in missing:
+        results[m["id"]] = await backend_logic.llm_judge_async(m["text"], cache=False)
+    return results
+
+
+async def run_audit(messages, checkpoint_path, batch_size, workers, use_rules, report):
+    version = backend_logic.verdict_cache.version
+    done = load_checkpoint(checkpoint_path, version)
+
+    def todo():
+        for m in messages:
+            if m["id"] in done:
+                report.add(done.pop(m["id"]))
+            else:
+                yield m
+
+    sem = asyncio.Semaphore(workers)
+    ckpt = open(checkpoint_path, "a") if checkpoint_path else None
+
+    async def worker(batch):
+        async with sem:
+            verdicts = await judge_batch(batch, use_rules)
+        for msg in batch:
+            v = verdicts.get(msg["id"], {})
+            if v.get("held") or v.get("degraded"):
+                continue  # judge unavailable - leave it for the next resume
+            row = {**msg, "version": version, "new_violation": bool(v.get("is_violation")),
+                   "severity": v.get("severity"), "reason": v.get("reason")}
+            report.add(row)
+            if ckpt:
+                ckpt.write(json.dumps(row) + "\n")
+        if ckpt:
+            ckpt.flush()
+
+    try:
+        # Bounded window of in-flight batches; finished rows go straight to the
+        # checkpoint and report, so only resumed ids and counters stay in memory
+        in_flight = set()
+        for batch in batched(todo(), batch_size):
+            in_flight.add(asyncio.ensure_future(worker(batch)))
+            if len(in_flight) >= workers * 2:
+                finished, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for f in finished:
+                    f.result()
+        if in_flight:
+            for f in (await asyncio.wait(in_flight))[0]:
+                f.result()
+    finally:
+        if ckpt:
+            ckpt.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-judge historical agent messages with the current compliance prompt.")
+    parser.add_argument("--source", choices=["tickets", "transcripts", "all"], default="tickets")
+    parser.add_argument("--agent", help="Only audit this agent id")
+    parser.add_argument("--batch-size", type=int, default=20, help="Messages packed into one LLM request")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent LLM requests")
+    parser.add_argument("--checkpoint", default="audit_checkpoint.jsonl", help="Resume file ('' to disable)")
+    parser.add_argument("--out", default="audit_report.json")
+    parser.add_argument("--llm-only", action="store_true", help="Skip the local rule pre-filter")
+    args = parser.parse_args()
+
+    agents = backend_logic.get_agents_logic()
+    total = sum(1 for _ in iter_messages(agents, args.source, args.agent))
+    print(f"--- 🔎 Auditing {total} messages (batch={args.batch_size}, workers={args.workers}) ---")
+
+    report = run_async(run_audit(iter_messages(agents, args.source, args.agent), args.checkpoint,
+                                 args.batch_size, args.workers, not args.llm_only, AuditReport(args.out)))
+    report.write(total)
+    print(f"✅ Judged {report.judged}/{total}: {report.newly_flagged} newly flagged, "
+          f"{report.newly_cleared} newly cleared -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,58 @@
+import asyncio
 import json
 import os
+import queue
+import threading
 import time
-from openai import OpenAI
-from dotenv import load_dotenv
+from repository import repository
+from storage import get_storage
+from detection import detect_threats
+from detection_stream import StreamingDetector
+from investigation import InvestigationView
+from mutations import apply_mutations
+import compliance_rules
+import metrics
+from verdict_cache import VerdictCache, judge_version
+from llm_client import LLMClient, LLMUnavailable, get_loop, run_async, run_on_loop
 
 # 1. SETUP THE BRAIN
-load_dotenv() 
+# Resolved on the first LLM call, not at import: .env, Streamlit secrets and
+# the openai SDK stay unloaded for tools and workers that never ask the judge.
+def resolve_api_key():
+    from dotenv import load_dotenv
+    load_dotenv()
 
-# Check if key exists
-api_key = os.getenv("AIML_API_KEY")
-if not api_key:
-    
-    try:
-        import streamlit as st
-        api_key = st.secrets["AIML_API_KEY"]
-    except:
-        print("⚠️ WARNING: AIML_API_KEY not found in .env or secrets!")
+    # Check if key exists
+    api_key = os.getenv("AIML_API_KEY")
+    if not api_key:
+        try:
+            import streamlit as st
+            api_key = st.secrets["AIML_API_KEY"]
+        except:
+            print("⚠️ WARNING: AIML_API_KEY not found in .env or secrets!")
+    return api_key
+
+# Shared LLM client: pooled connections, timeouts, retries with backoff,
+# circuit breaker and a concurrency cap (see llm_client.py)
+llm = LLMClient(resolve_api_key)
 
-client = OpenAI(
-    api_key=api_key,
-    base_url="https://api.aimlapi.com/v1",
-)
+# Per-call LLM timeouts (seconds)
+JUDGE_TIMEOUT = float(os.getenv("REGUFLOW_JUDGE_TIMEOUT", "15"))
+REPLY_TIMEOUT = float(os.getenv("REGUFLOW_REPLY_TIMEOUT", "20"))
+
+# What to do with an ambiguous message when the judge is unavailable:
+#   "hold"  -> don't deliver it, log it for supervisor review (default)
+#   "rules" -> trust the local rules alone (obvious HIGH violations are still blocked)
+DEGRADED_POLICY = os.getenv("REGUFLOW_DEGRADED_POLICY", "hold")
 
 # --- HELPER FUNCTIONS ---
 def load_json(filename):
-    # Get the folder where THIS script lives
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    # Combine it with the filename
-    file_path = os.path.join(base_dir, filename)
+    # Served from the shared in-memory repository (re-parsed only when the file changes)
+    return repository.load(filename)
 
-    with open(file_path, "r") as f:
-        return json.load(f)
+def save_json(filename, data):
+    # Writes go through the repository so the cache stays in sync with the disk
+    repository.save(filename, data)
 
 # --- LOGIC FUNCTIONS (Formerly Endpoints) ---
 
@@ -49,33 +71,79 @@ def login_logic(email, password):
     return {"status": "error", "message": "Invalid Credentials"}
 
 # 2. GET DATA logic
+# Reads go through the configured storage engine (SQLite by default, JSON files as fallback)
 def get_customers_logic():
-    return load_json("customers.json")
+    return get_storage().get_customers()
 
 def get_agents_logic():
-    return load_json("agents.json")
+    return get_storage().get_agents()
 
-# 3. CHAT MONITOR logic
-def send_message_logic(agent_id, ticket_id, message):
-    agents = load_json("agents.json")
-    agent = agents.get(agent_id)
-    if not agent: 
-        return {"status": "ERROR", "reason": "Agent not found"}
-    
-    # Ensure Transcript Exists (For Admin View)
-    if "transcript" not in agent: agent["transcript"] = []
+def get_transcript_logic(agent_id, n=200):
+    # Last n transcript lines only - the full history stays in the segment log
+    return get_storage().tail_transcript(agent_id, n)
 
-    # 1. GET SPECIFIC TICKET
-    ticket = agent["tickets"].get(ticket_id)
-    if not ticket: 
-        return {"status": "ERROR", "reason": "Ticket not found"}
+def data_version_logic(key):
+    # Cheap change marker for UI caches: "customers" | "agents" | "transcript:<agent_id>"
+    if key.startswith("transcript:"):
+        return get_storage().transcripts.version(key.split(":", 1)[1])
+    return get_storage().data_version(key)
 
-    # 2. CHECK LOCK STATUS
-    if agent.get("status") == "LOCKED": 
-        return {"status": "LOCKED", "reason": "Account Suspended"}
+def find_customers_logic(field, value):
+    # Indexed lookup (ip / status / last_login_time / wallet) without scanning the ledger
+    return get_storage().find_customers(field, value)
+
+# "python" (single pass over dicts), "numpy" (vectorised columns, for large ledgers)
+# or "stream" (running group counters, updated per event instead of rescanning)
+DETECTION_BACKEND = os.getenv("REGUFLOW_DETECTION_BACKEND", "python")
 
-    # 3. AI JUDGE 
-    system_prompt = """
+# Live threat stream: bootstrapped from the ledger, then fed by this process's
+# mutations. It remembers the customers data version it reflects; any other
+# write (another process, a re-import) changes the version and forces a rebuild.
+_threat_stream = None
+_threat_stream_version = None
+_threat_stream_lock = threading.Lock()
+
+def get_threat_stream():
+    global _threat_stream, _threat_stream_version
+    with _threat_stream_lock:
+        # Version first: a write landing in between only costs a rebuild next time
+        version = get_storage().data_version("customers")
+        if _threat_stream is None or version != _threat_stream_version:
+            _threat_stream = StreamingDetector.from_customers(get_customers_logic())
+            _threat_stream_version = version
+        return _threat_stream
+
+def _feed_threat_stream(storage, changes):
+    # Every customer status / risk change, so users leave (ban) or rejoin
+    # (lifted ban) their groups without a rescan
+    for change in changes:
+        name = change["op"]
+        if name == "ban_customers":
+            status, risk_score = "BANNED", 100
+        elif name in ("set_customer_status", "override_risk"):
+            status, risk_score = change.get("status"), change.get("risk_score")
+        else:
+            continue
+        for uid in change["user_ids"]:
+            user = None
+            if status not in (None, "BANNED") and uid not in _threat_stream.users:
+                found = storage.find_customers("id", uid)
+                user = found[0] if found else None
+            _threat_stream.status_changed(uid, status, risk_score, user)
+
+def detect_threats_logic(thresholds=None):
+    if DETECTION_BACKEND == "stream" and thresholds is None:
+        with metrics.span("detect_threats", metric="reguflow_detector_seconds", backend="stream"):
+            return get_threat_stream().threats()
+    # Single-pass run of every registered detector (see detection.py)
+    backend = "python" if DETECTION_BACKEND == "stream" else DETECTION_BACKEND
+    customers = get_customers_logic()
+    with metrics.span("detect_threats", metric="reguflow_detector_seconds", backend=backend):
+        return detect_threats(customers, thresholds, backend=backend)
+
+# --- COMPLIANCE JUDGE ---
+JUDGE_MODEL = "gpt-4o-mini"
+COMPLIANCE_PROMPT = """
     You are a strict Compliance Officer monitoring a financial support agent.
     Analyze the agent's message for the following violations:
 
@@ -90,169 +158,387 @@ def send_message_logic(agent_id, ticket_id, message):
     
     Output JSON only: {"is_violation": bool, "severity": "HIGH"|"LOW", "reason": "Short explanation (e.g. 'Promised guaranteed returns')"}
     """
+
+# Verdicts are cached per normalised message; the key includes the prompt + model
+# version, so editing COMPLIANCE_PROMPT or JUDGE_MODEL invalidates old entries.
+verdict_cache = VerdictCache(judge_version(JUDGE_MODEL, COMPLIANCE_PROMPT))
+metrics.registry.gauge("reguflow_verdict_cache_lookups",
+                       lambda: {(("result", k),): v for k, v in verdict_cache.stats.items()})
+metrics.registry.gauge("reguflow_verdict_cache_hit_ratio", verdict_cache.hit_rate)
+
+def local_decision(message):
+    # Card numbers and plain pleasantries are decided locally in
+    # microseconds, repeated messages come from the verdict cache; None means
+    # only the LLM can decide.
+    pre = compliance_rules.prefilter(message)
+    # Which pattern fired, also on escalations: how often the judge confirms a
+    # SECURITY / GUARANTEES / EVASION / OTP_CODE hit is what would justify blocking it locally
+    metrics.inc("reguflow_prefilter_rules_total", verdict=pre["verdict"], rule=pre["rule"] or "none")
+    if pre["verdict"] != compliance_rules.ESCALATE:
+        metrics.inc("reguflow_judge_decisions_total", source="prefilter")
+        return pre["decision"]
+    decision = verdict_cache.get(message)
+    if decision is not None and not valid_verdict(decision):
+        decision = None  # written before verdicts were checked - ask again
+    if decision is not None:
+        metrics.inc("reguflow_judge_decisions_total", source="cache")
+    return decision
+
+def valid_verdict(decision):
+    # The shape _record_outcome relies on; anything else the model sends back
+    # is treated like an unavailable judge and never cached
+    if not isinstance(decision, dict) or not isinstance(decision.get("is_violation"), bool):
+        return False
+    if not decision["is_violation"]:
+        return True
+    return decision.get("severity") in ("HIGH", "LOW") and isinstance(decision.get("reason"), str) \
+        and bool(decision["reason"])
+
+def degraded_decision(error):
+    # Never fail open silently: either hold the message or say we ran on rules only
+    metrics.inc("reguflow_judge_decisions_total", source="degraded")
+    print(f"⚠️ Compliance judge unavailable ({error}); policy={DEGRADED_POLICY}")
+    if DEGRADED_POLICY == "rules":
+        return {"is_violation": False, "degraded": True}
+    return {"is_violation": False, "held": True, "reason": "Compliance check unavailable - held for review"}
+
+async def llm_judge_async(message, cache=True):
+    # cache=False: offline callers (audit_batch) judge without touching the live verdict cache
     try:
-        check = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": message}],
-            temperature=0.0
-        )
+        with metrics.span("judge"):
+            check = await llm.chat(
+                model=JUDGE_MODEL,
+                messages=[{"role": "system", "content": COMPLIANCE_PROMPT}, {"role": "user", "content": message}],
+                temperature=0.0,
+                timeout=JUDGE_TIMEOUT
+            )
         decision = json.loads(check.choices[0].message.content.replace("```json", "").replace("```", ""))
-    except:
-        decision = {"is_violation": False}
+    except (LLMUnavailable, ValueError, AttributeError, TypeError, IndexError) as e:
+        return degraded_decision(e)
+    if not valid_verdict(decision):
+        return degraded_decision(f"malformed verdict {str(decision)[:80]!r}")
+    metrics.inc("reguflow_judge_decisions_total", source="llm")
+    # Only real verdicts are cached, never the degraded ones above
+    if cache:
+        verdict_cache.put(message, decision)
+    return decision
 
-    
-    
+async def judge_message_async(message):
+    decision = local_decision(message)
+    if decision is None:
+        decision = await llm_judge_async(message)
+    return decision
+
+def judge_message(message):
+    return run_async(judge_message_async(message))
+
+# --- SIMULATED CUSTOMER ---
+REPLY_MODEL = "gpt-4o-mini"
+
+async def customer_reply_async(customer_name, message):
+    try:
+        with metrics.span("reply"):
+            sim_res = await llm.chat(
+                model=REPLY_MODEL,
+                messages=[
+                    {"role": "system", "content": f"You are {customer_name}. Reply to the agent naturally (under 15 words)."},
+                    {"role": "user", "content": message}
+                ],
+                timeout=REPLY_TIMEOUT
+            )
+    except LLMUnavailable:
+        return None  # message is still delivered, the customer just doesn't answer
+    return sim_res.choices[0].message.content
+
+async def judge_and_reply_async(customer_name, message):
+    # Returns (decision, customer_reply). customer_reply is None when blocked or held.
+    decision = local_decision(message)
+    if decision is not None:
+        if decision.get("is_violation"):
+            return decision, None
+        return decision, await customer_reply_async(customer_name, message)
+
+    # Ambiguous: start the reply speculatively while the judge deliberates,
+    # so an approved message costs max(judge, reply) instead of judge + reply.
+    reply_task = asyncio.create_task(customer_reply_async(customer_name, message))
+    try:
+        decision = await llm_judge_async(message)
+    except BaseException:
+        reply_task.cancel()
+        raise
+    if decision.get("is_violation") or decision.get("held"):
+        # Blocked / held: throw the speculative reply away before it can be logged
+        reply_task.cancel()
+        try:
+            await reply_task
+        except BaseException:
+            pass
+        return decision, None
+    return decision, await reply_task
+
+# 3. CHAT MONITOR logic
+def _open_chat(storage, agent_id, ticket_id):
+    # Returns (ticket, None) or (None, error_result)
+    agent = storage.get_agent(agent_id)
+    if not agent: 
+        return None, {"status": "ERROR", "reason": "Agent not found"}
+
+    # 1. GET SPECIFIC TICKET
+    ticket = agent["tickets"].get(ticket_id)
+    if not ticket: 
+        return None, {"status": "ERROR", "reason": "Ticket not found"}
+
+    # 2. CHECK LOCK STATUS
+    if agent.get("status") == "LOCKED": 
+        return None, {"status": "LOCKED", "reason": "Account Suspended"}
+    return ticket, None
+
+def _record_outcome(storage, agent_id, ticket_id, ticket, message, decision, customer_reply):
     # A. Log to Master Transcript (For Supervisor)
     timestamp = time.strftime("%H:%M:%S")
     log_entry = f"[{timestamp}] [Ticket: {ticket['customer_name']}] AGENT: {message}"
-    agent["transcript"].append(log_entry)
+
+    # 4. HOLD FOR REVIEW (judge unavailable) -> not delivered, no strike
+    if decision.get("held"):
+        with storage.transaction():
+            storage.append_transcript(agent_id, log_entry)
+            storage.append_transcript(agent_id, f"⏸️ HELD FOR REVIEW: {decision['reason']}")
+        return {"status": "HELD", "reason": decision["reason"]}
 
     # 5. HANDLE VIOLATION
     if decision.get("is_violation"):
-        # Log Violation details
-        violation_entry = f"[{decision['severity']}] {decision['reason']} (Ticket: {ticket_id})"
-        agent["history"].append(violation_entry)
-        agent["transcript"].append(f"❌ BLOCKED: {decision['reason']}") # Show block in transcript
-        
-        # Log to Ticket (So Agent sees red bubble)
-        ticket["history"].append({"role": "agent", "text": message, "blocked": True})
-        
-        if decision["severity"] == "HIGH":
-            agent["status"] = "LOCKED"
-        else:
-            agent["strikes"] = agent.get("strikes", 0) + 1
-            if agent["strikes"] >= 3: agent["status"] = "LOCKED"
-        
-        # Save
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        with open(os.path.join(base_dir, "agents.json"), "w") as f: json.dump(agents, f, indent=2)
+        # All writes for this message commit together (row inserts, not a file rewrite)
+        with storage.transaction():
+            storage.append_transcript(agent_id, log_entry)
+            # Log Violation details
+            violation_entry = f"[{decision['severity']}] {decision['reason']} (Ticket: {ticket_id})"
+            storage.append_agent_history(agent_id, violation_entry)
+            storage.append_transcript(agent_id, f"❌ BLOCKED: {decision['reason']}") # Show block in transcript
+
+            # Log to Ticket (So Agent sees red bubble)
+            storage.append_ticket_message(agent_id, ticket_id, "agent", message, blocked=True)
+
+            if decision["severity"] == "HIGH":
+                storage.set_agent_status(agent_id, "LOCKED")
+            else:
+                strikes = storage.add_strike(agent_id)
+                if strikes >= 3: storage.set_agent_status(agent_id, "LOCKED")
 
         return {"status": "VIOLATION", "reason": decision["reason"]}
 
     # 6. IF SAFE -> REPLY
-    # Log to Ticket History (For Agent View)
-    ticket["history"].append({"role": "agent", "text": message})
-
-    # Simulate Reply
-    sim_res = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": f"You are {ticket['customer_name']}. Reply to the agent naturally (under 15 words)."},
-            {"role": "user", "content": message}
-        ]
-    )
-    customer_reply = sim_res.choices[0].message.content
-    
-    # Log Customer Reply to Ticket & Transcript
-    ticket["history"].append({"role": "customer", "text": customer_reply})
-    agent["transcript"].append(f"[{timestamp}] CUSTOMER: {customer_reply}")
-    
-    # Save File
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    with open(os.path.join(base_dir, "agents.json"), "w") as f: json.dump(agents, f, indent=2)
+    # Log Agent Message + Customer Reply to Ticket & Transcript (one transaction)
+    with storage.transaction():
+        storage.append_transcript(agent_id, log_entry)
+        storage.append_ticket_message(agent_id, ticket_id, "agent", message)
+        if customer_reply is not None:
+            storage.append_ticket_message(agent_id, ticket_id, "customer", customer_reply)
+            storage.append_transcript(agent_id, f"[{timestamp}] CUSTOMER: {customer_reply}")
     
     return {"status": "APPROVED", "customer_reply": customer_reply}
 
+# Stage spans (see metrics.py): send_message > open_chat, judge_and_reply
+# (> judge, reply), record_outcome (> db_commit)
+def _open_chat_timed(storage, agent_id, ticket_id):
+    with metrics.span("open_chat"):
+        return _open_chat(storage, agent_id, ticket_id)
+
+def _record_outcome_timed(*args):
+    with metrics.span("record_outcome"):
+        return _record_outcome(*args)
+
+async def _judge_and_reply_timed(customer_name, message):
+    with metrics.span("judge_and_reply"):
+        return await judge_and_reply_async(customer_name, message)
+
+def send_message_logic(agent_id, ticket_id, message):
+    with metrics.span("send_message"):
+        storage = get_storage()
+        ticket, error = _open_chat_timed(storage, agent_id, ticket_id)
+        if error:
+            return error
+
+        # 3. COMPLIANCE CHECK + REPLY (judge and speculative customer reply run concurrently;
+        #    the reply is discarded if the message is blocked)
+        decision, customer_reply = run_async(_judge_and_reply_timed(ticket["customer_name"], message))
+
+        return _record_outcome_timed(storage, agent_id, ticket_id, ticket, message, decision, customer_reply)
+
+async def send_message_async(agent_id, ticket_id, message):
+    # Same flow for async callers (api.py): storage work in a worker thread,
+    # LLM work on the shared loop, the caller's event loop never blocks.
+    with metrics.span("send_message"):
+        storage = get_storage()
+        ticket, error = await asyncio.to_thread(_open_chat_timed, storage, agent_id, ticket_id)
+        if error:
+            return error
+        decision, customer_reply = await run_on_loop(_judge_and_reply_timed(ticket["customer_name"], message))
+        return await asyncio.to_thread(_record_outcome_timed, storage, agent_id, ticket_id, ticket, message,
+                                       decision, customer_reply)
+
+# 3b. STREAMING CHAT logic
+_STREAM_END = object()
+
+async def _stream_reply_into(out_queue, customer_name, message):
+    # Runs on the shared loop and pushes reply deltas into a thread-safe queue
+    try:
+        async for delta in llm.stream_chat(
+            model=REPLY_MODEL,
+            messages=[
+                {"role": "system", "content": f"You are {customer_name}. Reply to the agent naturally (under 15 words)."},
+                {"role": "user", "content": message}
+            ],
+            timeout=REPLY_TIMEOUT
+        ):
+            out_queue.put(delta)
+    except LLMUnavailable:
+        pass  # message is still delivered, the customer just doesn't answer
+    finally:
+        out_queue.put(_STREAM_END)
+
+class ReplyStream:
+    # Iterate to receive the customer's reply token by token. `result` is the
+    # same dict send_message_logic returns; it is set up front when the message
+    # was not approved (nothing to stream) and once the stream is closed
+    # otherwise. Iterating to the end closes it; a caller that doesn't iterate
+    # (or stops early) must close() it - or use it as a context manager - so
+    # the agent message and the customer reply are recorded exactly once.
+    def __init__(self, result=None, tokens=None, on_complete=None, producer=None):
+        self.result = result
+        self._tokens = tokens
+        self._on_complete = on_complete
+        self._producer = producer
+        self._parts = []
+        self._ended = tokens is None
+
+    def _next(self):
+        # Next delta, or None once the reply is over
+        if self._ended:
+            return None
+        try:
+            delta = self._tokens.get(timeout=REPLY_TIMEOUT)
+        except queue.Empty:
+            delta = _STREAM_END  # provider stalled mid-stream - keep what we have
+        if delta is _STREAM_END:
+            self._ended = True
+            return None
+        self._parts.append(delta)
+        return delta
+
+    def __iter__(self):
+        try:
+            while True:
+                delta = self._next()
+                if delta is None:
+                    break
+                yield delta
+        finally:
+            self.close()
+
+    def close(self):
+        # Idempotent. Collects whatever the caller didn't read, then persists the
+        # final text once
+        if self._on_complete is None:
+            return
+        try:
+            while self._next() is not None:
+                pass
+        finally:
+            on_complete, self._on_complete = self._on_complete, None
+            if self._producer is not None:
+                self._producer.cancel()
+            self._tokens = None
+            self.result = on_complete("".join(self._parts) or None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def send_message_stream_logic(agent_id, ticket_id, message):
+    # The span covers opening the chat and the judge; the outcome is recorded
+    # (record_outcome span) when the stream is closed
+    with metrics.span("send_message"):
+        storage = get_storage()
+        ticket, error = _open_chat_timed(storage, agent_id, ticket_id)
+        if error:
+            return ReplyStream(result=error)
+
+        # Start the reply speculatively (tokens are buffered, not shown) while the judge runs
+        decision = local_decision(message)
+        tokens, producer = None, None
+        if decision is None or not decision.get("is_violation"):
+            tokens = queue.Queue()
+            producer = asyncio.run_coroutine_threadsafe(
+                _stream_reply_into(tokens, ticket["customer_name"], message), get_loop())
+        if decision is None:
+            decision = run_async(llm_judge_async(message))
+
+        if decision.get("is_violation") or decision.get("held"):
+            if producer is not None:
+                producer.cancel()  # buffered tokens are dropped with the queue
+            return ReplyStream(result=_record_outcome_timed(storage, agent_id, ticket_id, ticket, message,
+                                                            decision, None))
+
+        def on_complete(customer_reply):
+            return _record_outcome_timed(storage, agent_id, ticket_id, ticket, message, decision, customer_reply)
+        return ReplyStream(tokens=tokens, on_complete=on_complete, producer=producer)
+
 # 4. AEGIS INVESTIGATOR logic
-def get_investigation_data_logic():
-    customers = load_json("customers.json")
-    
-    nodes = []
-    edges = []
-    
-    # 1. Create the "Suspicious Server"
-    suspicious_ip = "192.168.10.5"
-    nodes.append({
-        "data": {
-            "id": "bad_server", 
-            "label": f"SUSPICIOUS: {suspicious_ip}", 
-            "color": "#00FFFF", 
-            "size": 40,         
-            "symbolType": "square"
-        }
-    })
-
-    # 2. Create the "Safe Gateway"
-    nodes.append({
-        "data": {
-            "id": "safe_server", 
-            "label": "Public Gateway (Safe)", 
-            "color": "#00FF00", 
-            "size": 40, 
-            "symbolType": "triangle"
-        }
-    })
-    
-    # 3. Populate the Clusters
-    count_safe = 0
-    
-    for uid, user in customers.items():
-        # --- CLUSTER A: THE BAD GUYS ---
-        if user["ip"] == suspicious_ip or user["status"] == "FLAGGED":
-            nodes.append({
-                "data": {
-                    "id": uid, "label": f"⚠️ {user['name']}", 
-                    "color": "#FF0000", "size": 25 
-                }
-            })
-            edges.append({
-                "data": {
-                    "source": uid, "target": "bad_server", 
-                    "color": "#FF444F", "label": "matches_ip"
-                }
-            })
-            
-        # --- CLUSTER B: THE NORMAL TRAFFIC ---
-        elif count_safe < 30:
-            nodes.append({
-                "data": {
-                    "id": uid, "label": user['name'], 
-                    "color": "#555", "size": 10 
-                }
-            })
-            edges.append({
-                "data": {
-                    "source": uid, "target": "safe_server", 
-                    "color": "#333", "label": "verified"
-                }
-            })
-            count_safe += 1
-
-    return {"nodes": nodes, "edges": edges}
-
-# 5. UNLOCK AGENT logic
-def unlock_agent_logic(agent_id):
-    agents = load_json("agents.json")
-    
-    if agent_id in agents:
-        agents[agent_id]["status"] = "ACTIVE"
-        agents[agent_id]["strikes"] = 0
-        agents[agent_id]["history"].append("[ADMIN ACTION] Account Unlocked")
-        
-        # Save back to file
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        file_path = os.path.join(base_dir, "agents.json")
-        with open(file_path, "w") as f:
-            json.dump(agents, f, indent=2)
-            
-        return {"status": "success", "message": f"{agent_id} Unlocked"}
-    
-    return {"status": "error", "message": "Agent not found"}
+# Level-of-detail graph (see investigation.py): ranked cluster summary, paged
+# with a cursor, or one cluster expanded. Cached per customers data version.
+investigation_view = InvestigationView()
+
+def get_investigation_data_logic(customers=None, top=20, cursor=None, expand=None):
+    version = None
+    if customers is None:
+        # Version first: a write landing in between only costs a recompute next time
+        version = get_storage().data_version("customers")
+        customers = get_customers_logic()
+    try:
+        with metrics.span("investigation"):
+            if expand:
+                return investigation_view.expand(customers, expand, version, cursor=cursor)
+            return investigation_view.summary(customers, version, top=top, cursor=cursor)
+    except (KeyError, ValueError) as e:
+        return {"status": "error", "message": str(e.args[0])}
+
+# 5. ADMIN MUTATIONS logic (atomic batches + audit trail, see mutations.py)
+def apply_mutations_logic(changes, actor="admin", reason=None):
+    global _threat_stream_version
+    storage = get_storage()
+    # Under the stream lock, so the stream is either fed this batch and moved to
+    # the new version, or left behind on an older one and rebuilt on next read
+    with _threat_stream_lock:
+        before = storage.data_version("customers")
+        try:
+            res = apply_mutations(changes, actor, reason, storage)
+        except (KeyError, ValueError) as e:
+            return {"status": "error", "message": str(e.args[0])}
+        if _threat_stream is not None and _threat_stream_version == before:
+            _feed_threat_stream(storage, changes)
+            _threat_stream_version = storage.data_version("customers")
+
+    return {"status": "success", **res}
+
+def get_audit_logic(limit=100):
+    return get_storage().get_audit(limit)
+
+def unlock_agent_logic(agent_id, actor="admin"):
+    res = apply_mutations_logic([{"op": "unlock_agent", "agent_id": agent_id}], actor)
+    if res["status"] != "success":
+        return {"status": "error", "message": "Agent not found"}
+    return {"status": "success", "message": f"{agent_id} Unlocked"}
 
 # 6. BAN CLUSTER logic
-def ban_users_logic(user_ids_list):
-    customers = load_json("customers.json")
-    
-    banned_count = 0
-    for uid in user_ids_list:
-        if uid in customers:
-            customers[uid]["status"] = "BANNED"
-            customers[uid]["risk_score"] = 100 
-            banned_count += 1
-            
-    # Save changes
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    with open(os.path.join(base_dir, "customers.json"), "w") as f:
-        json.dump(customers, f, indent=2)
-        
-    return {"status": "success", "banned": banned_count}
\ No newline at end of file
+def ban_users_logic(user_ids_list, actor="admin"):
+    # One transaction of indexed row updates, however large the ring
+    res = apply_mutations_logic([{"op": "ban_customers", "user_ids": list(user_ids_list)}], actor)
+    if res["status"] != "success":
+        return res
+    return {"status": "success", "banned": res["results"][0]["changed"], "batch_id": res["batch_id"]}
+
+def override_risk_logic(user_ids_list, risk_score, actor="admin"):
+    return apply_mutations_logic([{"op": "override_risk", "user_ids": list(user_ids_list),
+                                   "risk_score": risk_score}], actor)
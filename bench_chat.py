@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# End-to-end load test of the chat path (send_message_logic / send_message_stream_logic)
+# against the local mock LLM. Runs on a scratch copy of the data, never the real files.
+#
+#   python bench_chat.py --agents 16 --messages 25 --latency-ms 300
+#   python bench_chat.py --mode stream --storage json --out bench_results/chat.json
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Traffic mix: pleasantries (decided locally), support talk the rules can't
+# clear (goes to the judge), and violations (only a card number is blocked
+# locally; the rest read like compliant text to a regex and go to the judge)
+MESSAGE_MIX = [
+    ("benign", "Hi, how can I help you today?"),
+    ("benign", "Thanks for waiting, one moment please."),
+    ("ambiguous", "Could you try logging out and back in again?"),
+    ("ambiguous", "Your deposit should show up in your account within an hour."),
+    ("ambiguous", "You can find the trading options under the Markets tab."),
+    ("ambiguous", "Withdrawals to your bank usually take 2-3 business days."),
+    ("ambiguous", "I recommend checking the fees page before you trade."),
+    ("violation", "Please send me your password so I can fix it."),
+    ("violation", "This strategy has guaranteed returns, you can't lose."),
+    ("violation", "I see card 4111 1111 1111 1111 on your account."),
+]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def bytes_written():
+    # Storage-layer bytes by target (reguflow_bytes_written_total: data files,
+    # transcript log, audit log, SQLite WAL, snapshot). Unlike /proc/self/io it
+    # leaves out socket writes to the LLM. None with REGUFLOW_METRICS=0.
+    import metrics
+    if not metrics.METRICS_ENABLED:
+        return None
+    series = metrics.snapshot()["counters"].get("reguflow_bytes_written_total", {})
+    return {labels.split('"')[1]: value for labels, value in series.items()}
+
+
+def prepare_workdir(n_agents):
+    workdir = tempfile.mkdtemp(prefix="reguflow_bench_")
+    shutil.copy(os.path.join(BASE_DIR, "customers.json"), workdir)
+    with open(os.path.join(BASE_DIR, "agents.json")) as f:
+        template = next(iter(json.load(f).values()))
+    agents = {}
+    for i in range(n_agents):
+        agent = json.loads(json.dumps(template))
+        agent.update(name=f"Bench Agent {i}", status="ACTIVE", strikes=0, history=[])
+        agents[f"bench_agent_{i}"] = agent
+    with open(os.path.join(workdir, "agents.json"), "w") as f:
+        json.dump(agents, f, indent=2)
+    return workdir, agents
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat-path latency / throughput benchmark.")
+    parser.add_argument("--agents", type=int, default=8, help="Concurrent simulated agents")
+    parser.add_argument("--messages", type=int, default=20, help="Messages per agent")
+    parser.add_argument("--mode", choices=["sync", "stream"], default="sync")
+    parser.add_argument("--storage", choices=["sqlite", "json"], default="sqlite")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the verdict cache")
+    parser.add_argument("--mock-url", help="Use an already running mock (default: start one in-process)")
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--violation-rate", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="Write the JSON report here as well")
+    args = parser.parse_args()
+
+    workdir, agents = prepare_workdir(args.agents)
+
+    # --- POINT THE APP AT THE SCRATCH DATA + MOCK LLM (before importing it) ---
+    server = None
+    if args.mock_url:
+        base_url = args.mock_url
+    else:
+        from mock_llm_server import MockConfig, start_server
+        server, base_url = start_server(MockConfig(args.latency_ms, args.latency_sigma, args.violation_rate,
+                                                   args.error_rate, seed=args.seed), port=0)
+    os.environ.update({
+        "REGUFLOW_DATA_DIR": workdir,
+        "REGUFLOW_STORAGE": args.storage,
+        "REGUFLOW_DB": os.path.join(workdir, "reguflow.db"),
+        "REGUFLOW_VERDICT_CACHE_DB": "",
+        "REGUFLOW_LLM_BASE_URL": base_url,
+        "AIML_API_KEY": os.getenv("AIML_API_KEY") or "mock-key",
+    })
+    if args.no_cache:
+        os.environ["REGUFLOW_VERDICT_CACHE_SIZE"] = "0"
+    sys.path.insert(0, BASE_DIR)
+    import backend_logic
+
+    def llm_requests():
+        if server is not None:
+            return server.config.stats["requests"]
+        import urllib.request
+        with urllib.request.urlopen(base_url.rstrip("/") + "/stats") as r:
+            return json.load(r)["requests"]
+
+    backend_logic.get_agents_logic()  # warm up storage (first-run import) outside the timed window
+
+    latencies, ttfts, outcomes = [], [], {}
+    lock = threading.Lock()
+
+    def run_agent(agent_id, seed):
+        rng = random.Random(seed)
+        tickets = list(agents[agent_id]["tickets"])
+        for _ in range(args.messages):
+            kind, text = rng.choice(MESSAGE_MIX)
+            t0 = time.perf_counter()
+            ttft = None
+            if args.mode == "stream":
+                with backend_logic.send_message_stream_logic(agent_id, rng.choice(tickets), text) as stream:
+                    for _token in stream:
+                        if ttft is None:
+                            ttft = time.perf_counter() - t0
+                res = stream.result
+            else:
+                res = backend_logic.send_message_logic(agent_id, rng.choice(tickets), text)
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies.append(elapsed)
+                if ttft is not None:
+                    ttfts.append(ttft)
+                outcomes[res["status"]] = outcomes.get(res["status"], 0) + 1
+            if res["status"] in ("VIOLATION", "LOCKED"):
+                # Supervisor unlocks so the agent keeps generating load (not timed)
+                backend_logic.unlock_agent_logic(agent_id)
+
+    calls_before, written_before = llm_requests(), bytes_written()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.agents) as pool:
+        futures = [pool.submit(run_agent, agent_id, args.seed + i) for i, agent_id in enumerate(agents)]
+        for future in futures:
+            future.result()  # re-raise a failed agent instead of reporting a short run
+    wall = time.perf_counter() - start
+    calls_after, written_after = llm_requests(), bytes_written()
+
+    latencies.sort()
+    ttfts.sort()
+    total = len(latencies)
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k != "out"},
+        "messages": total,
+        "wall_s": round(wall, 3),
+        "throughput_msg_s": round(total / wall, 2) if wall else 0.0,
+        "latency_ms": {name: round(percentile(latencies, p) * 1000, 1)
+                       for name, p in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))},
+        "outcomes": outcomes,
+        "llm_calls_per_message": round((calls_after - calls_before) / total, 3) if total else 0.0,
+        "bytes_written_per_message": None,
+        "verdict_cache_hit_rate": round(backend_logic.verdict_cache.hit_rate(), 3),
+    }
+    if total and written_before is not None:
+        delta = {target: n - written_before.get(target, 0) for target, n in written_after.items()}
+        report["bytes_written_per_message"] = round(sum(delta.values()) / total)
+        report["bytes_written_by_target"] = {t: n for t, n in sorted(delta.items()) if n}
+    if ttfts:
+        report["ttft_ms"] = {name: round(percentile(ttfts, p) * 1000, 1)
+                             for name, p in (("p50", 50), ("p95", 95), ("p99", 99))}
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from multiprocessing import get_context
+
+# Scaling benchmark for the risk-feed detectors and the investigation graph,
+# on labelled datasets from generate_data.py. Every case runs in a fresh
+# process so peak RSS belongs to that case alone.
+#
+#   python bench_detectors.py --sizes 1000,100000 --out bench_results/detectors.json
+#   python bench_detectors.py --baseline bench_results/detectors-<old commit>.json
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+DEFAULT_SIZES = "1000,100000,1000000,10000000"
+CASES = ("python", "numpy", "stream", "graph", "events")
+DICT_CASES = ("python", "stream", "graph")  # need the full ledger as Python dicts
+
+EVENTS_PER_CUSTOMER = 10  # "events" case: login event stream length per dataset customer
+
+# Which ground-truth label each rule is supposed to catch
+RULE_LABELS = {"shared_ip": "syndicate", "smurfing": "smurf", "impossible_travel": "travel", "bot_swarm": "bot"}
+
+
+# --- MEMORY PROBES (Linux /proc; None elsewhere) ---
+def reset_peak_rss():
+    # Writing 5 to clear_refs resets VmHWM, so the next reading covers only what follows
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def _status_mb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+
+def peak_rss_mb():
+    return _status_mb("VmHWM:")
+
+def current_rss_mb():
+    return _status_mb("VmRSS:")
+
+
+# --- DATASETS ---
+def dataset_dir(data_dir, size, fmt):
+    return os.path.join(data_dir, f"{size}-{fmt}")
+
+def ensure_dataset(data_dir, size, fmt, seed):
+    from generate_data import generate_scale, read_manifest
+    out = dataset_dir(data_dir, size, fmt)
+    login_events = size * EVENTS_PER_CUSTOMER if fmt == "events" else 0
+    try:
+        manifest = read_manifest(out)
+        if (manifest["customers"] == size and manifest["seed"] == seed
+                and manifest.get("login_events", 0) == login_events):
+            return out
+    except (OSError, ValueError, KeyError):
+        pass
+    per_50k = max(1, size // 50_000)
+    generate_scale({
+        "customers": size, "format": fmt, "out": out,
+        "shards": max(1, -(-size // 1_000_000)), "workers": os.cpu_count() or 1, "seed": seed,
+        "syndicates": per_50k, "syndicate_size": 5, "bot_swarms": per_50k, "bot_swarm_size": 6,
+        "smurf_rate": 0.0005, "travel_rate": 0.0002, "login_events": login_events,
+    })
+    return out
+
+
+# --- ONE CASE (runs in a child process) ---
+def ensure_snapshot(path):
+    # customer_table snapshot of a .jsonl dataset, written once and reused
+    from snapshot import snapshot_source, write_snapshot
+    snap = path + ".snap"
+    if snapshot_source(snap) != path:
+        from customer_table import CustomerTable
+        from generate_data import iter_jsonl
+        write_snapshot(CustomerTable.from_records(iter_jsonl(path)), snap, source=path)
+    return snap
+
+def _load(case, path, records="dict"):
+    from generate_data import iter_jsonl, read_columnar
+    if case == "events":  # streamed from disk by the runner, nothing to preload
+        return path
+    if records == "snapshot":  # every case, numpy included, scans the mapped table
+        from snapshot import open_snapshot
+        return open_snapshot(path + ".snap")
+    if case == "numpy":
+        return read_columnar(path)
+    if records == "compact":
+        from customer_table import CustomerTable
+        return CustomerTable.from_records(iter_jsonl(path))
+    return {c["id"]: c for c in iter_jsonl(path)}
+
+def _runner(case):
+    # Returns fn(data) -> threats (detectors) or every ranked cluster (investigation)
+    if case == "python":
+        from detection import detect_threats
+        return lambda data: detect_threats(data)
+    if case == "numpy":
+        from detection_columnar import ColumnarDetectionEngine
+        return lambda data: ColumnarDetectionEngine().scan(data)
+    if case == "stream":
+        from detection_stream import StreamingDetector
+        return lambda data: StreamingDetector.from_customers(data).threats()
+    if case == "events":
+        from detection_events import LoginEventEngine
+        from generate_data import iter_login_events
+        return lambda path: LoginEventEngine().scan(iter_login_events(path))
+    from investigation import find_clusters
+    return lambda data: find_clusters(data)
+
+def _flagged(case, output):
+    if case == "graph":
+        return {uid for cluster in output for uid in cluster.user_ids}, {}
+    by_rule = {}
+    for threat in output:
+        by_rule.setdefault(threat.rule, set()).update(threat.user_ids)
+    return set().union(*by_rule.values()) if by_rule else set(), by_rule
+
+def _score(flagged, truth):
+    hits = len(flagged & truth)
+    return {
+        "flagged": len(flagged),
+        "precision": round(hits / len(flagged), 4) if flagged else None,
+        "recall": round(hits / len(truth), 4) if truth else None,
+    }
+
+def run_case(case, path, trace, records="dict"):
+    from detection_events import EVENT_RULES
+    from generate_data import read_labels
+    before_mb = current_rss_mb()
+    t0 = time.perf_counter()
+    data = _load(case, path, records)
+    load_s = time.perf_counter() - t0
+    ledger_mb = round(current_rss_mb() - before_mb, 1) if before_mb is not None else None
+    run = _runner(case)
+    labels = read_labels(path)
+
+    # peak_rss_mb includes the loaded dataset itself (the reset drops the high-water mark to current RSS)
+    reset_peak_rss()
+    t0 = time.perf_counter()
+    output = run(data)
+    wall_s = time.perf_counter() - t0
+    result = {"load_s": round(load_s, 3), "ledger_mb": ledger_mb, "wall_s": round(wall_s, 4),
+              "peak_rss_mb": peak_rss_mb()}
+
+    if trace:
+        # Separate pass: tracemalloc slows allocation-heavy code down a lot
+        tracemalloc.start()
+        run(data)
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["alloc_peak_mb"] = round(peak / 2**20, 2)
+
+    if case == "graph":
+        # Scored on every cluster member above; the API's capped summary page
+        # (top 20 clusters, 50 members each, clustering included) is timed here
+        import backend_logic
+        t0 = time.perf_counter()
+        backend_logic.get_investigation_data_logic(data)
+        result["summary_s"] = round(time.perf_counter() - t0, 4)
+
+    flagged, by_rule = _flagged(case, output)
+    rules = RULE_LABELS if case != "events" else {r: RULE_LABELS[r] for r in EVENT_RULES}
+    truth = {uid for uid, (lab, _g) in labels.items() if lab in rules.values()} if case == "events" else set(labels)
+    result["quality"] = _score(flagged, truth)
+    result["per_rule"] = {rule: _score(by_rule.get(rule, set()),
+                                       {uid for uid, (lab, _g) in labels.items() if lab == label})
+                          for rule, label in rules.items()} if case != "graph" else {}
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    # Prints wall time / peak RSS ratios against an older results file
+    old = {(r["size"], r["case"]): r for r in baseline["results"] if "wall_s" in r}
+    print(f"\n--- vs {baseline.get('commit')} ---")
+    for r in report["results"]:
+        prev = old.get((r["size"], r["case"]))
+        if prev and "wall_s" in r and prev["wall_s"]:
+            rss = (f"  rss x{r['peak_rss_mb'] / prev['peak_rss_mb']:.2f}"
+                   if r.get("peak_rss_mb") and prev.get("peak_rss_mb") else "")
+            print(f"{r['case']:>7} {r['size']:>10,}  time x{r['wall_s'] / prev['wall_s']:.2f}{rss}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detector / investigation graph scaling benchmark.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma separated customer counts")
+    parser.add_argument("--cases", default=",".join(CASES))
+    parser.add_argument("--data-dir", default=os.path.join(BASE_DIR, "generated", "bench"))
+    parser.add_argument("--dict-max", type=int, default=1_000_000,
+                        help="Skip dict-based cases above this size (they need the whole ledger in memory)")
+    parser.add_argument("--trace-max", type=int, default=1_000_000, help="Skip tracemalloc above this size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Default: bench_results/detectors-<commit>.json")
+    parser.add_argument("--baseline", help="Older results file to compare against")
+    parser.add_argument("--records", choices=("dict", "compact", "snapshot"), default="dict",
+                        help="Ledger type for the dict-based cases: plain dicts, customer_table.CustomerTable, "
+                             "or a memory-mapped snapshot.py file (used by every case, load_s = cold open)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    cases = [c for c in args.cases.split(",") if c]
+    commit = git_commit()
+    ctx = get_context("spawn")
+    results = []
+
+    for size in sizes:
+        for case in cases:
+            if case in DICT_CASES and size > args.dict_max:
+                results.append({"size": size, "case": case, "skipped": f"above --dict-max {args.dict_max}"})
+                continue
+            columnar = case == "numpy" and args.records != "snapshot"
+            fmt = "events" if case == "events" else "columnar" if columnar else "jsonl"
+            path = ensure_dataset(args.data_dir, size, fmt, args.seed)
+            with ctx.Pool(1) as pool:
+                if args.records == "snapshot" and case != "events":
+                    pool.apply(ensure_snapshot, (path,))
+                row = pool.apply(run_case, (case, path, size <= args.trace_max, args.records))
+            records = fmt if fmt != "jsonl" else args.records
+            results.append({"size": size, "case": case, "records": records, **row})
+            q = row["quality"]
+            print(f"{case:>7} {size:>10,}  {row['wall_s']:>9.3f}s  ledger {row['ledger_mb']} MB  rss {row['peak_rss_mb']} MB  "
+                  f"alloc {row.get('alloc_peak_mb', '-')} MB  P={q['precision']} R={q['recall']}")
+
+    report = {"commit": commit, "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+              "python": sys.version.split()[0], "cpus": os.cpu_count(), "results": results}
+    out = args.out or os.path.join(BASE_DIR, "bench_results", f"detectors-{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results -> {out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
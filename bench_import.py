@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Import-time guard for the entry modules. Each module is imported in a fresh
+# interpreter under `python -X importtime`; the best of --repeat runs is kept.
+# Exits non-zero when a module pulls in one of its FORBIDDEN heavy imports or
+# goes over --budget-ms, so it can gate CI as well as produce a report.
+#
+#   python bench_import.py
+#   python bench_import.py --budget-ms 250 --baseline bench_results/imports-<old commit>.json
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Module -> heavy imports it must NOT trigger just by being imported
+FORBIDDEN = {
+    "backend_logic": ("openai", "streamlit", "dotenv", "numpy"),
+    "storage": ("openai", "streamlit", "numpy"),
+    "mutations": ("openai", "streamlit", "numpy"),
+    "detection": ("openai", "streamlit", "numpy"),
+    "investigation": ("openai", "streamlit", "numpy"),
+    "llm_client": ("openai",),
+    "generate_data": ("openai", "streamlit", "numpy"),
+    "api_client": ("openai", "streamlit", "numpy"),
+}
+DEFAULT_BUDGET_MS = 250
+
+
+def import_profile(module):
+    # -> (total ms, [(cumulative ms, name)] of every module it pulled in).
+    # importtime prints children before their parent, indented two spaces per
+    # level; walking back from the module's own line until the indentation
+    # returns to the top level gives exactly its subtree (interpreter startup
+    # imports like site / .pth hooks are left out).
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=BASE_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, int(cumulative_us) / 1000, name.strip()))
+    end = max(i for i, (depth, _ms, name) in enumerate(rows) if depth == 0 and name == module)
+    start = end
+    while start > 0 and rows[start - 1][0] > 0:
+        start -= 1
+    return rows[end][1], [(ms, name) for _depth, ms, name in rows[start:end]]
+
+
+def profile(module, repeat):
+    best = None
+    for _ in range(repeat):
+        total, rows = import_profile(module)
+        if best is None or total < best[0]:
+            best = (total, rows)
+    total, rows = best
+    loaded = {name for _ms, name in rows}
+    heaviest = sorted(rows, reverse=True)[:5]
+    return {
+        "module": module,
+        "import_ms": round(total, 1),
+        "forbidden_loaded": [m for m in FORBIDDEN.get(module, ()) if m in loaded],
+        "heaviest": [{"module": name, "ms": round(ms, 1)} for ms, name in heaviest],
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    old = {r["module"]: r for r in baseline["results"]}
+    print(f"\n--- vs {baseline.get('commit')} ---")
+    for r in report["results"]:
+        prev = old.get(r["module"])
+        if prev and prev["import_ms"]:
+            print(f"{r['module']:>14}  {prev['import_ms']:>8.1f} -> {r['import_ms']:>8.1f} ms  "
+                  f"x{r['import_ms'] / prev['import_ms']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark / regression guard.")
+    parser.add_argument("--modules", default=",".join(FORBIDDEN))
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per module; the fastest counts")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="Fail when any module takes longer than this to import")
+    parser.add_argument("--out", help="Default: bench_results/imports-<commit>.json")
+    parser.add_argument("--baseline", help="Older results file to compare against")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results, failures = [], []
+    for module in [m for m in args.modules.split(",") if m]:
+        row = profile(module, args.repeat)
+        results.append(row)
+        slow = ", ".join(f"{h['module']} {h['ms']}ms" for h in row["heaviest"][:3])
+        print(f"{module:>14}  {row['import_ms']:>8.1f} ms   ({slow})")
+        if row["forbidden_loaded"]:
+            failures.append(f"{module} imports {', '.join(row['forbidden_loaded'])} eagerly")
+        if row["import_ms"] > args.budget_ms:
+            failures.append(f"{module} took {row['import_ms']} ms (budget {args.budget_ms} ms)")
+
+    report = {"commit": commit, "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+              "python": sys.version.split()[0], "budget_ms": args.budget_ms, "results": results}
+    out = args.out or os.path.join(BASE_DIR, "bench_results", f"imports-{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results -> {out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
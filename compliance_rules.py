@@ -0,0 +1,122 @@
+import re
+
+# Verdicts returned by prefilter()
+VIOLATION = "VIOLATION"   # unambiguous HIGH violation (a real card number) -> block locally
+BENIGN = "BENIGN"         # pure greeting / pleasantry -> approve locally, no LLM call
+ESCALATE = "ESCALATE"     # everything else -> ask the LLM judge
+
+# --- HIGH SEVERITY PATTERNS (mirror the judge's system prompt) ---
+# One combined, compiled alternation: the named group that matched tells us the category.
+# Regexes can't read negation ("never share your password", "I can't guarantee
+# returns"), so a match only labels the escalation - the LLM decides.
+HIGH_PATTERNS = {
+    "SECURITY": [
+        r"\bwhat(?:'s|\s+is)\s+(?:your|ur)\s+(?:account\s+)?(?:password|passcode|pin|2fa|otp|cvv|cvc)\b",
+        r"\b(?:send|give|share|tell|provide|confirm|read|type)\b[^.?!]{0,40}\b(?:\d[-\s]?digit\s+code|code\s+(?:we|i|that\s+was)\s+(?:just\s+)?sent)\b",
+        r"\b(?:send|give|share|tell|provide|confirm|read|type)\b[^.?!]{0,40}\b(?:password|passcode|pin|2fa|otp|one[-\s]time\s+(?:code|password)|verification\s+code|auth(?:entication|enticator)?\s+code|sms\s+code|security\s+code|cvv|cvc)\b",
+        r"\b(?:private|secret|api)\s+keys?\b",
+        r"\b(?:seed|recovery|mnemonic)\s+(?:phrase|words)\b",
+        r"\b(?:card|credit\s+card|debit\s+card)\s+(?:number|details|info(?:rmation)?)\b",
+        r"\b(?:cvv|cvc|security\s+code)\b",
+    ],
+    "GUARANTEES": [
+        r"\bguarantee(?:d|s)?\b[^.?!]{0,40}\b(?:return|returns|profit|profits|gain|gains|income|payout|win)\b",
+        r"\b(?:return|returns|profit|profits|gains?)\b[^.?!]{0,20}\bguaranteed\b",
+        r"\brisk[-\s]?free\b",
+        r"\b(?:can(?:no|')?t|cannot|won'?t)\s+(?:possibly\s+)?lose\b",
+        r"\bno\s+(?:risk|chance\s+of\s+losing)\b",
+        r"\b(?:double|triple)\s+your\s+(?:money|investment|deposit)\b",
+        r"\b\d{2,3}\s*%\s+(?:profit|return|returns|gain|gains)\b",
+    ],
+    "EVASION": [
+        r"\b(?:use|try|get|install|connect\s+(?:to|via|through))\s+(?:a\s+)?vpn\b",
+        r"\bvpn\b[^.?!]{0,40}\b(?:bypass|get\s+around|avoid|restriction|block|region|country)\b",
+        r"\b(?:bypass|skip|avoid|get\s+around|cheat)\b[^.?!]{0,20}\b(?:kyc|verification|id\s+check|identity\s+check|aml|geo[-\s]?block(?:ing)?)\b",
+        r"\b(?:hide|conceal|move|stash)\b[^.?!]{0,30}\b(?:funds|money|deposits?|assets)\b[^.?!]{0,30}\b(?:from|so\s+(?:the|no))\b",
+        r"\b(?:split|break\s+up)\b[^.?!]{0,30}\b(?:deposits?|transfers?|payments?)\b[^.?!]{0,30}\b(?:under|below|avoid)\b",
+        r"\b(?:someone\s+else'?s|a\s+friend'?s|fake)\s+(?:id|identity|documents?|account)\b",
+    ],
+}
+
+REASONS = {
+    "SECURITY": "Requested sensitive credentials (password / 2FA / card details)",
+    "GUARANTEES": "Promised guaranteed or risk-free returns",
+    "EVASION": "Suggested evading KYC, geoblocking or fund controls",
+    "CARD_NUMBER": "Shared a payment card number",
+}
+
+HIGH_REGEX = re.compile(
+    "|".join(f"(?P<{cat}_{i}>{p})" for cat, pats in HIGH_PATTERNS.items() for i, p in enumerate(pats)),
+    re.IGNORECASE,
+)
+
+# 13-19 digits, optionally grouped with spaces or dashes (blocked locally when Luhn-valid)
+CARD_CANDIDATE = re.compile(r"(?<!\d)(?:\d[ -]?){12,18}\d(?!\d)")
+# A standalone 4-8 digit code next to 2FA vocabulary ("your code is 483920").
+# Ticket and reference numbers look the same, so this only labels an escalation.
+OTP_CODE = re.compile(
+    r"\b(?:code|otp|2fa|pin|passcode|token)\b[^.?!\d]{0,25}(?<!\d)\d{4,8}(?!\d)"
+    r"|(?<!\d)\d{4,8}(?!\d)[^.?!\d]{0,25}\b(?:code|otp|2fa|passcode|token)\b",
+    re.IGNORECASE,
+)
+
+# --- BENIGN ALLOWLIST ---
+# Only messages made up entirely of these greetings and pleasantries skip the
+# LLM. Anything else - however short - is escalated.
+PLEASANTRIES = (
+    r"hi|hello|hey|good\s+(?:morning|afternoon|evening)",
+    r"(?:thanks|thank\s+you)(?:\s+(?:so|very)\s+much)?"
+    r"(?:\s+for\s+(?:your\s+patience|waiting|reaching\s+out|contacting\s+us))?",
+    r"you(?:'re|\s+are)\s+welcome|no\s+problem|my\s+pleasure|happy\s+to\s+help|glad\s+(?:i|we)\s+could\s+help",
+    r"have\s+a\s+(?:great|nice|good|lovely)\s+(?:day|evening|weekend)|bye|goodbye|take\s+care",
+    r"ok(?:ay)?|sure|got\s+it|understood|of\s+course|certainly",
+    r"one\s+moment(?:\s+please)?|please\s+hold|sorry\s+for\s+the\s+wait",
+    r"let\s+me\s+(?:check|look\s+into)(?:\s+(?:this|that|it))?(?:\s+for\s+you)?",
+    r"how\s+(?:can|may)\s+i\s+help(?:\s+you)?(?:\s+today)?",
+    r"is\s+there\s+anything\s+else\s+i\s+can\s+help(?:\s+you)?\s+with",
+)
+BENIGN_REGEX = re.compile(
+    r"^\W*(?:(?:%s)(?:\s+there)?(?:\s+again)?\b[\s,.!?]*)+$" % "|".join(PLEASANTRIES),
+    re.IGNORECASE,
+)
+
+
+def luhn_valid(digits):
+    total = 0
+    for i, ch in enumerate(reversed(digits)):
+        d = int(ch)
+        if i % 2 == 1:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return total % 10 == 0
+
+
+def _violation(category):
+    return {"is_violation": True, "severity": "HIGH", "reason": REASONS[category]}
+
+
+# ==========================================
+# PRE-FILTER
+# ==========================================
+# Returns {"verdict": VIOLATION|BENIGN|ESCALATE, "decision": <judge-shaped dict or None>, "rule": str}
+def prefilter(message):
+    text = message or ""
+
+    for candidate in CARD_CANDIDATE.findall(text):
+        digits = re.sub(r"\D", "", candidate)
+        if 13 <= len(digits) <= 19 and luhn_valid(digits):
+            return {"verdict": VIOLATION, "decision": _violation("CARD_NUMBER"), "rule": "CARD_NUMBER"}
+
+    if BENIGN_REGEX.match(text):
+        return {"verdict": BENIGN, "decision": {"is_violation": False}, "rule": "BENIGN"}
+
+    # Escalate, labelled with the HIGH pattern that fired (if any); backend_logic
+    # counts it in reguflow_prefilter_rules_total
+    m = HIGH_REGEX.search(text)
+    if m:
+        return {"verdict": ESCALATE, "decision": None, "rule": m.lastgroup.rsplit("_", 1)[0]}
+    if OTP_CODE.search(text):
+        return {"verdict": ESCALATE, "decision": None, "rule": "OTP_CODE"}
+    return {"verdict": ESCALATE, "decision": None, "rule": None}
@@ -0,0 +1,464 @@
+import json
+import socket
+import struct
+from array import array
+from bisect import bisect_left
+from collections.abc import ItemsView, Mapping, MutableMapping, Sequence, ValuesView
+
+
+# --- CANONICAL TEXT FORMS ---
+# A value is stored as a plain integer only when formatting that integer gives
+# back the exact original string; anything else ("10:00 AM", IPv6, "N/A") is
+# kept as an interned category instead, so the round trip is always lossless.
+def format_login_ms(ms):
+    # 43201005 -> "12:00:01.005 PM"
+    secs, frac = divmod(ms, 1000)
+    hour, rem = divmod(secs, 3600)
+    minute, sec = divmod(rem, 60)
+    meridiem = "AM" if hour < 12 else "PM"
+    return f"{(hour % 12) or 12:02d}:{minute:02d}:{sec:02d}.{frac:03d} {meridiem}"
+
+def encode_login_ms(text):
+    # Inverse of format_login_ms for canonical strings only (no strptime: ~1us)
+    if not isinstance(text, str) or len(text) != 15:
+        return None
+    try:
+        hour, minute, sec, frac = int(text[0:2]), int(text[3:5]), int(text[6:8]), int(text[9:12])
+    except ValueError:
+        return None
+    if not 1 <= hour <= 12:
+        return None
+    hour = hour % 12 + (12 if text[13:] == "PM" else 0)
+    ms = ((hour * 60 + minute) * 60 + sec) * 1000 + frac
+    return ms if format_login_ms(ms) == text else None
+
+def format_ip(value):
+    return f"{value >> 24 & 255}.{value >> 16 & 255}.{value >> 8 & 255}.{value & 255}"
+
+def encode_ip(text):
+    try:
+        value = struct.unpack("!I", socket.inet_aton(text))[0]
+    except (OSError, TypeError):
+        return None
+    return value if format_ip(value) == text else None
+
+
+# ==========================================
+# COLUMNS
+# ==========================================
+class TextColumn:
+    # Unique-ish strings (id, name, email, wallet): UTF-8 bytes in one heap,
+    # 12 bytes of offset/length per row instead of a ~50-80 byte str object.
+    # Updates append to the heap (the old bytes are simply no longer referenced).
+    NONE = 0xFFFFFFFF
+    BUFFERS = {"heap": "B", "start": "Q", "length": "I"}  # attribute -> array typecode (snapshot.py)
+
+    def __init__(self):
+        self.heap = bytearray()
+        self.start = array("Q")
+        self.length = array("I")
+
+    def _put(self, value):
+        if value is None:
+            return 0, self.NONE
+        data = str(value).encode()
+        pos = len(self.heap)
+        self.heap += data
+        return pos, len(data)
+
+    def append(self, value):
+        pos, n = self._put(value)
+        self.start.append(pos)
+        self.length.append(n)
+
+    def get(self, row):
+        n = self.length[row]
+        if n == self.NONE:
+            return None
+        pos = self.start[row]
+        return str(self.heap[pos:pos + n], "utf-8")  # bytearray or a mapped memoryview
+
+    def set(self, row, value):
+        self.start[row], self.length[row] = self._put(value)
+
+    def nbytes(self):
+        return len(self.heap) + self.start.itemsize * len(self.start) + self.length.itemsize * len(self.length)
+
+
+class CategoryColumn:
+    # Low-cardinality strings (status, location): one interned level per distinct value
+    BUFFERS = {"codes": "I"}
+
+    def __init__(self):
+        self.codes = array("I")
+        self.levels = []
+        self._lookup = {}
+
+    def code(self, value):
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.levels)
+            self.levels.append(value)
+        return code
+
+    def append(self, value):
+        self.codes.append(self.code(value))
+
+    def get(self, row):
+        return self.levels[self.codes[row]]
+
+    def set(self, row, value):
+        self.codes[row] = self.code(value)
+
+    def nbytes(self):
+        return self.codes.itemsize * len(self.codes)
+
+
+class EncodedColumn(CategoryColumn):
+    # ip / last_login_time: canonical values as integers (>= 0), the rest as
+    # interned levels stored as -(code + 1) in the same signed column
+    BUFFERS = {"codes": "q"}
+
+    def __init__(self, encode, decode):
+        super().__init__()
+        self.codes = array("q")
+        self.encode = encode
+        self.decode = decode
+
+    def _value(self, value):
+        number = self.encode(value)
+        return number if number is not None else -(self.code(value) + 1)
+
+    def append(self, value):
+        self.codes.append(self._value(value))
+
+    def get(self, row):
+        number = self.codes[row]
+        return self.decode(number) if number >= 0 else self.levels[-number - 1]
+
+    def set(self, row, value):
+        self.codes[row] = self._value(value)
+
+
+class NumberColumn:
+    # risk_score / deposit_amount: float64 plus one kind byte so ints come back as ints
+    NONE, INT, FLOAT = 0, 1, 2
+    BUFFERS = {"values": "d", "kinds": "B"}
+
+    def __init__(self):
+        self.values = array("d")
+        self.kinds = bytearray()
+
+    def append(self, value):
+        self.values.append(0.0 if value is None else float(value))
+        self.kinds.append(self._kind(value))
+
+    def _kind(self, value):
+        if value is None:
+            return self.NONE
+        return self.INT if isinstance(value, int) and not isinstance(value, bool) else self.FLOAT
+
+    def get(self, row):
+        kind = self.kinds[row]
+        if kind == self.NONE:
+            return None
+        value = self.values[row]
+        return int(value) if kind == self.INT else value
+
+    def set(self, row, value):
+        self.values[row] = 0.0 if value is None else float(value)
+        self.kinds[row] = self._kind(value)
+
+    def nbytes(self):
+        return self.values.itemsize * len(self.values) + len(self.kinds)
+
+
+# Same fields, same order as storage.CUSTOMER_FIELDS
+FIELD_COLUMNS = {
+    "id": TextColumn,
+    "name": TextColumn,
+    "email": TextColumn,
+    "ip": lambda: EncodedColumn(encode_ip, format_ip),
+    "wallet": TextColumn,
+    "risk_score": NumberColumn,
+    "status": CategoryColumn,
+    "last_login_location": CategoryColumn,
+    "last_login_time": lambda: EncodedColumn(encode_login_ms, format_login_ms),
+    "deposit_amount": NumberColumn,
+}
+
+
+# ==========================================
+# CUSTOMER TABLE (struct of arrays)
+# ==========================================
+# Drop-in for the {id: {field: value}} ledger: table[uid] / .values() / .items()
+# hand out CustomerView rows that read (and write) the columns on access.
+# A fixed field the source record lacked is stored as None and reads as
+# absent (KeyError, .get() default, not in `in` / iteration / to_dict()),
+# so a row looks exactly like its source record. None values count as
+# absent too, the same as a NULL column in SQLite. Anything else a record
+# carries lives in a sparse per-row `extra` dict.
+class CustomerTable(Mapping):
+    readonly = False
+
+    def __init__(self):
+        self.columns = {name: make() for name, make in FIELD_COLUMNS.items()}
+        self.extra = {}            # row -> {field: value} for non-standard fields
+        self._ids = self.columns["id"]
+        self._order = None         # rows sorted by id, built on the first lookup
+
+    @classmethod
+    def from_buffers(cls, buffers, levels, order, extra, keepalive=None):
+        # Read-only table over existing buffers (memoryviews of a mapped
+        # snapshot, see snapshot.py): nothing is copied or parsed up front.
+        table = cls()
+        for name, column in table.columns.items():
+            for attr, buf in buffers[name].items():
+                setattr(column, attr, buf)
+            if name in levels:
+                column.levels = levels[name]
+                column._lookup = {value: code for code, value in enumerate(column.levels)}
+        table.extra = extra
+        table._order = order
+        table.readonly = True
+        table._keepalive = keepalive  # the mmap must outlive every view into it
+        return table
+
+    @classmethod
+    def from_records(cls, records):
+        # Any iterable of dicts (JSON values, JSONL lines, SQLite rows as dicts ...)
+        table = cls()
+        for record in records:
+            table.append(record)
+        return table
+
+    def _check_writable(self):
+        if self.readonly:
+            raise TypeError("Snapshot tables are read-only - write through the storage engine")
+
+    def append(self, record):
+        self._check_writable()
+        row = len(self)
+        get = record.get
+        for name, column in self.columns.items():
+            column.append(get(name))
+        if record.keys() - self.columns.keys():
+            self.extra[row] = {k: record[k] for k in record if k not in self.columns}
+        self._order = None
+        return row
+
+    # --- ROW LOOKUP ---
+    # A sorted row permutation + binary search: 4 bytes per row, where a
+    # {id: row} dict would cost ~100 bytes per row and undo most of the savings.
+    def _sorted_rows(self):
+        if self._order is None:
+            ids = self._ids
+            self._order = array("I", sorted(range(len(self)), key=ids.get))
+        return self._order
+
+    def row_of(self, uid):
+        order = self._sorted_rows()
+        i = bisect_left(order, uid, key=self._ids.get)
+        if i < len(order) and self._ids.get(order[i]) == uid:
+            return order[i]
+        return None
+
+    # --- MAPPING PROTOCOL ---
+    def __getitem__(self, uid):
+        row = self.row_of(uid)
+        if row is None:
+            raise KeyError(uid)
+        return CustomerView(self, row)
+
+    def __contains__(self, uid):
+        return self.row_of(uid) is not None
+
+    def __iter__(self):
+        get = self._ids.get
+        return (get(row) for row in range(len(self)))
+
+    def __len__(self):
+        return len(self._ids.length)
+
+    def values(self):
+        return _RowValues(self)
+
+    def items(self):
+        return _RowItems(self)
+
+    def rows(self):
+        # Row order = insertion order, like the dict it replaces
+        return (CustomerView(self, row) for row in range(len(self)))
+
+    # --- FIELD ACCESS (used by CustomerView) ---
+    def field(self, row, name):
+        column = self.columns.get(name)
+        if column is not None:
+            value = column.get(row)
+            if value is None:
+                raise KeyError(name)
+            return value
+        return self.extra[row][name]  # KeyError when absent, like a dict
+
+    def set_field(self, row, name, value):
+        self._check_writable()
+        column = self.columns.get(name)
+        if column is None:
+            self.extra.setdefault(row, {})[name] = value
+            return
+        column.set(row, value)
+        if name == "id":
+            self._order = None
+
+    def present(self, row):
+        # Fixed fields this row actually has, in column order
+        return [name for name, column in self.columns.items() if column.get(row) is not None]
+
+    def record(self, row):
+        rec = {}
+        for name, column in self.columns.items():
+            value = column.get(row)
+            if value is not None:
+                rec[name] = value
+        rec.update(self.extra.get(row, ()))
+        return rec
+
+    def to_dict(self):
+        # Plain {id: dict} copy (JSON responses, pickling, export)
+        return {rec["id"]: rec for rec in map(self.record, range(len(self)))}
+
+    def nbytes(self):
+        # Column payload only (levels and extras excluded); for benchmarks
+        order = self._order.itemsize * len(self._order) if self._order is not None else 0
+        return sum(c.nbytes() for c in self.columns.values()) + order
+
+    def __reduce__(self):
+        # Pickles (st.cache_data, multiprocessing) as the plain ledger
+        return (dict, (self.to_dict(),))
+
+
+class RowSequence(Sequence):
+    # table rows by position (CustomerColumns.records for a table-backed scan)
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, row):
+        if not 0 <= row < len(self.table):
+            raise IndexError(row)
+        return CustomerView(self.table, int(row))
+
+
+class _RowValues(ValuesView):
+    # Walk the rows directly instead of Mapping's key -> lookup round trip
+    def __iter__(self):
+        return self._mapping.rows()
+
+class _RowItems(ItemsView):
+    def __iter__(self):
+        table = self._mapping
+        return ((view["id"], view) for view in table.rows())
+
+
+class CustomerView(MutableMapping):
+    # One customer, read lazily from the table. Reads, writes, .get() and
+    # `in` behave like the source record (absent fields stay absent);
+    # copy/deepcopy/pickle (and so dataclasses.asdict on a Threat) turn it
+    # into a real dict.
+    __slots__ = ("table", "row")
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, name):
+        # Inlined table.field(): this is the detectors' innermost call
+        column = self.table.columns.get(name)
+        if column is not None:
+            value = column.get(self.row)
+            if value is None:
+                raise KeyError(name)
+            return value
+        return self.table.extra[self.row][name]
+
+    def get(self, name, default=None):
+        # Mapping.get goes through __getitem__ + KeyError; this is a hot path
+        column = self.table.columns.get(name)
+        if column is not None:
+            value = column.get(self.row)
+            return default if value is None else value
+        return self.table.extra.get(self.row, {}).get(name, default)
+
+    def __setitem__(self, name, value):
+        self.table.set_field(self.row, name, value)
+
+    def __delitem__(self, name):
+        self.table._check_writable()
+        column = self.table.columns.get(name)
+        if column is not None:
+            if column.get(self.row) is None:
+                raise KeyError(name)
+            self.table.set_field(self.row, name, None)
+            return
+        extra = self.table.extra.get(self.row)
+        if extra is None or name not in extra:
+            raise KeyError(name)
+        del extra[name]
+
+    def __iter__(self):
+        yield from self.table.present(self.row)
+        yield from self.table.extra.get(self.row, ())
+
+    def __len__(self):
+        return len(self.table.present(self.row)) + len(self.table.extra.get(self.row, ()))
+
+    def __contains__(self, name):
+        column = self.table.columns.get(name)
+        if column is not None:
+            return column.get(self.row) is not None
+        return name in self.table.extra.get(self.row, ())
+
+    def to_dict(self):
+        return self.table.record(self.row)
+
+    def __reduce__(self):
+        return (dict, (self.to_dict(),))
+
+    def __copy__(self):
+        return self.to_dict()
+
+    def __deepcopy__(self, memo):
+        return self.to_dict()
+
+    def __repr__(self):
+        return f"CustomerView({self.to_dict()!r})"
+
+
+def as_plain(customers):
+    # {id: dict} whatever the ledger type (for JSON encoders that want real dicts)
+    if isinstance(customers, CustomerTable):
+        return customers.to_dict()
+    return customers
+
+
+if __name__ == "__main__":
+    # python customer_table.py [customers.json]  -> memory of dicts vs table
+    import sys
+    import tracemalloc
+    path = sys.argv[1] if len(sys.argv) > 1 else "customers.json"
+    with open(path) as f:
+        raw = f.read()
+    tracemalloc.start()
+    ledger = json.loads(raw)
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    table = CustomerTable.from_records(ledger.values())
+    table.row_of("")  # build the lookup permutation too
+    table_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert table.to_dict() == ledger, "round trip changed the data"
+    print(f"{len(ledger):,} customers: dicts {dict_bytes / 2**20:.2f} MB, "
+          f"table {table_bytes / 2**20:.2f} MB (x{dict_bytes / max(table_bytes, 1):.1f} smaller)")
@@ -0,0 +1,189 @@
+from dataclasses import dataclass, field
+
+# --- DEFAULT THRESHOLDS ---
+# Override any of these per scan: DetectionEngine({"shared_ip_min_users": 10})
+DEFAULT_THRESHOLDS = {
+    "shared_ip_min_users": 4,       # IP Syndicate: more than 3 accounts on one IP
+    "smurf_min_amount": 9800,       # Structuring: deposits in [9800, 10000)
+    "smurf_max_amount": 10000,
+    "smurf_min_users": 3,           # ... by more than 2 accounts
+    "travel_marker": "->",          # Impossible Travel: "Lagos -> London (5min)"
+    "bot_min_users": 5,             # Bot Swarm: more than 4 accounts on one login timestamp
+    # Login event detectors (detection_events.py)
+    "velocity_window_ms": 2,        # Bot Swarm: bot_min_users accounts inside a sliding 2 ms window
+    "velocity_bucket_ms": 1,        # ... counted in 1 ms buckets
+    "velocity_baseline_ms": 600_000,    # ... unless the stream's 10 min average rate makes that many normal:
+    "velocity_false_alarm": 1e-7,       # ... then as many as Poisson traffic reaches with this probability
+    "velocity_burst_max_users": 10_000, # accounts kept per burst report
+    "velocity_max_bursts": 1_000,       # newest bursts kept for threats(); older ones are dropped
+    "travel_min_km": 500,           # Impossible Travel: consecutive logins >= 500 km apart
+    "travel_max_kmh": 1000,         # ... faster than an airliner
+}
+
+
+# --- THREAT RECORD ---
+@dataclass
+class Threat:
+    rule: str           # detector name (registry key)
+    key: str            # what the group shares (IP, timestamp, ...) - stable id within a rule
+    title: str
+    desc: str
+    severity: str       # "Medium" | "High" | "Critical"
+    color: str
+    users: list = field(default_factory=list)
+
+    @property
+    def id(self):
+        return f"{self.rule}:{self.key}"
+
+    @property
+    def user_ids(self):
+        return [u["id"] for u in self.users]
+
+
+# --- THREAT PRESENTATION (shared by every backend) ---
+def make_threat(rule, key, users):
+    if rule == "shared_ip":
+        return Threat(rule, key, "Syndicate Ring (Shared IP)", f"IP: {key}", "High", "red", users)
+    if rule == "smurfing":
+        return Threat(rule, key, "Structuring / Smurfing Ring",
+                      "Pattern: Multiple deposits just under $10k threshold.", "Medium", "orange", users)
+    if rule == "impossible_travel":
+        return Threat(rule, key, "Impossible Travel Event",
+                      "User logged in from two distant countries in < 5 mins.", "Critical", "red", users)
+    if rule == "bot_swarm":
+        return Threat(rule, key, "High-Frequency Botnet",
+                      f"Timestamp Match: {key} (Precision: 1ms)", "High", "red", users)
+    raise KeyError(f"No presentation for rule '{rule}'")
+
+
+# --- DETECTOR REGISTRY ---
+# Each detector sees every customer exactly once via observe() and reports
+# its threats from finish(). The engine drives all of them in a single pass.
+DETECTORS = {}
+
+def register(name):
+    def wrap(cls):
+        cls.name = name
+        DETECTORS[name] = cls
+        return cls
+    return wrap
+
+
+class Detector:
+    name = None
+
+    def __init__(self, thresholds):
+        self.t = thresholds
+
+    def observe(self, uid, user):
+        raise NotImplementedError
+
+    def finish(self):
+        raise NotImplementedError
+
+
+@register("shared_ip")
+class SharedIpDetector(Detector):
+    def __init__(self, thresholds):
+        super().__init__(thresholds)
+        self.groups = {}
+
+    def observe(self, uid, user):
+        # setdefault + append: amortised O(1), no list copy per member
+        self.groups.setdefault(user["ip"], []).append(user)
+
+    def finish(self):
+        for ip, users in self.groups.items():
+            if len(users) >= self.t["shared_ip_min_users"]:
+                yield make_threat(self.name, ip, users)
+
+
+@register("smurfing")
+class SmurfingDetector(Detector):
+    def __init__(self, thresholds):
+        super().__init__(thresholds)
+        self.smurfs = []
+
+    def observe(self, uid, user):
+        if self.t["smurf_min_amount"] <= user["deposit_amount"] < self.t["smurf_max_amount"]:
+            self.smurfs.append(user)
+
+    def finish(self):
+        if len(self.smurfs) >= self.t["smurf_min_users"]:
+            yield make_threat(self.name, "structuring", self.smurfs)
+
+
+@register("impossible_travel")
+class ImpossibleTravelDetector(Detector):
+    def __init__(self, thresholds):
+        super().__init__(thresholds)
+        self.travelers = []
+
+    def observe(self, uid, user):
+        if self.t["travel_marker"] in user.get("last_login_location", ""):
+            self.travelers.append(user)
+
+    def finish(self):
+        if self.travelers:
+            yield make_threat(self.name, "travel", self.travelers)
+
+
+@register("bot_swarm")
+class BotSwarmDetector(Detector):
+    def __init__(self, thresholds):
+        super().__init__(thresholds)
+        self.groups = {}
+
+    def observe(self, uid, user):
+        self.groups.setdefault(user.get("last_login_time"), []).append(user)
+
+    def finish(self):
+        for t, users in self.groups.items():
+            if len(users) >= self.t["bot_min_users"]:
+                yield make_threat(self.name, str(t), users)
+
+
+# --- ENGINE ---
+class DetectionEngine:
+    def __init__(self, thresholds=None, rules=None):
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.rules = list(rules) if rules else list(DETECTORS)
+        unknown = [r for r in self.rules if r not in DETECTORS]
+        if unknown:
+            raise KeyError(f"Unknown detector(s): {unknown}")
+
+    def scan(self, customers):
+        detectors = [DETECTORS[name](self.thresholds) for name in self.rules]
+        observers = [d.observe for d in detectors]
+
+        # ONE pass over the ledger; banned users are already neutralised
+        for uid, user in customers.items():
+            if user["status"] == "BANNED":
+                continue
+            for observe in observers:
+                observe(uid, user)
+
+        threats = []
+        for d in detectors:
+            threats.extend(d.finish())
+        return threats
+
+
+def detect_threats(customers, thresholds=None, rules=None, backend="python", events=None):
+    # events (login events, see detection_events.py) -> bot_swarm / impossible_travel
+    # come from the event stream instead of the last_login_* snapshot fields
+    if events is not None:
+        from detection_events import EVENT_RULES, LoginEventEngine
+        rules = list(rules or DETECTORS)
+        ledger_rules = [r for r in rules if r not in EVENT_RULES]
+        event_rules = [r for r in rules if r in EVENT_RULES]
+        threats = detect_threats(customers, thresholds, ledger_rules, backend) if ledger_rules else []
+        if event_rules:
+            threats += LoginEventEngine(thresholds, event_rules).scan(events, customers)
+        return threats
+    # backend="numpy" -> vectorised column scan (detection_columnar, needs numpy)
+    if backend == "numpy":
+        from detection_columnar import ColumnarDetectionEngine
+        return ColumnarDetectionEngine(thresholds, rules).scan(customers)
+    return DetectionEngine(thresholds, rules).scan(customers)
@@ -0,0 +1,246 @@
+import json
+import socket
+import struct
+import time as _time
+
+import numpy as np
+
+from customer_table import CustomerTable, RowSequence, encode_ip
+from detection import DEFAULT_THRESHOLDS, make_threat
+
+# Rules the columnar backend knows how to vectorise
+COLUMNAR_RULES = ("shared_ip", "smurfing", "impossible_travel", "bot_swarm")
+
+
+# --- PARSERS (run once at load time, never during a scan) ---
+# IP codes: canonical dotted IPv4 packs to its uint32 value; every other string
+# (IPv6, "N/A", odd spellings, None) is interned to its own code from
+# IP_LEVEL_BASE up, so grouping matches the python backend's exact-string keys.
+IP_LEVEL_BASE = 1 << 32
+
+def pack_ip(ip):
+    # "192.168.10.5" -> 3232238085, or None when ip isn't canonical IPv4
+    return encode_ip(ip)
+
+def unpack_ip(value):
+    return socket.inet_ntoa(struct.pack("!I", int(value)))
+
+def parse_login_ms(text):
+    # "12:00:01.005 PM" / "10:00 AM" -> milliseconds since midnight, or None
+    if not text:
+        return None
+    clock, _, meridiem = text.strip().partition(" ")
+    frac = 0
+    if "." in clock:
+        clock, _, ms = clock.partition(".")
+        frac = int(ms.ljust(3, "0")[:3])
+    for fmt in ("%I:%M:%S", "%I:%M", "%H:%M:%S", "%H:%M"):
+        try:
+            t = _time.strptime(clock, fmt)
+            break
+        except ValueError:
+            continue
+    else:
+        return None
+    hour = t.tm_hour
+    if meridiem.upper() == "PM" and hour != 12:
+        hour += 12
+    elif meridiem.upper() == "AM" and hour == 12:
+        hour = 0
+    return ((hour * 60 + t.tm_min) * 60 + t.tm_sec) * 1000 + frac
+
+
+# ==========================================
+# CUSTOMER COLUMNS (struct of arrays)
+# ==========================================
+class CustomerColumns:
+    def __init__(self, ids, deposit, ip, login_ms, status_codes, status_levels, travel, records=None,
+                 ip_levels=None):
+        self.ids = ids                      # object array of customer ids (None when records has them)
+        self.deposit = deposit              # float64
+        self.ip = ip                        # int64 packed IPv4, or IP_LEVEL_BASE + index into ip_levels
+        self.ip_levels = ip_levels or []    # IP strings that aren't canonical IPv4
+        self.login_ms = login_ms            # int64 ms since midnight (negative = unparseable, one code per string)
+        self.status_codes = status_codes    # unsigned codes into status_levels
+        self.status_levels = status_levels  # list of status strings
+        self.travel = travel                # bool: location contains the travel marker
+        self.records = records              # original dicts (optional) for rendering threats
+
+    def __len__(self):
+        return len(self.deposit)
+
+    @classmethod
+    def from_customers(cls, customers, travel_marker=DEFAULT_THRESHOLDS["travel_marker"]):
+        n = len(customers)
+        records = list(customers.values())
+        deposit = np.empty(n, dtype=np.float64)
+        ip = np.empty(n, dtype=np.int64)
+        login_ms = np.empty(n, dtype=np.int64)
+        travel = np.zeros(n, dtype=bool)
+        status_levels, status_lookup = [], {}
+        status_codes = np.empty(n, dtype=np.uint32)  # same width as from_table's codes
+        ip_cache, login_cache, ip_levels = {}, {}, []
+
+        for i, u in enumerate(records):
+            deposit[i] = u["deposit_amount"]
+
+            addr = u["ip"]
+            packed = ip_cache.get(addr)
+            if packed is None:
+                packed = pack_ip(addr)
+                if packed is None:
+                    packed = IP_LEVEL_BASE + len(ip_levels)
+                    ip_levels.append(addr)
+                ip_cache[addr] = packed
+            ip[i] = packed
+
+            raw = u.get("last_login_time")
+            ms = login_cache.get(raw)
+            if ms is None:
+                ms = parse_login_ms(raw)
+                if ms is None:  # keep exact-string grouping for odd values
+                    ms = -(len(login_cache) + 1)
+                login_cache[raw] = ms
+            login_ms[i] = ms
+
+            code = status_lookup.get(u["status"])
+            if code is None:
+                code = status_lookup[u["status"]] = len(status_levels)
+                status_levels.append(u["status"])
+            status_codes[i] = code
+
+            travel[i] = travel_marker in u.get("last_login_location", "")
+
+        ids = np.array([u["id"] for u in records], dtype=object)
+        return cls(ids, deposit, ip, login_ms, status_codes, status_levels, travel, records, ip_levels)
+
+    @classmethod
+    def from_table(cls, table, travel_marker=DEFAULT_THRESHOLDS["travel_marker"]):
+        # customer_table.CustomerTable (e.g. a mapped snapshot) -> columns
+        # without a per-row Python loop. deposit and status are zero-copy
+        # views of the table's buffers; ip / login time only translate their
+        # interned odd values (negative codes) - one lookup per level, not per row.
+        c = table.columns
+        deposit = np.frombuffer(c["deposit_amount"].values, dtype=np.float64)
+        status_codes = np.frombuffer(c["status"].codes, dtype=np.uint32)
+
+        def decode(column, parse):
+            codes = np.frombuffer(column.codes, dtype=np.int64)
+            if not column.levels:
+                return codes
+            lookup = np.array([parse(level, i) for i, level in enumerate(column.levels)], dtype=np.int64)
+            return np.where(codes >= 0, codes, lookup[np.maximum(-codes - 1, 0)])
+
+        def login(level, i):
+            ms = parse_login_ms(level)
+            return -(i + 1) if ms is None else ms  # keep exact-string grouping for odd values
+
+        ip = decode(c["ip"], lambda _level, i: IP_LEVEL_BASE + i)  # table levels are the non-canonical IPs
+        login_ms = decode(c["last_login_time"], login)
+        location = c["last_login_location"]
+        marked = np.array([travel_marker in (level or "") for level in location.levels], dtype=bool)
+        travel = (marked[np.frombuffer(location.codes, dtype=np.uint32)] if marked.size
+                  else np.zeros(len(deposit), dtype=bool))
+        return cls(None, deposit, ip, login_ms, status_codes, list(c["status"].levels), travel,
+                   RowSequence(table), list(c["ip"].levels))
+
+    # --- PERSISTENCE (.npz, loads without touching JSON) ---
+    def save(self, path):
+        ids = self.ids if self.ids is not None else np.array([u["id"] for u in self.records], dtype=object)
+        np.savez(path, ids=ids.astype(str), deposit=self.deposit, ip=self.ip,
+                 login_ms=self.login_ms, status_codes=self.status_codes,
+                 status_levels=np.array(self.status_levels, dtype=str), travel=self.travel,
+                 ip_levels=np.array(json.dumps(self.ip_levels)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            ip_levels = json.loads(str(z["ip_levels"])) if "ip_levels" in z.files else []
+            return cls(z["ids"].astype(object), z["deposit"], z["ip"].astype(np.int64), z["login_ms"],
+                       z["status_codes"], list(z["status_levels"]), z["travel"], ip_levels=ip_levels)
+
+    def ip_text(self, code):
+        code = int(code)
+        return unpack_ip(code) if code < IP_LEVEL_BASE else self.ip_levels[code - IP_LEVEL_BASE]
+
+    def status_code(self, status):
+        return self.status_levels.index(status) if status in self.status_levels else -1
+
+    def user(self, i):
+        # Original record when we have it, otherwise a minimal view rebuilt from the columns
+        if self.records is not None:
+            return self.records[i]
+        return {"id": str(self.ids[i]), "name": str(self.ids[i]),
+                "deposit_amount": float(self.deposit[i]), "ip": self.ip_text(self.ip[i]),
+                "status": self.status_levels[self.status_codes[i]],
+                "last_login_location": "->" if self.travel[i] else "N/A"}
+
+    def users(self, rows):
+        return [self.user(i) for i in rows]
+
+
+# --- VECTORISED GROUP-BY ---
+# Returns [(key, row_indices), ...] for every key that occurs >= min_size times
+# among the selected rows, in order of each group's first ledger row (the order
+# the python engine's dicts produce). One argsort + run-length boundaries (what np.unique
+# does internally with return_counts) - the only Python loop is over hot groups.
+def _groups(values, rows, min_size):
+    if rows.size == 0:
+        return []
+    vals = values if rows.size == values.size else values[rows]
+    order = np.argsort(vals)
+    sorted_vals = vals[order]
+    starts = np.flatnonzero(np.concatenate(([True], sorted_vals[1:] != sorted_vals[:-1])))
+    counts = np.diff(np.append(starts, sorted_vals.size))
+    out = []
+    for g in np.flatnonzero(counts >= min_size):
+        members = order[starts[g]:starts[g] + counts[g]]
+        members.sort()  # keep ledger order inside a group
+        out.append((sorted_vals[starts[g]], rows[members]))
+    out.sort(key=lambda group: group[1][0])
+    return out
+
+
+# ==========================================
+# COLUMNAR ENGINE
+# ==========================================
+class ColumnarDetectionEngine:
+    def __init__(self, thresholds=None, rules=None):
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.rules = list(rules) if rules else list(COLUMNAR_RULES)
+        unknown = [r for r in self.rules if r not in COLUMNAR_RULES]
+        if unknown:
+            raise KeyError(f"Detector(s) not available in the columnar backend: {unknown}")
+
+    def scan(self, cols):
+        if isinstance(cols, CustomerTable):
+            cols = CustomerColumns.from_table(cols, self.thresholds["travel_marker"])
+        elif not isinstance(cols, CustomerColumns):
+            cols = CustomerColumns.from_customers(cols, self.thresholds["travel_marker"])
+        t = self.thresholds
+        active = cols.status_codes != cols.status_code("BANNED")
+        active_rows = np.flatnonzero(active)
+        threats = []
+
+        if "shared_ip" in self.rules:
+            for key, rows in _groups(cols.ip, active_rows, t["shared_ip_min_users"]):
+                ip = cols.ip_text(key)
+                threats.append(make_threat("shared_ip", ip, cols.users(rows)))
+
+        if "smurfing" in self.rules:
+            rows = np.flatnonzero(active & (cols.deposit >= t["smurf_min_amount"])
+                                  & (cols.deposit < t["smurf_max_amount"]))
+            if rows.size >= t["smurf_min_users"]:
+                threats.append(make_threat("smurfing", "structuring", cols.users(rows)))
+
+        if "impossible_travel" in self.rules:
+            rows = np.flatnonzero(active & cols.travel)
+            if rows.size:
+                threats.append(make_threat("impossible_travel", "travel", cols.users(rows)))
+
+        if "bot_swarm" in self.rules:
+            for key, rows in _groups(cols.login_ms, active_rows, t["bot_min_users"]):
+                first = cols.user(rows[0])
+                label = first.get("last_login_time", str(int(key)))
+                threats.append(make_threat("bot_swarm", str(label), cols.users(rows)))
+        return threats
@@ -0,0 +1,323 @@
+import math
+from array import array
+from collections import deque, namedtuple
+from datetime import datetime, timezone
+
+from detection import DEFAULT_THRESHOLDS, make_threat
+
+# One login: epoch milliseconds (UTC), customer id, IP and geolocation in
+# degrees (lat / lon None when the IP did not geolocate). Detectors take the
+# fields positionally, so plain tuples in this order work just as well.
+LoginEvent = namedtuple("LoginEvent", "ts_ms uid ip lat lon")
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180  # ~111.2 km of meridian (or equator) per degree
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((p2 - p1) / 2) ** 2
+         + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+def format_ts(ts_ms):
+    # 1767268801005 -> "2026-01-01 12:00:01.005" (UTC)
+    stamp = datetime.fromtimestamp(ts_ms // 1000, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    return f"{stamp}.{ts_ms % 1000:03d}"
+
+
+# ==========================================
+# PER-USER LAST-EVENT INDEX
+# ==========================================
+# uid -> previous login (ts, lat, lon) in parallel typed arrays: one slot per
+# account (~16 bytes) instead of a tuple of boxed numbers. New accounts are
+# logged in hourly buckets; when a bucket falls behind the horizon, accounts
+# idle since then give their slot back and the rest move to the newest
+# bucket. Memory follows the accounts active within the horizon, not everyone
+# ever seen, and each account is re-checked at most once per horizon.
+class LastEventIndex:
+    def __init__(self, horizon_ms, bucket_ms=3_600_000):
+        self.horizon_ms = horizon_ms
+        self.bucket_ms = bucket_ms
+        self.slots = {}
+        self.ts = array("q")
+        self.lat = array("f")
+        self.lon = array("f")
+        self.free = []
+        self.log = deque()      # (bucket end ms, [uid, ...]) oldest first, each uid once
+        self._touched = None    # uid list of the newest bucket
+        self._roll_at = -math.inf
+
+    def __len__(self):
+        return len(self.slots)
+
+    def swap(self, uid, ts, lat, lon):
+        # Store this login and return the account's previous one (None if new).
+        # An out-of-order older login is compared but doesn't replace a newer one.
+        if ts >= self._roll_at:
+            self._roll(ts)
+        slot = self.slots.get(uid)
+        if slot is None:
+            self._touched.append(uid)
+            if self.free:
+                slot = self.free.pop()
+                self.ts[slot], self.lat[slot], self.lon[slot] = ts, lat, lon
+            else:
+                slot = len(self.ts)
+                self.ts.append(ts)
+                self.lat.append(lat)
+                self.lon.append(lon)
+            self.slots[uid] = slot
+            return None
+        stamps = self.ts
+        prev_ts = stamps[slot]
+        prev = (prev_ts, self.lat[slot], self.lon[slot])
+        if ts >= prev_ts:
+            stamps[slot], self.lat[slot], self.lon[slot] = ts, lat, lon
+        return prev
+
+    def _roll(self, ts):
+        # New bucket; forget accounts whose last login is behind the horizon
+        log, slots, stamps = self.log, self.slots, self.ts
+        self._roll_at = (ts // self.bucket_ms + 1) * self.bucket_ms
+        touched = self._touched = []
+        cutoff = ts - self.horizon_ms
+        while log and log[0][0] <= cutoff:
+            for uid in log.popleft()[1]:
+                slot = slots[uid]
+                if stamps[slot] < cutoff:
+                    del slots[uid]
+                    self.free.append(slot)
+                else:
+                    touched.append(uid)
+        log.append((self._roll_at, touched))
+
+
+# --- EVENT DETECTOR REGISTRY ---
+# Same contract as detection.DETECTORS, fed login events instead of ledger
+# rows: observe(ts, uid, ip, lat, lon) per event, finish(users) any time
+# (it must not consume state, so a live stream can be polled). Rule names
+# and presentation match the snapshot detectors they replace.
+EVENT_DETECTORS = {}
+
+def register(name):
+    def wrap(cls):
+        cls.name = name
+        EVENT_DETECTORS[name] = cls
+        return cls
+    return wrap
+
+
+def poisson_threshold(lam, alpha, floor):
+    # Smallest n >= floor with P(X >= n) <= alpha for X ~ Poisson(lam)
+    if lam <= 0:
+        return floor
+    # Below the mean the tail is ~1/2 or more, so start there: from n >= lam on
+    # the terms only shrink and the first one can't underflow
+    log_lam, n = math.log(lam), max(floor, int(lam))
+    while True:
+        tail, i = 0.0, n
+        term = math.exp(-lam + n * log_lam - math.lgamma(n + 1))
+        while term > alpha * 1e-6:
+            tail += term
+            i += 1
+            term *= lam / i
+        if tail <= alpha:
+            return n
+        n += 1
+
+
+@register("bot_swarm")
+class LoginVelocityDetector:
+    # Too many distinct accounts logging in within a sliding
+    # velocity_window_ms. Logins land in velocity_bucket_ms buckets; the
+    # window is the newest `span` buckets plus a per-account login count, so
+    # every event is added once and expired once (linear in the stream,
+    # memory bounded by the window). Back-to-back hot windows merge into one
+    # burst that reports the accounts seen while it lasted (at most
+    # velocity_burst_max_users of them). Only the newest velocity_max_bursts
+    # finished bursts are kept, so a long-running engine stays bounded.
+    #
+    # "Too many" is relative to the stream's own rate: an exponential moving
+    # average of logins per bucket (horizon velocity_baseline_ms) gives the
+    # expected count per window, and the window is hot once plain Poisson
+    # traffic at that rate would reach its size with probability
+    # <= velocity_false_alarm. Never below bot_min_users, so a quiet stream
+    # behaves like a fixed threshold; a short swarm barely moves the average,
+    # a lasting surge becomes the new normal.
+    def __init__(self, t):
+        self.bucket_ms = max(1, int(t["velocity_bucket_ms"]))
+        self.span = max(1, -(-int(t["velocity_window_ms"]) // self.bucket_ms))
+        self.min_users = t["bot_min_users"]
+        self.alpha = t["velocity_false_alarm"]
+        self.decay = 1 - self.bucket_ms / max(self.bucket_ms, t["velocity_baseline_ms"])
+        self.max_users = t["velocity_burst_max_users"]
+        self.threshold = self.min_users
+        self.rate = 0.0         # logins per bucket, moving average
+        self._sum = self._weight = 0.0
+        self._rate_at = 0.0     # rate the threshold was last computed for
+        self.arrivals = 0       # logins in the newest bucket
+        self.queue = deque()    # (bucket number, uid) per login inside the window, oldest first
+        self.newest = -math.inf
+        self.window = {}        # uid -> logins in the window
+        self.burst = None       # [window start ms, {uid: None}] while the window is hot
+        self.bursts = deque(maxlen=max(1, int(t["velocity_max_bursts"])))
+        self.dropped = 0        # finished bursts pushed out of self.bursts
+        self.late = 0           # events older than the window (not counted)
+
+    def observe(self, ts, uid, ip, lat, lon):
+        bucket = ts // self.bucket_ms
+        if bucket > self.newest:
+            if self.newest > -math.inf:
+                self._update_rate(bucket - self.newest)
+            self.newest = bucket
+            self.arrivals = 0
+            queue = self.queue
+            if queue and queue[0][0] <= bucket - self.span:
+                self._expire(bucket - self.span)
+        elif bucket <= self.newest - self.span:
+            self.late += 1
+            return
+        self.queue.append((self.newest, uid))  # a slightly late event counts in the newest bucket
+        self.arrivals += 1
+        window = self.window
+        window[uid] = window.get(uid, 0) + 1
+
+        if len(window) >= self.threshold:
+            if self.burst is None:
+                self.burst = [self.queue[0][0] * self.bucket_ms, dict.fromkeys(window)]
+            elif len(self.burst[1]) < self.max_users:
+                self.burst[1][uid] = None
+        elif self.burst is not None:
+            if len(self.bursts) == self.bursts.maxlen:
+                self.dropped += 1
+            self.bursts.append(self.burst)
+            self.burst = None
+
+    def _update_rate(self, steps):
+        # Close the newest bucket, then (steps - 1) empty ones. The average
+        # starts at 0, so it is divided by the weight seen so far (bias
+        # correction) - otherwise the first minutes would look quiet.
+        empty = self.decay ** min(steps - 1, 1 << 20)
+        self._sum = (self._sum * self.decay + self.arrivals * (1 - self.decay)) * empty
+        self._weight = 1 - (1 - self._weight) * self.decay * empty
+        self.rate = rate = self._sum / self._weight
+        if abs(rate - self._rate_at) > 0.01 * self._rate_at or (rate == 0) != (self._rate_at == 0):
+            self._rate_at = rate
+            self.threshold = poisson_threshold(rate * self.span, self.alpha, self.min_users)
+
+    def _expire(self, oldest):
+        queue, window = self.queue, self.window
+        while queue and queue[0][0] <= oldest:
+            uid = queue.popleft()[1]
+            n = window[uid] - 1
+            if n:
+                window[uid] = n
+            else:
+                del window[uid]
+
+    def finish(self, users):
+        for start, uids in [*self.bursts, *([self.burst] if self.burst else [])]:
+            members = users(uids)
+            if len(members) >= self.min_users:
+                yield make_threat(self.name, format_ts(start), members)
+
+
+@register("impossible_travel")
+class GeoVelocityDetector:
+    # Consecutive logins of one account at least travel_min_km apart
+    # (haversine) that imply more than travel_max_kmh. Only the previous login
+    # matters, and no gap longer than half the Earth's circumference at
+    # travel_max_kmh can ever qualify, which bounds the index horizon.
+    def __init__(self, t):
+        self.min_km = t["travel_min_km"]
+        self.max_kmh = t["travel_max_kmh"]
+        horizon_ms = int(math.pi * EARTH_RADIUS_KM / self.max_kmh * 3_600_000) + 1
+        self.index = LastEventIndex(horizon_ms)
+        self.flagged = {}  # uid -> (km, minutes) of the first impossible hop
+
+    def observe(self, ts, uid, ip, lat, lon):
+        if lat is None or lon is None:
+            return
+        prev = self.index.swap(uid, ts, lat, lon)
+        if prev is None:
+            return
+        prev_ts, prev_lat, prev_lon = prev
+        # Cheap upper bound on the distance first: most consecutive logins
+        # come from the same city and never reach the trigonometry
+        dlon = abs(lon - prev_lon)
+        if dlon > 180:
+            dlon = 360 - dlon
+        if (abs(lat - prev_lat) + dlon) * KM_PER_DEGREE < self.min_km:
+            return
+        km = haversine_km(prev_lat, prev_lon, lat, lon)
+        minutes = abs(ts - prev_ts) / 60_000
+        if km >= self.min_km and km * 60 > self.max_kmh * minutes and uid not in self.flagged:
+            self.flagged[uid] = (km, minutes)
+
+    def finish(self, users):
+        def describe(uid):
+            km, minutes = self.flagged[uid]
+            return f"{km:,.0f} km in {minutes:.1f} min"
+        members = users(self.flagged, describe)
+        if members:
+            yield make_threat(self.name, "travel", members)
+
+
+EVENT_RULES = tuple(EVENT_DETECTORS)
+
+
+# ==========================================
+# LOGIN EVENT ENGINE
+# ==========================================
+# Stateful, one per stream: feed() events in timestamp order (as logged; a
+# little disorder is tolerated), call threats() whenever a report is needed.
+class LoginEventEngine:
+    def __init__(self, thresholds=None, rules=None):
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.rules = list(rules) if rules else list(EVENT_RULES)
+        unknown = [r for r in self.rules if r not in EVENT_DETECTORS]
+        if unknown:
+            raise KeyError(f"Detector(s) not available for login events: {unknown}")
+        self.detectors = [EVENT_DETECTORS[name](self.thresholds) for name in self.rules]
+        self._observers = [d.observe for d in self.detectors]
+        self.events = 0
+
+    def observe(self, ts_ms, uid, ip=None, lat=None, lon=None):
+        for observe in self._observers:
+            observe(ts_ms, uid, ip, lat, lon)
+        self.events += 1
+
+    def feed(self, events):
+        # ONE pass over any iterable of LoginEvent / plain tuples
+        observers = self._observers
+        n = 0
+        for ts, uid, ip, lat, lon in events:
+            for observe in observers:
+                observe(ts, uid, ip, lat, lon)
+            n += 1
+        self.events += n
+        return self
+
+    def threats(self, customers=None):
+        # customers (optional ledger) turns ids into full records and drops
+        # banned accounts; ids it doesn't know get a minimal stand-in record
+        def users(uids, describe=None):
+            out = []
+            for uid in uids:
+                user = customers.get(uid) if customers is not None else None
+                if user is None:
+                    user = {"id": uid, "name": uid, "deposit_amount": None,
+                            "last_login_location": describe(uid) if describe else "N/A"}
+                elif user["status"] == "BANNED":
+                    continue
+                out.append(user)
+            return out
+
+        threats = []
+        for d in self.detectors:
+            threats.extend(d.finish(users))
+        return threats
+
+    def scan(self, events, customers=None):
+        return self.feed(events).threats(customers)
@@ -0,0 +1,196 @@
+import threading
+from dataclasses import dataclass
+
+from detection import DEFAULT_THRESHOLDS, make_threat
+
+
+# --- GROUP KEYS PER RULE ---
+# Every streaming rule is "which group does this user belong to right now?"
+# (None = no group) plus "how many members make it a threat?".
+def _rule_table(t):
+    def smurf_key(u):
+        return "structuring" if t["smurf_min_amount"] <= u.get("deposit_amount", 0) < t["smurf_max_amount"] else None
+
+    def travel_key(u):
+        return "travel" if t["travel_marker"] in u.get("last_login_location", "") else None
+
+    return {
+        "shared_ip": (lambda u: u.get("ip"), t["shared_ip_min_users"]),
+        "smurfing": (smurf_key, t["smurf_min_users"]),
+        "impossible_travel": (travel_key, 1),
+        "bot_swarm": (lambda u: u.get("last_login_time"), t["bot_min_users"]),
+    }
+
+
+# --- THREAT EVENTS ---
+# kind: "open" (group crossed its threshold), "update" (membership of an open
+# group changed) or "close" (group fell below threshold). Each event holds a
+# tuple of the group's records as they were when it was emitted (records are
+# replaced, never edited, so they don't need copying); the Threat itself is
+# only built when someone asks for it.
+@dataclass
+class ThreatEvent:
+    kind: str
+    rule: str
+    key: str
+    size: int
+    _members: tuple = ()
+
+    @property
+    def id(self):
+        return f"{self.rule}:{self.key}"
+
+    @property
+    def threat(self):
+        return make_threat(self.rule, str(self.key), list(self._members))
+
+
+# ==========================================
+# STREAMING DETECTOR
+# ==========================================
+# Maintains running group membership per rule. Each event touches at most
+# one old and one new group per rule, so it costs O(1) regardless of ledger size.
+class StreamingDetector:
+    def __init__(self, thresholds=None):
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.rules = _rule_table(self.thresholds)
+        self.users = {}                                         # uid -> current snapshot (active users only)
+        self.groups = {rule: {} for rule in self.rules}         # rule -> key -> {uid: user}
+        self.membership = {rule: {} for rule in self.rules}     # rule -> uid -> key
+        self.listeners = []
+        self._lock = threading.RLock()
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+
+    # --- GROUP BOOKKEEPING ---
+    def _leave(self, rule, uid, events):
+        key = self.membership[rule].pop(uid, None)
+        if key is None:
+            return
+        members = self.groups[rule][key]
+        members.pop(uid, None)
+        size, min_size = len(members), self.rules[rule][1]
+        if size + 1 >= min_size:
+            events.append(ThreatEvent("close" if size < min_size else "update", rule, key, size,
+                                      tuple(members.values())))
+        if not members:
+            del self.groups[rule][key]
+
+    def _join(self, rule, uid, user, events):
+        key = self.rules[rule][0](user)
+        if key is None:
+            return
+        members = self.groups[rule].setdefault(key, {})
+        members[uid] = user
+        self.membership[rule][uid] = key
+        size, min_size = len(members), self.rules[rule][1]
+        if size == min_size:
+            events.append(ThreatEvent("open", rule, key, size, tuple(members.values())))
+        elif size > min_size:
+            events.append(ThreatEvent("update", rule, key, size, tuple(members.values())))
+
+    def _refresh(self, uid, user):
+        events = []
+        for rule, (key_fn, _) in self.rules.items():
+            new_key = key_fn(user) if user is not None else None
+            old_key = self.membership[rule].get(uid)
+            if old_key == new_key and old_key is not None:
+                self.groups[rule][old_key][uid] = user  # same group, fresher snapshot
+                continue
+            self._leave(rule, uid, events)
+            if user is not None:
+                self._join(rule, uid, user, events)
+        for callback in self.listeners:
+            for event in events:
+                callback(event)
+        return events
+
+    # --- EVENT API ---
+    def customer_created(self, user):
+        with self._lock:
+            if user.get("status") == "BANNED":
+                return []
+            uid = user["id"]
+            self.users[uid] = dict(user)
+            return self._refresh(uid, self.users[uid])
+
+    def login(self, uid, ip=None, login_time=None, location=None):
+        with self._lock:
+            user = self.users.get(uid)
+            if user is None:
+                return []
+            user = dict(user)
+            if ip is not None: user["ip"] = ip
+            if login_time is not None: user["last_login_time"] = login_time
+            if location is not None: user["last_login_location"] = location
+            self.users[uid] = user
+            return self._refresh(uid, user)
+
+    def deposit(self, uid, amount):
+        with self._lock:
+            user = self.users.get(uid)
+            if user is None:
+                return []
+            user = dict(user, deposit_amount=amount)
+            self.users[uid] = user
+            return self._refresh(uid, user)
+
+    def banned(self, uid):
+        # Banned users drop out of every group immediately - no rescan
+        with self._lock:
+            if self.users.pop(uid, None) is None:
+                return []
+            return self._refresh(uid, None)
+
+    def status_changed(self, uid, status=None, risk_score=None, user=None):
+        # Admin status / risk change. BANNED leaves every group; any other status
+        # keeps or puts the user back in them - a lifted ban needs the full record
+        with self._lock:
+            if status == "BANNED":
+                return self.banned(uid)
+            current = self.users.get(uid)
+            if current is None:
+                if user is None or status is None:
+                    return []
+                current = user
+            fields = {"status": status} if status is not None else {}
+            if risk_score is not None:
+                fields["risk_score"] = risk_score
+            user = dict(current, **fields)
+            self.users[uid] = user
+            return self._refresh(uid, user)
+
+    def apply(self, event):
+        # Generic entry point: {"type": "created"|"login"|"deposit"|"banned"|"status", ...}
+        kind = event["type"]
+        if kind == "created":
+            return self.customer_created(event["user"])
+        if kind == "login":
+            return self.login(event["id"], event.get("ip"), event.get("last_login_time"),
+                              event.get("last_login_location"))
+        if kind == "deposit":
+            return self.deposit(event["id"], event["amount"])
+        if kind == "banned":
+            return self.banned(event["id"])
+        if kind == "status":
+            return self.status_changed(event["id"], event.get("status"), event.get("risk_score"),
+                                       event.get("user"))
+        raise ValueError(f"Unknown event type '{kind}'")
+
+    # --- SNAPSHOT ---
+    def threats(self):
+        with self._lock:
+            out = []
+            for rule, (_, min_size) in self.rules.items():
+                for key, members in self.groups[rule].items():
+                    if len(members) >= min_size:
+                        out.append(make_threat(rule, str(key), list(members.values())))
+            return out
+
+    @classmethod
+    def from_customers(cls, customers, thresholds=None):
+        stream = cls(thresholds)
+        for user in customers.values():
+            stream.customer_created(user)
+        return stream
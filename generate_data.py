@@ -1,8 +1,17 @@
+import argparse
+import heapq
 import json
 import random
 import os
+import time
+from array import array
+from multiprocessing import Pool
+
 from faker import Faker
 
+from customer_table import format_ip, format_login_ms
+from detection_events import haversine_km
+
 fake = Faker()
 Faker.seed(42)
 
@@ -98,5 +107,319 @@ def generate_data():
 
     print("✅ Advanced Data Generated.")
 
+
+# ==========================================
+# SCALE MODE (streaming, sharded, labelled)
+# ==========================================
+# Faker is far too slow for tens of millions of rows, so scale mode draws from
+# small word lists with a per-shard random.Random. Records are streamed to disk
+# one at a time (JSONL) or packed into column arrays per shard (.npz, same
+# layout as detection_columnar.CustomerColumns). Fraud rows keep status
+# "ACTIVE" - the ground truth lives in the label files, not in the data.
+
+FIRST_NAMES = ["James", "Mary", "John", "Linda", "Ahmed", "Chen", "Fatima", "Olu", "Sofia", "Ivan",
+               "Priya", "Lucas", "Amara", "Kenji", "Elena", "Mateo", "Zara", "Noah", "Aisha", "Leo"]
+LAST_NAMES = ["Smith", "Okafor", "Garcia", "Müller", "Kim", "Patel", "Rossi", "Silva", "Novak", "Haddad",
+              "Nguyen", "Jones", "Adeyemi", "Cohen", "Ivanova", "Tanaka", "Brown", "Khan", "Lopez", "Berg"]
+CITIES = ["London, UK", "Lagos, NG", "Berlin, DE", "Dubai, AE", "Singapore, SG", "Sao Paulo, BR",
+          "Nairobi, KE", "Paris, FR", "Mumbai, IN", "Toronto, CA", "Sydney, AU", "Kuala Lumpur, MY"]
+DOMAINS = ["example.com", "example.org", "example.net", "mail.test", "inbox.test"]
+
+# Label codes (also the "label" column in .npz shards)
+LABELS = {"honest": 0, "syndicate": 1, "smurf": 2, "travel": 3, "bot": 4}
+
+DAY_MS = 24 * 3600 * 1000
+
+# Login event streams (--login-events): city centres for geolocation, and the
+# timeline they are spread over (EVENTS_PER_DAY across the whole ledger)
+CITY_COORDS = {
+    "London, UK": (51.507, -0.128), "Lagos, NG": (6.524, 3.379), "Berlin, DE": (52.520, 13.405),
+    "Dubai, AE": (25.205, 55.271), "Singapore, SG": (1.352, 103.820), "Sao Paulo, BR": (-23.551, -46.633),
+    "Nairobi, KE": (-1.292, 36.822), "Paris, FR": (48.857, 2.352), "Mumbai, IN": (19.076, 72.878),
+    "Toronto, CA": (43.653, -79.383), "Sydney, AU": (-33.869, 151.209), "Kuala Lumpur, MY": (3.139, 101.687),
+}
+EVENTS_START_MS = 1_767_225_600_000  # 2026-01-01 00:00 UTC
+EVENTS_PER_DAY = 1_000_000
+
+
+# format_login_ms (43201005 -> "12:00:01.005 PM", parses back with detection_columnar.parse_login_ms)
+# and format_ip live in customer_table.py: compact records store exactly these forms as integers.
+
+
+def plan_shard(params, shard):
+    # Decide which row positions in this shard are fraud, and which group they belong to.
+    # Rings / swarms are dealt round-robin across shards so each one stays inside a shard.
+    n = shard_size(params, shard)
+    rng = random.Random(f"{params['seed']}-plan-{shard}")
+    roles = []
+    for ring in range(shard, params["syndicates"], params["shards"]):
+        roles += [("syndicate", ring)] * params["syndicate_size"]
+    for swarm in range(shard, params["bot_swarms"], params["shards"]):
+        roles += [("bot", swarm)] * params["bot_swarm_size"]
+    roles += [("smurf", 0)] * round(params["smurf_rate"] * n)
+    roles += [("travel", 0)] * round(params["travel_rate"] * n)
+    roles = roles[:n]
+    return dict(zip(rng.sample(range(n), len(roles)), roles))
+
+def shard_size(params, shard):
+    base, extra = divmod(params["customers"], params["shards"])
+    return base + (1 if shard < extra else 0)
+
+
+def iter_shard(params, shard):
+    # Yields (record, label_name, group) for every customer in the shard
+    rng = random.Random(f"{params['seed']}-{shard}")
+    plan = plan_shard(params, shard)
+    # Shared attributes per ring / swarm, derived from the group id so they are reproducible
+    ring_ip = lambda g: random.Random(f"{params['seed']}-ring-{g}").getrandbits(32)
+    swarm_ms = lambda g: random.Random(f"{params['seed']}-swarm-{g}").randrange(DAY_MS)
+
+    for i in range(shard_size(params, shard)):
+        uid = f"{shard:04x}{i:08x}"
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        ip = rng.getrandbits(32)
+        login_ms = rng.randrange(DAY_MS)
+        location = rng.choice(CITIES)
+        deposit = round(rng.uniform(100, 5000), 2)
+        role, group = plan.get(i, ("honest", None))
+
+        if role == "syndicate":
+            ip = ring_ip(group)
+        elif role == "bot":
+            login_ms = swarm_ms(group)
+            location = "Unknown Proxy"
+        elif role == "smurf":
+            deposit = float(rng.randint(9800, 9990))
+        elif role == "travel":
+            a, b = rng.sample(CITIES, 2)
+            location = f"{a.split(',')[0]} -> {b.split(',')[0]} ({rng.randint(1, 9)}min)"
+
+        record = {
+            "id": uid,
+            "name": f"{first} {last}",
+            "email": f"{first.lower()}.{last.lower()}{rng.randint(1, 9999)}@{rng.choice(DOMAINS)}",
+            "ip": format_ip(ip),
+            "wallet": f"0x{rng.getrandbits(40):010x}",
+            "risk_score": rng.randint(1, 20),
+            "status": "ACTIVE",
+            "last_login_location": location,
+            "last_login_time": format_login_ms(login_ms),
+            "deposit_amount": deposit,
+        }
+        yield record, role, group, ip, login_ms
+
+
+def _event_ts(event):
+    return event[0]
+
+
+def iter_shard_events(params, shard):
+    # Yields (ts_ms, id, ip, lat, lon) in timestamp order for one shard's
+    # customers. Honest users always log in around their home city; bot swarm
+    # members log in within 1 ms of their swarm through a proxy that doesn't
+    # geolocate (lat / lon None); travel rows make two logins
+    # >= 1000 km apart a few minutes from each other.
+    n_users = shard_size(params, shard)
+    n_events = round(params["login_events"] * n_users / params["customers"])
+    span_ms = max(1, round(params["login_events"] / params.get("events_per_day", EVENTS_PER_DAY) * DAY_MS))
+    rng = random.Random(f"{params['seed']}-events-{shard}")
+    cities = list(CITY_COORDS.values())
+    user_ip = lambda i: format_ip((i * 2654435761 + shard) & 0xFFFFFFFF)
+    swarm_at = lambda g: EVENTS_START_MS + random.Random(f"{params['seed']}-swarm-events-{g}").randrange(span_ms)
+
+    injected = []
+    for i, (role, group) in plan_shard(params, shard).items():
+        uid = f"{shard:04x}{i:08x}"
+        if role == "bot":
+            injected.append((swarm_at(group) + rng.randint(0, 1), uid, user_ip(i), None, None))
+        elif role == "travel":
+            while True:
+                a, b = rng.sample(cities, 2)
+                if haversine_km(*a, *b) >= 1000:
+                    break
+            at = EVENTS_START_MS + rng.randrange(span_ms)
+            injected.append((at, uid, user_ip(i), *a))
+            injected.append((at + rng.randint(1, 9) * 60_000, uid, user_ip(i), *b))
+    injected.sort(key=_event_ts)
+
+    def honest():
+        n = max(0, n_events - len(injected))
+        gap = span_ms / max(1, n)
+        ts = float(EVENTS_START_MS)
+        for _ in range(n):
+            ts += rng.expovariate(1 / gap)
+            i = rng.randrange(n_users)
+            lat, lon = cities[(i * 2654435761) % len(cities)]
+            yield (int(ts), f"{shard:04x}{i:08x}", user_ip(i),
+                   lat + rng.uniform(-0.05, 0.05), lon + rng.uniform(-0.05, 0.05))
+
+    return heapq.merge(honest(), injected, key=_event_ts)
+
+
+def write_events(params, shard):
+    with open(os.path.join(params["out"], f"events-{shard:05d}.csv"), "w") as out:
+        out.write("ts_ms,id,ip,lat,lon\n")
+        for ts, uid, ip, lat, lon in iter_shard_events(params, shard):
+            geo = "," if lat is None else f"{lat:.4f},{lon:.4f}"
+            out.write(f"{ts},{uid},{ip},{geo}\n")
+
+
+def write_shard(job):
+    params, shard = job
+    out_dir, fmt = params["out"], params["format"]
+    counts = {name: 0 for name in LABELS}
+    labels = open(os.path.join(out_dir, f"labels-{shard:05d}.csv"), "w")
+    labels.write("id,label,group\n")
+
+    # fmt "events": labels + login events only, no customer records
+    if fmt == "jsonl":
+        out = open(os.path.join(out_dir, f"customers-{shard:05d}.jsonl"), "w")
+    elif fmt == "columnar":
+        ids, deposit, ips, login = [], array("d"), array("I"), array("q")
+        travel, label_codes = bytearray(), bytearray()
+
+    for record, role, group, ip, login_ms in iter_shard(params, shard):
+        counts[role] += 1
+        if role != "honest":
+            labels.write(f"{record['id']},{role},{'' if group is None else group}\n")
+        if fmt == "jsonl":
+            out.write(json.dumps(record) + "\n")
+        elif fmt == "columnar":
+            ids.append(record["id"])
+            deposit.append(record["deposit_amount"])
+            ips.append(ip)
+            login.append(login_ms)
+            travel.append(1 if role == "travel" else 0)
+            label_codes.append(LABELS[role])
+
+    labels.close()
+    if fmt == "jsonl":
+        out.close()
+    elif fmt == "columnar":
+        import numpy as np
+        n = len(ids)
+        np.savez(os.path.join(out_dir, f"customers-{shard:05d}.npz"),
+                 ids=np.array(ids, dtype="U12"), deposit=np.frombuffer(deposit, dtype=np.float64),
+                 ip=np.frombuffer(ips, dtype=np.uint32), login_ms=np.frombuffer(login, dtype=np.int64),
+                 status_codes=np.zeros(n, dtype=np.uint8), status_levels=np.array(["ACTIVE"]),
+                 travel=np.frombuffer(bytes(travel), dtype=bool),
+                 label=np.frombuffer(bytes(label_codes), dtype=np.uint8))
+    if params.get("login_events"):
+        write_events(params, shard)
+    return counts
+
+
+def generate_scale(params):
+    os.makedirs(params["out"], exist_ok=True)
+    print(f"--- 🔄 Generating {params['customers']:,} customers in {params['shards']} shard(s) "
+          f"as {params['format']} -> {params['out']} ---")
+    start = time.time()
+    jobs = [(params, shard) for shard in range(params["shards"])]
+    if params["workers"] > 1 and params["shards"] > 1:
+        with Pool(params["workers"]) as pool:
+            results = pool.map(write_shard, jobs)
+    else:
+        results = [write_shard(job) for job in jobs]
+
+    totals = {name: sum(r[name] for r in results) for name in LABELS}
+    manifest = {**params, "counts": totals, "seconds": round(time.time() - start, 2)}
+    with open(os.path.join(params["out"], "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✅ {totals} in {manifest['seconds']}s")
+    return manifest
+
+
+# --- READERS (used by the benchmarks) ---
+def read_manifest(out_dir):
+    with open(os.path.join(out_dir, "manifest.json")) as f:
+        return json.load(f)
+
+def iter_jsonl(out_dir):
+    for shard in range(read_manifest(out_dir)["shards"]):
+        with open(os.path.join(out_dir, f"customers-{shard:05d}.jsonl")) as f:
+            for line in f:
+                yield json.loads(line)
+
+def iter_login_events(out_dir):
+    # Every shard's events-NNNNN.csv merged back into one timestamp-ordered
+    # stream of (ts_ms, id, ip, lat, lon) tuples (detection_events.LoginEvent order)
+    def read(shard):
+        with open(os.path.join(out_dir, f"events-{shard:05d}.csv")) as f:
+            next(f)
+            for line in f:
+                ts, uid, ip, lat, lon = line.rstrip("\n").split(",")
+                yield int(ts), uid, ip, float(lat) if lat else None, float(lon) if lon else None
+    shards = read_manifest(out_dir)["shards"]
+    return read(0) if shards == 1 else heapq.merge(*(read(s) for s in range(shards)), key=_event_ts)
+
+def read_labels(out_dir):
+    # id -> (label, group) for every fraud row; honest rows are absent
+    labels = {}
+    for shard in range(read_manifest(out_dir)["shards"]):
+        with open(os.path.join(out_dir, f"labels-{shard:05d}.csv")) as f:
+            next(f)
+            for line in f:
+                uid, label, group = line.rstrip("\n").split(",")
+                labels[uid] = (label, group)
+    return labels
+
+def read_columnar(out_dir):
+    import numpy as np
+    from detection_columnar import CustomerColumns
+    shards = [np.load(os.path.join(out_dir, f"customers-{s:05d}.npz"))
+              for s in range(read_manifest(out_dir)["shards"])]
+    cat = lambda key: np.concatenate([z[key] for z in shards])
+    return CustomerColumns(cat("ids").astype(object), cat("deposit"), cat("ip"), cat("login_ms"),
+                           cat("status_codes"), ["ACTIVE"], cat("travel"))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Synthetic ledger generator. No arguments = the demo customers.json / agents.json.")
+    parser.add_argument("--customers", type=int, help="Scale mode: number of customers to generate")
+    parser.add_argument("--format", choices=["jsonl", "columnar", "events"], default="jsonl",
+                        help="events = labels + login event stream only, no customer records")
+    parser.add_argument("--out", default="generated")
+    parser.add_argument("--shards", type=int, default=0, help="Default: one per million customers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--syndicates", type=int, default=None, help="Shared-IP rings (default: 1 per 50k)")
+    parser.add_argument("--syndicate-size", type=int, default=5)
+    parser.add_argument("--bot-swarms", type=int, default=None, help="Same-ms login swarms (default: 1 per 50k)")
+    parser.add_argument("--bot-swarm-size", type=int, default=6)
+    parser.add_argument("--smurf-rate", type=float, default=0.0005, help="Share of customers structuring deposits")
+    parser.add_argument("--travel-rate", type=float, default=0.0002, help="Share with impossible travel")
+    parser.add_argument("--login-events", type=int, default=None,
+                        help="Login events to write as events-NNNNN.csv (default: 10 per customer with "
+                             "--format events, otherwise none)")
+    parser.add_argument("--events-per-day", type=int, default=EVENTS_PER_DAY,
+                        help="Event rate across the whole ledger; sets how long the timeline is")
+    args = parser.parse_args()
+
+    if args.customers is None:
+        generate_data()
+        return
+
+    per_50k = max(1, args.customers // 50_000)
+    params = {
+        "customers": args.customers,
+        "format": args.format,
+        "out": args.out,
+        "shards": args.shards or max(1, -(-args.customers // 1_000_000)),
+        "workers": args.workers,
+        "seed": args.seed,
+        "syndicates": per_50k if args.syndicates is None else args.syndicates,
+        "syndicate_size": args.syndicate_size,
+        "bot_swarms": per_50k if args.bot_swarms is None else args.bot_swarms,
+        "bot_swarm_size": args.bot_swarm_size,
+        "smurf_rate": args.smurf_rate,
+        "travel_rate": args.travel_rate,
+        "login_events": (args.login_events if args.login_events is not None
+                         else 10 * args.customers if args.format == "events" else 0),
+        "events_per_day": args.events_per_day,
+    }
+    generate_scale(params)
+
+
 if __name__ == "__main__":
-    generate_data()
\ No newline at end of file
+    main()
\ No newline at end of file
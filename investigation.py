@@ -0,0 +1,335 @@
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import metrics
+
+# --- LINK ATTRIBUTES ---
+# Two customers are linked when they share one of these values. Weights say how
+# strong the evidence is (a shared wallet is worse than a shared mail domain).
+LINK_WEIGHTS = {
+    "ip": 3.0,
+    "wallet": 5.0,
+    "device": 4.0,              # only if the record has one
+    "last_login_time": 2.0,     # exact string match ("12:00:01.005 PM")
+    "email_domain": 1.0,
+}
+
+# Values shared by more than this many customers are noise (public gateways,
+# gmail.com, a coarse "10:00 AM" login) - they would glue everyone together.
+# Mail domains get a much tighter cap: only small private domains are evidence.
+DEFAULT_MAX_BUCKET = 100
+MAX_BUCKET = {"email_domain": 10}
+
+
+def link_value(user, attr):
+    if attr == "email_domain":
+        email = user.get("email") or ""
+        return email.rpartition("@")[2].lower() or None
+    return user.get(attr) or None
+
+
+# --- UNION-FIND ---
+# Array based, union by size + path halving: near-constant amortised per op.
+class UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return ra
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+        return ra
+
+
+# --- CLUSTER RECORD ---
+@dataclass
+class Cluster:
+    id: str                     # stable: smallest member id
+    members: list               # customer records
+    links: list = field(default_factory=list)   # (attr, value, [member ids]) - the evidence
+    score: float = 0.0
+
+    @property
+    def user_ids(self):
+        return [u["id"] for u in self.members]
+
+    @property
+    def size(self):
+        return len(self.members)
+
+
+def score_cluster(cluster):
+    # Evidence: each shared value counts (members sharing it - 1) times its weight.
+    # Then size, average customer risk and already-flagged members push it up.
+    evidence = sum(LINK_WEIGHTS[attr] * (len(ids) - 1) for attr, _value, ids in cluster.links)
+    risk = sum(u.get("risk_score", 0) for u in cluster.members) / cluster.size
+    flagged = sum(1 for u in cluster.members if u.get("status") == "FLAGGED")
+    return round(evidence + cluster.size + risk / 10 + 2 * flagged, 2)
+
+
+# ==========================================
+# INVESTIGATION ENGINE
+# ==========================================
+# 1. Hash-bucket every customer by each link attribute (one pass).
+# 2. Union the members of every bucket that is neither trivial nor noise.
+# 3. Collect components, attach the buckets as evidence, score and rank.
+# O(n * attrs) plus near-linear union-find - no pairwise comparisons.
+def find_clusters(customers, attrs=None, min_size=2, max_bucket=None):
+    attrs = list(attrs or LINK_WEIGHTS)
+    caps = {attr: (max_bucket or MAX_BUCKET.get(attr, DEFAULT_MAX_BUCKET)) for attr in attrs}
+    users = [u for u in customers.values() if u.get("status") != "BANNED"]
+
+    buckets = {attr: {} for attr in attrs}
+    for i, user in enumerate(users):
+        for attr in attrs:
+            value = link_value(user, attr)
+            if value is not None:
+                buckets[attr].setdefault(value, []).append(i)
+
+    uf = UnionFind(len(users))
+    evidence = []  # (attr, value, rows)
+    for attr, by_value in buckets.items():
+        for value, rows in by_value.items():
+            if 2 <= len(rows) <= caps[attr]:
+                first = rows[0]
+                for row in rows[1:]:
+                    uf.union(first, row)
+                evidence.append((attr, value, rows))
+
+    components = {}
+    for attr, value, rows in evidence:
+        components.setdefault(uf.find(rows[0]), []).append((attr, value, rows))
+
+    clusters = []
+    for links in components.values():
+        member_rows = sorted({row for _attr, _value, rows in links for row in rows})
+        if len(member_rows) < min_size:
+            continue
+        members = [users[row] for row in member_rows]
+        cluster = Cluster(
+            id=min(u["id"] for u in members),
+            members=members,
+            links=[(attr, value, [users[row]["id"] for row in rows]) for attr, value, rows in links],
+        )
+        cluster.score = score_cluster(cluster)
+        clusters.append(cluster)
+
+    clusters.sort(key=lambda c: (-c.score, c.id))
+    return clusters
+
+
+# ==========================================
+# GRAPH PAYLOADS (level of detail)
+# ==========================================
+# The browser graph can't draw a million-node ledger, so the investigator
+# works in two zoom levels with bounded payloads:
+#   summary  - one node per cluster, ranked, paged with a cursor
+#   expand   - one cluster's members, paged with a cursor, plus the hubs they
+#              share (hubs capped like members)
+# Clusters and layouts are computed once per data version and cached.
+LINK_LABELS = {"ip": "SHARED IP", "wallet": "SHARED WALLET", "device": "SHARED DEVICE",
+               "last_login_time": "SAME LOGIN", "email_domain": "MAIL DOMAIN"}
+
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+# Hard caps on one payload, whatever the caller asks for
+MAX_TOP = 200
+MAX_MEMBERS = 500
+
+
+def clamp(value, limit):
+    return max(1, min(int(value), limit))
+
+
+def spiral_position(rank, spacing=60):
+    # Sunflower spiral: rank 0 in the centre, evenly spread, no overlaps
+    r = spacing * math.sqrt(rank)
+    return {"x": round(r * math.cos(rank * GOLDEN_ANGLE), 1), "y": round(r * math.sin(rank * GOLDEN_ANGLE), 1)}
+
+def ring_position(i, n, radius):
+    angle = 2 * math.pi * i / max(n, 1)
+    return {"x": round(radius * math.cos(angle), 1), "y": round(radius * math.sin(angle), 1)}
+
+
+def summary_node(cluster, rank):
+    kinds = sorted({attr for attr, _value, _ids in cluster.links}, key=lambda a: -LINK_WEIGHTS[a])
+    return {
+        "data": {
+            "id": f"cluster:{cluster.id}",
+            "label": f"Ring of {cluster.size} ({', '.join(LINK_LABELS[k] for k in kinds)})",
+            "color": "#FF0000",
+            "size": 20 + min(cluster.size, 40),
+            "symbolType": "circle",
+            "cluster": cluster.id,
+            "score": cluster.score,
+            "rank": rank
+        },
+        "position": spiral_position(rank)
+    }
+
+def page_links(cluster, members, limit):
+    # Hubs worth drawing for one page of members: only shared values at least
+    # one shown member holds, capped like the members so a long chained ring
+    # (one link per pair) can't blow up the payload
+    shown = {u["id"] for u in members}
+    hubs = [link for link in cluster.links if any(uid in shown for uid in link[2])]
+    return hubs[:limit], len(hubs)
+
+
+def cluster_entry(cluster, rank, member_limit, offset=0):
+    members = cluster.members[offset:offset + member_limit]
+    links, _ = page_links(cluster, members, member_limit)
+    return {"id": cluster.id, "rank": rank, "score": cluster.score, "size": cluster.size,
+            "user_ids": [u["id"] for u in members],
+            "links": [{"attr": attr, "value": value, "members": len(ids)} for attr, value, ids in links],
+            "total_links": len(cluster.links)}
+
+
+def expanded_graph(cluster, member_limit, offset=0):
+    # Hubs (shared values) on an inner ring, members on an outer ring. One
+    # page of members (offset, member_limit) and only the hubs they touch
+    members = cluster.members[offset:offset + member_limit]
+    links, linked = page_links(cluster, members, member_limit)
+    nodes, edges = [], []
+    for i, (attr, value, ids) in enumerate(links):
+        nodes.append({
+            "data": {
+                "id": f"{attr}:{value}",
+                "label": f"{LINK_LABELS.get(attr, attr)}: {value}",
+                "color": "#00FFFF",
+                "size": 30 + min(len(ids), 20),
+                "symbolType": "square",
+                "cluster": cluster.id
+            },
+            "position": ring_position(i, len(links), 120)
+        })
+    shown = set()
+    for i, user in enumerate(members):
+        shown.add(user["id"])
+        nodes.append({
+            "data": {
+                "id": user["id"], "label": f"⚠️ {user['name']}",
+                "color": "#FF0000", "size": 25, "cluster": cluster.id
+            },
+            "position": ring_position(i, len(members), 300)
+        })
+    for attr, value, ids in links:
+        for uid in ids:
+            if uid in shown:
+                edges.append({
+                    "data": {
+                        "source": uid, "target": f"{attr}:{value}",
+                        "color": "#FF444F", "label": f"shares_{attr}"
+                    }
+                })
+    hidden = cluster.size - len(members)
+    hidden_hubs = linked - len(links)
+    if hidden > 0 or hidden_hubs > 0:
+        label = f"+{hidden} more" + (f", +{hidden_hubs} hubs" if hidden_hubs > 0 else "")
+        nodes.append({
+            "data": {"id": f"more:{cluster.id}", "label": label, "color": "#555", "size": 20},
+            "position": {"x": 0, "y": 380}
+        })
+    return {"nodes": nodes, "edges": edges}
+
+
+class InvestigationView:
+    def __init__(self, max_layouts=64):
+        self.max_layouts = max_layouts
+        self._lock = threading.Lock()
+        self._clusters = None            # (version, ranked clusters, {cluster id: (rank, cluster)})
+        self._layouts = OrderedDict()    # (version, kind, key) -> payload, LRU
+
+    def clusters(self, customers, version=None):
+        # version=None (ad-hoc data) -> always recompute, never cache
+        with self._lock:
+            if version is not None and self._clusters and self._clusters[0] == version:
+                metrics.cache_lookup("investigation_clusters", True)
+                return self._clusters[1], self._clusters[2]
+        metrics.cache_lookup("investigation_clusters", False)
+        with metrics.span("find_clusters", metric="reguflow_detector_seconds", backend="graph"):
+            ranked = find_clusters(customers)
+        by_id = {c.id: (rank, c) for rank, c in enumerate(ranked)}
+        if version is not None:
+            with self._lock:
+                self._clusters = (version, ranked, by_id)
+                self._layouts.clear()
+        return ranked, by_id
+
+    def _layout(self, version, kind, key, build):
+        if version is None:
+            return build()
+        cache_key = (version, kind, key)
+        with self._lock:
+            if cache_key in self._layouts:
+                self._layouts.move_to_end(cache_key)
+                metrics.cache_lookup("investigation_layout", True)
+                return self._layouts[cache_key]
+        metrics.cache_lookup("investigation_layout", False)
+        payload = build()
+        with self._lock:
+            self._layouts[cache_key] = payload
+            while len(self._layouts) > self.max_layouts:
+                self._layouts.popitem(last=False)
+        return payload
+
+    # --- CURSORS ---
+    # "<version>@<offset>": ranks only hold within one data version, so a cursor
+    # from an older version is refused rather than silently skipping clusters.
+    @staticmethod
+    def make_cursor(version, offset):
+        return f"{version}@{offset}"
+
+    @staticmethod
+    def parse_cursor(cursor, version):
+        if not cursor:
+            return 0
+        cursor_version, _, offset = cursor.rpartition("@")
+        if cursor_version != str(version) or not offset.isdigit():
+            raise ValueError("Stale or invalid cursor - reload the investigation view")
+        return int(offset)
+
+    def summary(self, customers, version=None, top=20, cursor=None, member_limit=50):
+        top, member_limit = clamp(top, MAX_TOP), clamp(member_limit, MAX_MEMBERS)
+        ranked, _ = self.clusters(customers, version)
+        offset = self.parse_cursor(cursor, version)
+        page = ranked[offset:offset + top]
+
+        def build():
+            return {"nodes": [summary_node(c, offset + i) for i, c in enumerate(page)],
+                    "edges": [],
+                    "clusters": [cluster_entry(c, offset + i, member_limit) for i, c in enumerate(page)]}
+        payload = dict(self._layout(version, "summary", (offset, top, member_limit), build))
+        end = offset + len(page)
+        payload.update(total_clusters=len(ranked), version=version,
+                       next_cursor=self.make_cursor(version, end) if end < len(ranked) else None)
+        return payload
+
+    def expand(self, customers, cluster_id, version=None, member_limit=200, cursor=None):
+        # cursor pages through the cluster's members, same format as summary's
+        member_limit = clamp(member_limit, MAX_MEMBERS)
+        _, by_id = self.clusters(customers, version)
+        if cluster_id not in by_id:
+            raise KeyError(f"Unknown cluster '{cluster_id}'")
+        rank, cluster = by_id[cluster_id]
+        offset = self.parse_cursor(cursor, version)
+        payload = dict(self._layout(version, "expand", (cluster_id, offset, member_limit),
+                                    lambda: expanded_graph(cluster, member_limit, offset)))
+        end = offset + member_limit
+        payload.update(cluster=cluster_entry(cluster, rank, member_limit, offset), version=version,
+                       next_cursor=self.make_cursor(version, end) if end < cluster.size else None)
+        return payload
@@ -0,0 +1,238 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+import metrics
+
+# --- POLICY (override with env vars) ---
+LLM_BASE_URL = os.getenv("REGUFLOW_LLM_BASE_URL", "https://api.aimlapi.com/v1")
+LLM_TIMEOUT = float(os.getenv("REGUFLOW_LLM_TIMEOUT", "15"))              # per attempt, seconds
+LLM_MAX_RETRIES = int(os.getenv("REGUFLOW_LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.getenv("REGUFLOW_LLM_BACKOFF_BASE", "0.25"))  # seconds
+LLM_BACKOFF_MAX = float(os.getenv("REGUFLOW_LLM_BACKOFF_MAX", "4"))
+LLM_MAX_CONCURRENCY = int(os.getenv("REGUFLOW_LLM_MAX_CONCURRENCY", "16"))
+BREAKER_FAILURES = int(os.getenv("REGUFLOW_BREAKER_FAILURES", "5"))       # consecutive failures to open
+BREAKER_RESET = float(os.getenv("REGUFLOW_BREAKER_RESET", "30"))          # seconds before a trial call
+
+# `openai` costs ~0.7s to import, so it is only loaded on the first real call:
+# CLI tools, API workers and admin paths that never reach the LLM skip it.
+_retryable = None
+
+def retryable_errors():
+    # Transient provider problems worth another attempt
+    global _retryable
+    if _retryable is None:
+        import openai
+        _retryable = (asyncio.TimeoutError, openai.APITimeoutError, openai.APIConnectionError,
+                      openai.RateLimitError, openai.InternalServerError)
+    return _retryable
+
+
+class LLMUnavailable(Exception):
+    # Raised when the provider could not produce an answer (retries exhausted,
+    # non-retryable error, or the circuit breaker is open)
+    pass
+
+
+# ==========================================
+# CIRCUIT BREAKER
+# ==========================================
+# CLOSED: calls flow. After N consecutive failures -> OPEN: calls fail fast
+# for reset_timeout seconds. Then HALF_OPEN: one trial call decides.
+class CircuitBreaker:
+    def __init__(self, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "CLOSED"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "CLOSED":
+                return True
+            if self.state == "OPEN" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "HALF_OPEN"
+            if self.state == "HALF_OPEN" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def release(self):
+        # Called when a call ends, whichever way. A trial that never reached
+        # record_success / record_failure (cancelled, stream abandoned) decided
+        # nothing, so it must not hold the HALF_OPEN slot forever.
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "CLOSED"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == "HALF_OPEN" or self.failures >= self.failure_threshold:
+                self.state = "OPEN"
+                self.opened_at = time.monotonic()
+
+
+# ==========================================
+# LLM CLIENT
+# ==========================================
+# One AsyncOpenAI instance (one pooled HTTP client) per process. The SDK's own
+# retries are disabled so backoff, breaker and the concurrency cap live here.
+# api_key may be a zero-argument callable: it is resolved when the client is
+# first built, not when LLMClient is constructed.
+class LLMClient:
+    def __init__(self, api_key, base_url=LLM_BASE_URL, timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES,
+                 backoff_base=LLM_BACKOFF_BASE, backoff_max=LLM_BACKOFF_MAX,
+                 max_concurrency=LLM_MAX_CONCURRENCY, breaker=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        self.breaker = breaker or CircuitBreaker()
+        self._client = None
+        self._semaphore = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import AsyncOpenAI
+            if callable(self.api_key):
+                self.api_key = self.api_key()
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                       timeout=self.timeout, max_retries=0)
+        return self._client
+
+    @property
+    def semaphore(self):
+        # Caps in-flight requests so a burst of agents can't blow through rate limits
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _backoff(self, attempt):
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def chat(self, timeout=None, **kwargs):
+        import openai  # already in sys.modules after the first call
+        retryable = retryable_errors()
+        model = kwargs.get("model", "unknown")
+        if not self.breaker.allow():
+            metrics.inc("reguflow_llm_requests_total", model=model, outcome="breaker_open")
+            raise LLMUnavailable("Circuit open: LLM provider is failing")
+        try:
+            timeout = timeout or self.timeout
+            last_error = None
+            with metrics.span("llm_chat", metric="reguflow_llm_seconds", model=model):
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        async with self.semaphore:
+                            response = await asyncio.wait_for(
+                                self.client.chat.completions.create(**kwargs), timeout)
+                        self.breaker.record_success()
+                        metrics.inc("reguflow_llm_requests_total", model=model, outcome="ok")
+                        usage = getattr(response, "usage", None)
+                        if usage is not None:
+                            metrics.record_llm_usage(model, usage.prompt_tokens or 0, usage.completion_tokens or 0)
+                        return response
+                    except retryable as e:
+                        last_error = e
+                        if attempt < self.max_retries:
+                            metrics.inc("reguflow_llm_requests_total", model=model, outcome="retry")
+                            await asyncio.sleep(self._backoff(attempt))
+                    except openai.OpenAIError as e:
+                        # 4xx, auth, missing credentials ... - retrying won't help
+                        last_error = e
+                        break
+            self.breaker.record_failure()
+            metrics.inc("reguflow_llm_requests_total", model=model, outcome="error")
+            raise LLMUnavailable(f"LLM call failed: {last_error!r}") from last_error
+        finally:
+            self.breaker.release()
+
+    async def stream_chat(self, timeout=None, **kwargs):
+        # Streaming variant: yields content deltas as they arrive. Retries only
+        # happen before the first token - a half-delivered reply is never replayed.
+        import openai
+        retryable = retryable_errors()
+        model = kwargs.get("model", "unknown")
+        if not self.breaker.allow():
+            metrics.inc("reguflow_llm_requests_total", model=model, outcome="breaker_open")
+            raise LLMUnavailable("Circuit open: LLM provider is failing")
+        try:
+            timeout = timeout or self.timeout
+            last_error = None
+            # Timed by hand: a span's contextvar can't be held open across yields
+            began, deltas = time.perf_counter(), 0
+            for attempt in range(self.max_retries + 1):
+                started = False
+                try:
+                    async with self.semaphore:
+                        stream = await asyncio.wait_for(
+                            self.client.chat.completions.create(stream=True, **kwargs), timeout)
+                        async for chunk in stream:
+                            delta = chunk.choices[0].delta.content if chunk.choices else None
+                            if delta:
+                                started = True
+                                deltas += 1
+                                yield delta
+                    self.breaker.record_success()
+                    metrics.inc("reguflow_llm_requests_total", model=model, outcome="ok")
+                    metrics.observe("reguflow_llm_seconds", time.perf_counter() - began, model=model)
+                    # Streams carry no usage block by default: one delta ~ one completion token
+                    metrics.record_llm_usage(model, completion_tokens=deltas)
+                    return
+                except retryable as e:
+                    last_error = e
+                    if started:
+                        break
+                    if attempt < self.max_retries:
+                        metrics.inc("reguflow_llm_requests_total", model=model, outcome="retry")
+                        await asyncio.sleep(self._backoff(attempt))
+                except openai.OpenAIError as e:
+                    last_error = e
+                    break
+            self.breaker.record_failure()
+            metrics.inc("reguflow_llm_requests_total", model=model, outcome="error")
+            raise LLMUnavailable(f"LLM stream failed: {last_error!r}") from last_error
+        finally:
+            self.breaker.release()
+
+
+# --- SHARED EVENT LOOP ---
+# Background loop shared by every Streamlit session thread. The async client's
+# connection pool is bound to the loop it first ran on, so the loop has to
+# outlive individual calls (asyncio.run() per call would break it).
+_loop = None
+_loop_lock = threading.Lock()
+
+def get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="reguflow-llm", daemon=True).start()
+    return _loop
+
+def run_async(coro):
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result()
+
+async def run_on_loop(coro):
+    # Await a coroutine on the shared loop from ANOTHER event loop (e.g. uvicorn's).
+    # The client's semaphore and connection pool belong to the shared loop, so
+    # they must never be awaited directly from a foreign one.
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, get_loop()))
@@ -0,0 +1,326 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+# --- POLICY (override with env vars) ---
+# REGUFLOW_METRICS=0 turns every call below into a no-op (one global check).
+# REGUFLOW_TRACE_LOG=path additionally appends one JSON line per finished span.
+METRICS_ENABLED = os.getenv("REGUFLOW_METRICS", "1") != "0"
+TRACE_LOG = os.getenv("REGUFLOW_TRACE_LOG") or None
+
+# Seconds; from a prefilter hit (~10us) up to a judge call that ran into its timeout
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# USD per 1M tokens (prompt, completion). Unknown models are counted in tokens only.
+# REGUFLOW_LLM_PRICES='{"gpt-4o-mini": [0.15, 0.6]}' overrides / extends the table.
+LLM_PRICES = {"gpt-4o-mini": (0.15, 0.60), "gpt-4o": (2.50, 10.00)}
+LLM_PRICES.update({k: tuple(v) for k, v in json.loads(os.getenv("REGUFLOW_LLM_PRICES", "{}")).items()})
+
+HELP = {
+    "reguflow_stage_seconds": ("histogram", "Wall time per pipeline stage"),
+    "reguflow_detector_seconds": ("histogram", "Threat detector scan time per backend"),
+    "reguflow_llm_seconds": ("histogram", "LLM call latency including retries"),
+    "reguflow_llm_requests_total": ("counter", "LLM calls by model and outcome"),
+    "reguflow_llm_tokens_total": ("counter", "LLM tokens by model and kind (prompt/completion)"),
+    "reguflow_llm_cost_usd_total": ("counter", "Estimated LLM spend from LLM_PRICES"),
+    "reguflow_judge_decisions_total": ("counter", "Compliance decisions by source"),
+    "reguflow_prefilter_rules_total": ("counter", "Pre-filter results by verdict and the rule that fired"),
+    "reguflow_cache_lookups_total": ("counter", "In-process cache lookups by cache and result"),
+    "reguflow_bytes_written_total": ("counter", "Bytes written by the storage layer per target"),
+    "reguflow_verdict_cache_lookups": ("gauge", "Verdict cache counters since start"),
+    "reguflow_verdict_cache_hit_ratio": ("gauge", "Verdict cache hit ratio since start"),
+    "reguflow_process_write_bytes": ("gauge", "Bytes this process caused to be written to disk (/proc/self/io)"),
+}
+
+
+class Histogram:
+    # Cumulative-on-render: each observation bumps exactly one bucket
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _num(value):
+    # Exact integers (byte / token counts) must not turn into 1.23457e+08
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+def _fmt_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+# ==========================================
+# REGISTRY
+# ==========================================
+# In-process only: every uvicorn worker / Streamlit process keeps its own
+# numbers, scrape each process (or each worker's /metrics) separately.
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}     # name -> {label key: value}
+        self._histograms = {}   # name -> {label key: Histogram}
+        self._gauges = {}       # name -> fn() -> number | {label key: number}
+
+    def inc(self, name, value=1, **labels):
+        key = _key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        key = _key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def gauge(self, name, fn):
+        # Sampled at render time, so the hot path pays nothing for it
+        with self._lock:
+            self._gauges[name] = fn
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _sample_gauges(self):
+        samples = {}
+        for name, fn in list(self._gauges.items()):
+            try:
+                value = fn()
+            except Exception:
+                continue  # a broken collector must never break the scrape
+            if value is None:
+                continue
+            samples[name] = value if isinstance(value, dict) else {(): value}
+        return samples
+
+    def snapshot(self):
+        # Plain dict for JSON consumers (bench scripts, the admin page)
+        with self._lock:
+            counters = {name: {_fmt_labels(k): v for k, v in series.items()}
+                        for name, series in self._counters.items()}
+            hists = {name: {_fmt_labels(k): {"count": h.count, "sum": round(h.sum, 6)}
+                            for k, h in series.items()}
+                     for name, series in self._histograms.items()}
+        gauges = {name: {_fmt_labels(k): v for k, v in series.items()}
+                  for name, series in self._sample_gauges().items()}
+        return {"counters": counters, "histograms": hists, "gauges": gauges}
+
+    def render(self):
+        # Prometheus text exposition format 0.0.4
+        out = []
+
+        def header(name, kind):
+            help_text = HELP.get(name, (kind, name))[1]
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            counters = {n: dict(s) for n, s in self._counters.items()}
+            hists = {n: {k: (h.buckets, list(h.counts), h.sum, h.count) for k, h in s.items()}
+                     for n, s in self._histograms.items()}
+        for name in sorted(counters):
+            header(name, "counter")
+            for key, value in sorted(counters[name].items()):
+                out.append(f"{name}{_fmt_labels(key)} {_num(value)}")
+        for name in sorted(hists):
+            header(name, "histogram")
+            for key, (buckets, counts, total, count) in sorted(hists[name].items()):
+                running = 0
+                for le, n in zip(buckets, counts):
+                    running += n
+                    out.append(f"{name}_bucket{_fmt_labels(key, [('le', f'{le:g}')])} {running}")
+                out.append(f"{name}_bucket{_fmt_labels(key, [('le', '+Inf')])} {count}")
+                out.append(f"{name}_sum{_fmt_labels(key)} {total:.6f}")
+                out.append(f"{name}_count{_fmt_labels(key)} {count}")
+        gauges = self._sample_gauges()
+        for name in sorted(gauges):
+            header(name, "gauge")
+            for key, value in sorted(gauges[name].items()):
+                out.append(f"{name}{_fmt_labels(key)} {_num(value)}")
+        return "\n".join(out) + "\n"
+
+
+registry = Registry()
+
+
+# ==========================================
+# TRACE LOG (optional)
+# ==========================================
+# {"ts", "trace", "span", "parent", "name", "ms", ...labels, "error"?} per line.
+# Spans started inside another span share its trace id - this follows the
+# message across asyncio.to_thread and run_coroutine_threadsafe, which both
+# carry the caller's contextvars along.
+_current = contextvars.ContextVar("reguflow_span", default=None)
+_trace_lock = threading.Lock()
+_trace_file = None
+
+def _write_trace(record):
+    global _trace_file
+    line = json.dumps(record, default=str) + "\n"
+    with _trace_lock:
+        if _trace_file is None:
+            _trace_file = open(TRACE_LOG, "a", buffering=1)
+        _trace_file.write(line)
+
+
+class Span:
+    __slots__ = ("name", "labels", "metric", "start", "wall", "ids", "token")
+
+    def __init__(self, name, metric, labels):
+        self.name = name
+        self.metric = metric
+        self.labels = labels
+        self.token = None
+
+    def __enter__(self):
+        if TRACE_LOG:
+            parent = _current.get()
+            self.ids = (parent[0] if parent else os.urandom(6).hex(), os.urandom(4).hex(),
+                        parent[1] if parent else None)
+            self.token = _current.set(self.ids)
+            self.wall = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if self.metric == "reguflow_stage_seconds":
+            registry.observe(self.metric, elapsed, stage=self.name, **self.labels)
+        else:
+            registry.observe(self.metric, elapsed, **self.labels)
+        if self.token is not None:
+            _current.reset(self.token)
+            trace, span_id, parent = self.ids
+            record = {"ts": round(self.wall, 6), "trace": trace, "span": span_id, "parent": parent,
+                      "name": self.name, "ms": round(elapsed * 1000, 3), **self.labels}
+            if exc_type is not None:
+                record["error"] = exc_type.__name__
+            _write_trace(record)
+        return False
+
+
+_NOOP = nullcontext()
+
+def span(name, metric="reguflow_stage_seconds", **labels):
+    # with metrics.span("judge"): ...  -> one observation in reguflow_stage_seconds{stage="judge"}
+    if not METRICS_ENABLED:
+        return _NOOP
+    return Span(name, metric, labels)
+
+
+# --- HOT-PATH HELPERS ---
+def inc(name, value=1, **labels):
+    if METRICS_ENABLED:
+        registry.inc(name, value, **labels)
+
+def observe(name, value, **labels):
+    if METRICS_ENABLED:
+        registry.observe(name, value, **labels)
+
+def bytes_written(target, n):
+    if METRICS_ENABLED and n > 0:
+        registry.inc("reguflow_bytes_written_total", n, target=target)
+
+def cache_lookup(cache, hit):
+    if METRICS_ENABLED:
+        registry.inc("reguflow_cache_lookups_total", cache=cache, result="hit" if hit else "miss")
+
+def record_llm_usage(model, prompt_tokens=0, completion_tokens=0):
+    if not METRICS_ENABLED:
+        return
+    if prompt_tokens:
+        registry.inc("reguflow_llm_tokens_total", prompt_tokens, model=model, kind="prompt")
+    if completion_tokens:
+        registry.inc("reguflow_llm_tokens_total", completion_tokens, model=model, kind="completion")
+    price = LLM_PRICES.get(model)
+    if price:
+        cost = (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+        registry.inc("reguflow_llm_cost_usd_total", cost, model=model)
+
+
+# --- BUILT-IN GAUGES ---
+def _process_write_bytes():
+    # write_bytes = what actually reached the block layer (JSON files, SQLite + WAL,
+    # transcript segments); wchar = everything passed to write() incl. sockets
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+    except (OSError, ValueError):
+        return None
+    return {(("kind", "storage"),): int(fields["write_bytes"]), (("kind", "syscall"),): int(fields["wchar"])}
+
+registry.gauge("reguflow_process_write_bytes", _process_write_bytes)
+
+
+def render_prometheus():
+    return registry.render()
+
+def snapshot():
+    return registry.snapshot()
+
+
+# --- STANDALONE EXPORTER ---
+# api.py serves /metrics itself; the Streamlit process has no HTTP routes of its
+# own, so app.py starts this tiny server when REGUFLOW_METRICS_PORT is set.
+_server = None
+_server_lock = threading.Lock()
+
+def serve(port, host="127.0.0.1"):
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=_server.serve_forever, name="reguflow-metrics", daemon=True).start()
+    return _server
+
+
+if __name__ == "__main__":
+    # python metrics.py  -> run one scan + a few local decisions and print the exposition
+    import backend_logic
+    backend_logic.detect_threats_logic()
+    for text in ("Hello, how can I help?", "Send me your password"):
+        backend_logic.local_decision(text)
+    print(render_prometheus())
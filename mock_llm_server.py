@@ -0,0 +1,183 @@
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the OpenAI-compatible /v1/chat/completions endpoint, so the
+# chat path can be load-tested without hitting api.aimlapi.com.
+# Point the app at it with REGUFLOW_LLM_BASE_URL=http://127.0.0.1:8009/v1
+
+CANNED_REPLIES = [
+    "Thanks, that helps a lot.",
+    "Okay, I'll try that now.",
+    "Great, how long will it take?",
+    "I still can't log in, any ideas?",
+    "Perfect, thank you for your help!",
+]
+
+
+class MockConfig:
+    def __init__(self, latency_ms=400.0, latency_sigma=0.5, violation_rate=0.1, error_rate=0.0,
+                 tokens_per_sec=40.0, seed=None):
+        self.latency_ms = latency_ms          # median latency (lognormal distribution)
+        self.latency_sigma = latency_sigma    # lognormal shape; 0 = constant latency
+        self.violation_rate = violation_rate  # share of judge calls that come back as violations
+        self.error_rate = error_rate          # share of calls answered with a 500 / 429
+        self.tokens_per_sec = tokens_per_sec  # streaming speed
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "judge": 0, "reply": 0, "stream": 0, "errors": 0}
+
+    def latency(self):
+        with self.lock:
+            return self.latency_ms / 1000.0 * self.rng.lognormvariate(0, self.latency_sigma)
+
+    def roll(self, rate):
+        with self.lock:
+            return self.rng.random() < rate
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+
+def _judge_content(config, messages):
+    user = messages[-1]["content"] if messages else ""
+    # Batch audit requests send a JSON array and expect {"verdicts": [...]}
+    if "verdicts" in messages[0]["content"]:
+        try:
+            items = json.loads(user)
+        except ValueError:
+            items = []
+        return json.dumps({"verdicts": [_verdict(config, item.get("id")) for item in items]})
+    return json.dumps(_verdict(config))
+
+def _verdict(config, msg_id=None):
+    v = {"is_violation": False}
+    if config.roll(config.violation_rate):
+        v = {"is_violation": True, "severity": "LOW", "reason": "Gave financial advice (mock)"}
+    if msg_id is not None:
+        v["id"] = msg_id
+    return v
+
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass  # keep load tests quiet
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                with config.lock:
+                    return self._send_json(200, dict(config.stats))
+            if self.path.rstrip("/").endswith("/models"):
+                return self._send_json(200, {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model"}]})
+            self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._send_json(404, {"error": {"message": "not found"}})
+            length = int(self.headers.get("Content-Length", 0))
+            req = json.loads(self.rfile.read(length) or b"{}")
+            messages = req.get("messages", [])
+            config.count("requests")
+
+            time.sleep(config.latency())
+            if config.roll(config.error_rate):
+                config.count("errors")
+                status = 429 if config.roll(0.5) else 500
+                return self._send_json(status, {"error": {"message": "mock failure", "type": "server_error"}})
+
+            is_judge = bool(messages) and "Compliance Officer" in messages[0].get("content", "")
+            config.count("judge" if is_judge else "reply")
+            content = _judge_content(config, messages) if is_judge else config.rng.choice(CANNED_REPLIES)
+            usage = {"prompt_tokens": sum(len(m.get("content", "").split()) for m in messages),
+                     "completion_tokens": len(content.split())}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            model = req.get("model", "gpt-4o-mini")
+
+            if req.get("stream"):
+                config.count("stream")
+                return self._stream(completion_id, model, content)
+
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": usage,
+            })
+
+        def _stream(self, completion_id, model, content):
+            # Server-sent events, one word per chunk
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            words = content.split(" ")
+            delay = 1.0 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0
+            for i, word in enumerate(words):
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": [{"index": 0, "finish_reason": None,
+                                                      "delta": {"content": word if i == 0 else " " + word}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(delay)
+            done = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": model, "choices": [{"index": 0, "finish_reason": "stop", "delta": {}}]}
+            self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode())
+            self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+
+def start_server(config=None, host="127.0.0.1", port=8009):
+    # Starts the mock in a daemon thread; returns (server, base_url)
+    config = config or MockConfig()
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    server.config = config
+    threading.Thread(target=server.serve_forever, name="mock-llm", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock LLM server for load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8009)
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="Median response latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Lognormal spread (0 = constant)")
+    parser.add_argument("--violation-rate", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency_ms, args.latency_sigma, args.violation_rate, args.error_rate,
+                        args.tokens_per_sec, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    server.daemon_threads = True
+    print(f"🧪 Mock LLM listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import time
+import uuid
+
+from storage import get_storage
+
+# ==========================================
+# BULK MUTATIONS (admin actions)
+# ==========================================
+# A batch is a list of changes, e.g.
+#   [{"op": "ban_customers", "user_ids": [...]},
+#    {"op": "override_risk", "user_ids": [...], "risk_score": 40},
+#    {"op": "unlock_agent", "agent_id": "agent_007"}]
+# The whole batch is validated first, then applied in ONE storage transaction
+# together with one audit entry per change: all of it lands, or none of it.
+#
+# That guarantee is SQLite's. The JSON backend saves each touched file
+# (customers.json, agents.json) atomically on its own, one after the other,
+# and appends the audit lines only after both are saved: a crash in between
+# can leave a batch half-applied or applied without its audit entry.
+#
+# actor is whatever the caller says it is - nothing here authenticates it.
+OPS = {}
+
+def op(name, required, optional=()):
+    def wrap(fn):
+        OPS[name] = (fn, required, optional)
+        return fn
+    return wrap
+
+
+# Accepted type(s) per change field (bool is rejected where a number is expected)
+FIELD_TYPES = {
+    "op": str,
+    "user_ids": list,
+    "status": str,
+    "risk_score": (int, float),
+    "agent_id": str,
+    "strikes": int,
+}
+
+def _check_field(name, field, value):
+    if isinstance(value, bool) or not isinstance(value, FIELD_TYPES[field]):
+        raise ValueError(f"'{name}': {field} has the wrong type ({type(value).__name__})")
+    if field == "user_ids" and not all(isinstance(uid, str) for uid in value):
+        raise ValueError(f"'{name}': user_ids must be a list of strings")
+
+
+@op("ban_customers", ("user_ids",))
+def _ban_customers(storage, change):
+    changed = storage.set_customer_status(change["user_ids"], "BANNED", risk_score=100)
+    return {"changed": changed, "status": "BANNED", "risk_score": 100}
+
+@op("set_customer_status", ("user_ids", "status"), ("risk_score",))
+def _set_customer_status(storage, change):
+    changed = storage.set_customer_status(change["user_ids"], change["status"], change.get("risk_score"))
+    return {"changed": changed, "status": change["status"], "risk_score": change.get("risk_score")}
+
+@op("override_risk", ("user_ids", "risk_score"))
+def _override_risk(storage, change):
+    return {"changed": storage.set_risk_score(change["user_ids"], change["risk_score"]),
+            "risk_score": change["risk_score"]}
+
+@op("unlock_agent", ("agent_id",))
+def _unlock_agent(storage, change):
+    agent = storage.get_agent(change["agent_id"])
+    if not agent:
+        raise KeyError(f"Agent not found: {change['agent_id']}")
+    before = {"status": agent.get("status"), "strikes": agent.get("strikes", 0)}
+    storage.set_agent_status(change["agent_id"], "ACTIVE", strikes=0)
+    storage.append_agent_history(change["agent_id"], "[ADMIN ACTION] Account Unlocked")
+    return {"changed": 1, "before": before, "status": "ACTIVE", "strikes": 0}
+
+@op("set_agent_status", ("agent_id", "status"), ("strikes",))
+def _set_agent_status(storage, change):
+    agent = storage.get_agent(change["agent_id"])
+    if not agent:
+        raise KeyError(f"Agent not found: {change['agent_id']}")
+    before = {"status": agent.get("status"), "strikes": agent.get("strikes", 0)}
+    storage.set_agent_status(change["agent_id"], change["status"], change.get("strikes"))
+    return {"changed": 1, "before": before, "status": change["status"]}
+
+
+def validate(changes):
+    if not changes:
+        raise ValueError("Empty mutation batch")
+    for change in changes:
+        if not isinstance(change, dict):
+            raise ValueError("Each change must be an object")
+        name = change.get("op")
+        if not isinstance(name, str) or name not in OPS:
+            raise ValueError(f"Unknown mutation op '{name}'")
+        _fn, required, optional = OPS[name]
+        missing = [f for f in required if change.get(f) is None]
+        if missing:
+            raise ValueError(f"'{name}' is missing {', '.join(missing)}")
+        unknown = sorted(set(change) - {"op", *required, *optional})
+        if unknown:
+            raise ValueError(f"'{name}' does not take {', '.join(unknown)}")
+        for field in (*required, *optional):
+            if change.get(field) is not None:
+                _check_field(name, field, change[field])
+
+
+def apply_mutations(changes, actor, reason=None, storage=None):
+    # Returns {"batch_id", "results": [...]} or raises (ValueError / KeyError) with nothing written
+    storage = storage or get_storage()
+    validate(changes)
+    batch_id = uuid.uuid4().hex[:12]
+    results = []
+    with storage.transaction():
+        for change in changes:
+            result = OPS[change["op"]][0](storage, change)
+            target = change.get("agent_id") or change.get("user_ids")
+            storage.append_audit({
+                "ts": time.time(), "batch_id": batch_id, "actor": actor, "reason": reason,
+                "op": change["op"], "target": target, "result": result,
+            })
+            results.append({"op": change["op"], **result})
+    return {"batch_id": batch_id, "results": results}
@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+
+import metrics
+
+# Folder where the data files live (same folder as this script unless REGUFLOW_DATA_DIR is set)
+BASE_DIR = os.getenv("REGUFLOW_DATA_DIR", os.path.dirname(os.path.abspath(__file__)))
+
+# Fields we keep secondary indexes for (value -> list of record ids)
+INDEXED_FIELDS = ("ip", "status", "last_login_time", "wallet")
+
+
+# --- PROCESS-WIDE JSON REPOSITORY ---
+# Each file is parsed once and kept in memory. Before handing out the cached
+# copy we stat() the file: if its mtime or size changed (another process or
+# a manual edit), we re-parse it. Writes that go through save() refresh the
+# cache directly, so they never trigger a re-parse.
+class JsonRepository:
+    def __init__(self, base_dir=BASE_DIR):
+        self.base_dir = base_dir
+        self._lock = threading.RLock()
+        self._entries = {}  # filename -> {"stamp", "data", "indexes"}
+
+    def _path(self, filename):
+        return os.path.join(self.base_dir, filename)
+
+    def _stamp(self, path):
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _entry(self, filename):
+        path = self._path(filename)
+        stamp = self._stamp(path)
+        entry = self._entries.get(filename)
+        metrics.cache_lookup("json_repository", entry is not None and entry["stamp"] == stamp)
+        if entry is None or entry["stamp"] != stamp:
+            with open(path, "r") as f:
+                data = json.load(f)
+            entry = {"stamp": stamp, "data": data, "indexes": {}}
+            self._entries[filename] = entry
+        return entry
+
+    def load(self, filename):
+        # NOTE: returns the shared cached object - treat it as read-only.
+        # Writers edit a deep copy and hand it to save() (see JsonStorage),
+        # so a write that fails halfway never leaks into other readers.
+        with self._lock:
+            return self._entry(filename)["data"]
+
+    def save(self, filename, data):
+        # Atomic: write a temp file next to the target, fsync, then rename over it.
+        # A crash mid-dump leaves the old file intact instead of a truncated one.
+        path = self._path(filename)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._lock:
+            try:
+                with open(tmp, "w") as f:
+                    json.dump(data, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, path)
+            except Exception:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                # Never keep a cache that disagrees with the disk
+                self._entries.pop(filename, None)
+                raise
+            stamp = self._stamp(path)
+            self._entries[filename] = {"stamp": stamp, "data": data, "indexes": {}}
+        metrics.bytes_written(filename, stamp[1])
+
+    def version(self, filename):
+        # (mtime_ns, size) of the file as last loaded/saved - changes on every write
+        with self._lock:
+            return self._entry(filename)["stamp"]
+
+    def invalidate(self, filename=None):
+        with self._lock:
+            if filename is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(filename, None)
+
+    # --- SECONDARY INDEXES ---
+    # Built lazily per field on first use and dropped whenever the data changes.
+    def index(self, filename, field):
+        if field not in INDEXED_FIELDS:
+            raise KeyError(f"Field '{field}' is not indexed")
+        with self._lock:
+            entry = self._entry(filename)
+            idx = entry["indexes"].get(field)
+            if idx is None:
+                idx = {}
+                for uid, record in entry["data"].items():
+                    if field in record:
+                        idx.setdefault(record[field], []).append(uid)
+                entry["indexes"][field] = idx
+            return idx
+
+    def find(self, filename, field, value):
+        with self._lock:
+            ids = self.index(filename, field).get(value, [])
+            data = self._entries[filename]["data"]
+            return [data[uid] for uid in ids]
+
+
+# Shared instance used by backend_logic (one per process)
+repository = JsonRepository()
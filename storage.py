@@ -0,0 +1,682 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+import metrics
+from customer_table import CustomerTable, as_plain
+from snapshot import open_snapshot, write_snapshot
+from repository import BASE_DIR, repository
+from transcript_log import transcript_log
+
+# Which engine backs the app: "sqlite" (default) or "json" (the original flat files)
+STORAGE_BACKEND = os.getenv("REGUFLOW_STORAGE", "sqlite").lower()
+DB_PATH = os.getenv("REGUFLOW_DB", os.path.join(BASE_DIR, "reguflow.db"))
+
+# How SQLite hands out the ledger: "compact" (column arrays + dict-like row
+# views, see customer_table.py; ~5-10x less memory) or "dict" (plain dicts)
+CUSTOMER_RECORDS = os.getenv("REGUFLOW_CUSTOMER_RECORDS", "compact").lower()
+
+# Compact mode also keeps a memory-mapped copy of the ledger next to the
+# database (see snapshot.py): "auto" opens it when it matches the current
+# data version and rewrites it after a rebuild, "off" always reads SQL.
+# The rewrite runs on a background timer once writes have been quiet for
+# SNAPSHOT_DELAY seconds (and at exit), never inside the read that rebuilt.
+SNAPSHOT_MODE = os.getenv("REGUFLOW_SNAPSHOT", "auto").lower()
+SNAPSHOT_PATH = os.getenv("REGUFLOW_SNAPSHOT_PATH")
+SNAPSHOT_DELAY = float(os.getenv("REGUFLOW_SNAPSHOT_DELAY", "10"))
+
+CUSTOMER_FIELDS = ("id", "name", "email", "ip", "wallet", "risk_score", "status",
+                   "last_login_location", "last_login_time", "deposit_amount")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    id TEXT PRIMARY KEY,
+    name TEXT, email TEXT, ip TEXT, wallet TEXT,
+    risk_score INTEGER, status TEXT,
+    last_login_location TEXT, last_login_time TEXT,
+    deposit_amount REAL,
+    extra TEXT
+);
+-- Indexes matching the detection queries (shared IP, status filter, bot swarm, wallet, smurfing range)
+CREATE INDEX IF NOT EXISTS idx_customers_ip ON customers(ip);
+CREATE INDEX IF NOT EXISTS idx_customers_status ON customers(status);
+CREATE INDEX IF NOT EXISTS idx_customers_login_time ON customers(last_login_time);
+CREATE INDEX IF NOT EXISTS idx_customers_wallet ON customers(wallet);
+CREATE INDEX IF NOT EXISTS idx_customers_deposit ON customers(deposit_amount);
+
+CREATE TABLE IF NOT EXISTS agents (
+    id TEXT PRIMARY KEY,
+    name TEXT, status TEXT, strikes INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tickets (
+    agent_id TEXT, id TEXT,
+    customer_name TEXT, risk_score INTEGER,
+    PRIMARY KEY (agent_id, id)
+);
+CREATE TABLE IF NOT EXISTS ticket_messages (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    agent_id TEXT, ticket_id TEXT,
+    role TEXT, text TEXT, blocked INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_ticket_messages ON ticket_messages(agent_id, ticket_id, seq);
+CREATE TABLE IF NOT EXISTS violations (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    agent_id TEXT, entry TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_violations_agent ON violations(agent_id, seq);
+-- Legacy: transcripts now live in transcript_log (rows are moved there on startup)
+CREATE TABLE IF NOT EXISTS transcript (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    agent_id TEXT, line TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transcript_agent ON transcript(agent_id, seq);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY, value INTEGER
+);
+-- Who changed what (see mutations.py). Append-only: the triggers refuse edits.
+CREATE TABLE IF NOT EXISTS audit_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL, batch_id TEXT, actor TEXT, op TEXT, entry TEXT
+);
+CREATE TRIGGER IF NOT EXISTS audit_log_no_update BEFORE UPDATE ON audit_log
+BEGIN SELECT RAISE(ABORT, 'audit_log is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS audit_log_no_delete BEFORE DELETE ON audit_log
+BEGIN SELECT RAISE(ABORT, 'audit_log is append-only'); END;
+"""
+
+# JSON backend keeps its audit trail as JSON lines next to the data files
+AUDIT_LOG_PATH = os.path.join(BASE_DIR, "audit_log.jsonl")
+
+
+def _flush_transcript(log, pending):
+    # Transcript lines buffered during a transaction, written once it committed
+    by_agent = {}
+    for agent_id, line in pending:
+        by_agent.setdefault(agent_id, []).append(line)
+    for agent_id, lines in by_agent.items():
+        log.append_many(agent_id, lines)
+
+
+def _take(counts, key):
+    # Consume one occurrence of key from a Counter; False when none is left
+    if counts[key] <= 0:
+        return False
+    counts[key] -= 1
+    return True
+
+
+# Fields outside the fixed columns survive the round trip as a JSON blob
+def _extra_fields(user):
+    extra = {k: v for k, v in user.items() if k not in CUSTOMER_FIELDS}
+    return json.dumps(extra) if extra else None
+
+
+# ==========================================
+# JSON BACKEND (original flat files)
+# ==========================================
+# Every write still rewrites the whole file, but writes inside one
+# transaction() are coalesced into a single save per file. The repository's
+# cached data is shared with every reader, so writers never touch it: the
+# first write to a file in a transaction takes a private deep copy, and only
+# a commit hands that copy to save(). A failed transaction leaves no trace.
+class JsonStorage:
+    name = "json"
+
+    def __init__(self, repo=repository, transcripts=transcript_log, audit_path=AUDIT_LOG_PATH):
+        self.repo = repo
+        self.transcripts = transcripts
+        self.audit_path = audit_path
+        self._local = threading.local()
+        self._migrated = False
+
+    @contextmanager
+    def transaction(self):
+        working = getattr(self._local, "working", None)
+        if working is not None:  # nested -> join the outer transaction
+            yield
+            return
+        self._local.working = {}  # filename -> private copy being edited
+        self._local.transcript = []
+        self._local.audit = []
+        try:
+            yield
+            for filename, data in self._local.working.items():
+                self.repo.save(filename, data)
+            _flush_transcript(self.transcripts, self._local.transcript)
+            self._write_audit(self._local.audit)
+        finally:
+            self._local.working = None
+            self._local.transcript = None
+            self._local.audit = None
+
+    def _load(self, filename):
+        # This transaction's copy if it already wrote the file, else the shared one
+        working = getattr(self._local, "working", None)
+        if working and filename in working:
+            return working[filename]
+        return self.repo.load(filename)
+
+    def _writable(self, filename):
+        # Call inside transaction(). A JSON round trip is a full deep copy of
+        # JSON data, several times faster than copy.deepcopy
+        working = self._local.working
+        if filename not in working:
+            working[filename] = json.loads(json.dumps(self.repo.load(filename)))
+        return working[filename]
+
+    # --- READS ---
+    def get_customers(self):
+        return self._load("customers.json")
+
+    def get_agents(self):
+        return self._load("agents.json")
+
+    def get_agent(self, agent_id):
+        return self.get_agents().get(agent_id)
+
+    def find_customers(self, field, value):
+        if field == "id":  # the dict key itself, like SQLite's primary key
+            user = self.get_customers().get(value)
+            return [user] if user is not None else []
+        return self.repo.find("customers.json", field, value)
+
+    def data_version(self, key):
+        # key: "customers" | "agents". Opaque; changes whenever that data is written.
+        mtime_ns, size = self.repo.version(f"{key}.json")
+        return f"{mtime_ns}-{size}"
+
+    # --- TRANSCRIPTS (segmented log, see transcript_log.py) ---
+    def _migrate_transcripts(self):
+        # One-off: move transcripts still embedded in agents.json into the log
+        if self._migrated:
+            return
+        legacy = [aid for aid, agent in self.get_agents().items() if "transcript" in agent]
+        if legacy:
+            with self.transaction():
+                agents = self._writable("agents.json")
+                for aid in legacy:
+                    lines = agents[aid].pop("transcript")
+                    if not self.transcripts.count(aid):
+                        self.transcripts.append_many(aid, lines)
+        self._migrated = True
+
+    def tail_transcript(self, agent_id, n=200):
+        self._migrate_transcripts()
+        return self.transcripts.tail(agent_id, n)
+
+    def iter_transcript(self, agent_id):
+        self._migrate_transcripts()
+        return self.transcripts.iter_lines(agent_id)
+
+    # --- ROW-LEVEL WRITES ---
+    def append_transcript(self, agent_id, line):
+        self._migrate_transcripts()
+        pending = getattr(self._local, "transcript", None)
+        if pending is None:
+            self.transcripts.append(agent_id, line)
+        else:
+            pending.append((agent_id, line))
+
+    def append_ticket_message(self, agent_id, ticket_id, role, text, blocked=False):
+        msg = {"role": role, "text": text}
+        if blocked:
+            msg["blocked"] = True
+        with self.transaction():
+            self._writable("agents.json")[agent_id]["tickets"][ticket_id]["history"].append(msg)
+
+    def append_agent_history(self, agent_id, entry):
+        with self.transaction():
+            self._writable("agents.json")[agent_id].setdefault("history", []).append(entry)
+
+    def set_agent_status(self, agent_id, status, strikes=None):
+        with self.transaction():
+            agent = self._writable("agents.json")[agent_id]
+            agent["status"] = status
+            if strikes is not None:
+                agent["strikes"] = strikes
+
+    def add_strike(self, agent_id):
+        with self.transaction():
+            agent = self._writable("agents.json")[agent_id]
+            agent["strikes"] = agent.get("strikes", 0) + 1
+        return agent["strikes"]
+
+    def set_customer_status(self, user_ids, status, risk_score=None):
+        changed = 0
+        with self.transaction():
+            customers = self._writable("customers.json")
+            for uid in user_ids:
+                if uid in customers:
+                    customers[uid]["status"] = status
+                    if risk_score is not None:
+                        customers[uid]["risk_score"] = risk_score
+                    changed += 1
+        return changed
+
+    def set_risk_score(self, user_ids, risk_score):
+        changed = 0
+        with self.transaction():
+            customers = self._writable("customers.json")
+            for uid in user_ids:
+                if uid in customers:
+                    customers[uid]["risk_score"] = risk_score
+                    changed += 1
+        return changed
+
+    # --- AUDIT LOG ---
+    def _write_audit(self, entries):
+        if not entries:
+            return
+        with open(self.audit_path, "a") as f:
+            data = "".join(json.dumps(entry) + "\n" for entry in entries)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        metrics.bytes_written("audit", len(data.encode()))
+
+    def append_audit(self, entry):
+        # Written once the surrounding transaction committed, like the transcript
+        pending = getattr(self._local, "audit", None)
+        if pending is None:
+            self._write_audit([entry])
+        else:
+            pending.append(entry)
+
+    def get_audit(self, limit=100):
+        if not os.path.exists(self.audit_path):
+            return []
+        with open(self.audit_path) as f:
+            lines = f.readlines()[-limit:]
+        return [json.loads(line) for line in reversed(lines)]
+
+
+# ==========================================
+# SQLITE BACKEND (default)
+# ==========================================
+# WAL mode lets Streamlit sessions read while one of them writes, and each
+# chat message / ban is a handful of indexed row writes instead of a
+# full-file rewrite. One connection per thread (Streamlit runs sessions in threads).
+class SqliteStorage:
+    name = "sqlite"
+
+    def __init__(self, db_path=DB_PATH, seed_dir=BASE_DIR, transcripts=transcript_log,
+                 snapshot_path=SNAPSHOT_PATH):
+        self.db_path = db_path
+        self.snapshot_path = snapshot_path or os.path.splitext(db_path)[0] + ".customers.snap"
+        self.transcripts = transcripts
+        self._local = threading.local()
+        self._cache_lock = threading.Lock()
+        self._cache = {}  # "customers"/"agents" -> (version, data)
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_pending = None  # (table, source) waiting for the timer
+        self._snapshot_timer = None
+        self._snapshot_atexit = False
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        # First run: import the demo JSON files so the app works out of the box
+        if conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0] == 0:
+            self.import_json(seed_dir)
+        # Random per-database id: a snapshot left behind by a deleted or
+        # swapped database file can never match this one's versions
+        conn.execute("INSERT OR IGNORE INTO meta(key, value) VALUES ('db_id', ?)",
+                     (int.from_bytes(os.urandom(7), "big"),))
+        self._migrate_transcripts()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self._conn()
+        if self._local.depth:  # nested -> join the outer transaction
+            self._local.depth += 1
+            try:
+                yield
+            finally:
+                self._local.depth -= 1
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        self._local.transcript = []
+        wal_before = self._wal_size() if metrics.METRICS_ENABLED else 0
+        try:
+            yield
+            with metrics.span("db_commit"):
+                conn.execute("COMMIT")
+            if metrics.METRICS_ENABLED:
+                metrics.bytes_written("sqlite", self._wal_size() - wal_before)
+            _flush_transcript(self.transcripts, self._local.transcript)
+        except BaseException:
+            # Only while the transaction is still open: after COMMIT (a failed
+            # transcript flush or metrics span) there is nothing to undo, and a
+            # ROLLBACK would raise over the real error
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            self._local.depth = 0
+            self._local.transcript = None
+
+    def _wal_size(self):
+        # Commits land in the WAL first, so its growth is what a commit wrote.
+        # A checkpoint that restarts the WAL in between makes the delta <= 0
+        # and that commit goes uncounted (bytes_written ignores it).
+        try:
+            return os.path.getsize(self.db_path + "-wal")
+        except OSError:
+            return 0
+
+    def _bump(self, key):
+        self._conn().execute(
+            "INSERT INTO meta(key, value) VALUES (?, 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1", (key,))
+
+    def _version(self, key):
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def data_version(self, key):
+        # Public form of the meta counter: callers key their own caches on it
+        return self._version(key)
+
+    # --- ROW <-> DICT ---
+    def _customer_from_row(self, row):
+        # NULL columns are fields the imported record didn't have
+        user = {f: row[f] for f in CUSTOMER_FIELDS if row[f] is not None}
+        if row["extra"]:
+            user.update(json.loads(row["extra"]))
+        return user
+
+    def _agent_from_rows(self, conn, row):
+        aid = row["id"]
+        agent = {"name": row["name"], "status": row["status"], "strikes": row["strikes"],
+                 "history": [r[0] for r in conn.execute(
+                     "SELECT entry FROM violations WHERE agent_id = ? ORDER BY seq", (aid,))],
+                 "tickets": {}}
+        for t in conn.execute("SELECT * FROM tickets WHERE agent_id = ? ORDER BY rowid", (aid,)):
+            agent["tickets"][t["id"]] = {"customer_name": t["customer_name"],
+                                         "risk_score": t["risk_score"], "history": []}
+        for m in conn.execute(
+                "SELECT ticket_id, role, text, blocked FROM ticket_messages WHERE agent_id = ? ORDER BY seq", (aid,)):
+            msg = {"role": m["role"], "text": m["text"]}
+            if m["blocked"]:
+                msg["blocked"] = True
+            agent["tickets"][m["ticket_id"]]["history"].append(msg)
+        return agent
+
+    # --- READS ---
+    # Full-table reads are cached per data version, so a rerun with no
+    # intervening write costs one tiny SELECT on the meta table.
+    def _cached(self, key, build):
+        version = self._version(key)
+        with self._cache_lock:
+            hit = self._cache.get(key)
+            if hit and hit[0] == version:
+                metrics.cache_lookup(f"sqlite_{key}", True)
+                return hit[1]
+        metrics.cache_lookup(f"sqlite_{key}", False)
+        data = build(version)
+        with self._cache_lock:
+            self._cache[key] = (version, data)
+        return data
+
+    def get_customers(self):
+        def build(version):
+            if CUSTOMER_RECORDS == "compact":
+                return self._customer_table(version)
+            rows = self._conn().execute("SELECT * FROM customers ORDER BY rowid")
+            return {row["id"]: self._customer_from_row(row) for row in rows}
+        return self._cached("customers", build)
+
+    def _customer_table(self, version):
+        # Cold start: map the snapshot if it was written at this exact version
+        # (any process may have written it), else rebuild from SQL and queue a
+        # fresh one for the next process. Snapshot tables are read-only, which
+        # is fine: writes go through SQL and bump the version.
+        source = f"{self._version('db_id')}:{version}"
+        if SNAPSHOT_MODE != "off":
+            with metrics.span("snapshot_open"):
+                table = open_snapshot(self.snapshot_path, source)
+            metrics.cache_lookup("snapshot", table is not None)
+            if table is not None:
+                return table
+        rows = self._conn().execute("SELECT * FROM customers ORDER BY rowid")
+        # One short-lived dict per row; only the columns stay in the cache
+        table = CustomerTable.from_records(map(self._customer_from_row, rows))
+        if SNAPSHOT_MODE == "auto":
+            self._schedule_snapshot(table, source)
+        return table
+
+    # --- LEDGER SNAPSHOT ---
+    # Debounced: a burst of writes (each followed by a rebuilding read) ends in
+    # one file write for the latest table, on a timer thread. The cached table
+    # is never rewritten in place - writes go to SQL and the next read builds a
+    # new one - so the timer can serialise it while readers keep using it.
+    def _schedule_snapshot(self, table, source):
+        with self._snapshot_lock:
+            first, self._snapshot_atexit = not self._snapshot_atexit, True
+            self._snapshot_pending = (table, source)
+            if self._snapshot_timer is not None:
+                self._snapshot_timer.cancel()
+            self._snapshot_timer = threading.Timer(SNAPSHOT_DELAY, self.flush_snapshot)
+            self._snapshot_timer.daemon = True
+            self._snapshot_timer.start()
+        if first:
+            atexit.register(self.flush_snapshot)
+
+    def flush_snapshot(self):
+        # Write the queued snapshot now (timer, exit, or `python storage.py import`)
+        with self._snapshot_lock:
+            pending, self._snapshot_pending = self._snapshot_pending, None
+            if self._snapshot_timer is not None:
+                self._snapshot_timer.cancel()
+                self._snapshot_timer = None
+        if pending is None:
+            return
+        table, source = pending
+        try:
+            metrics.bytes_written("snapshot", write_snapshot(table, self.snapshot_path, source))
+        except OSError as e:
+            print(f"⚠️ Ledger snapshot not written: {e}")
+
+    def get_agents(self):
+        def build(_version):
+            conn = self._conn()
+            return {row["id"]: self._agent_from_rows(conn, row)
+                    for row in conn.execute("SELECT * FROM agents ORDER BY rowid").fetchall()}
+        return self._cached("agents", build)
+
+    def get_agent(self, agent_id):
+        conn = self._conn()
+        row = conn.execute("SELECT * FROM agents WHERE id = ?", (agent_id,)).fetchone()
+        return self._agent_from_rows(conn, row) if row else None
+
+    def find_customers(self, field, value):
+        if field not in CUSTOMER_FIELDS:
+            raise KeyError(f"Unknown customer field '{field}'")
+        rows = self._conn().execute(f"SELECT * FROM customers WHERE {field} = ?", (value,))
+        return [self._customer_from_row(row) for row in rows]
+
+    # --- TRANSCRIPTS (segmented log, see transcript_log.py) ---
+    def _migrate_transcripts(self):
+        # Databases from before the log keep transcripts in the legacy table
+        conn = self._conn()
+        aids = [r[0] for r in conn.execute("SELECT DISTINCT agent_id FROM transcript")]
+        if not aids:
+            return
+        with self.transaction():
+            for aid in aids:
+                lines = [r[0] for r in conn.execute(
+                    "SELECT line FROM transcript WHERE agent_id = ? ORDER BY seq", (aid,))]
+                if not self.transcripts.count(aid):
+                    self.transcripts.append_many(aid, lines)
+            conn.execute("DELETE FROM transcript")
+
+    def tail_transcript(self, agent_id, n=200):
+        return self.transcripts.tail(agent_id, n)
+
+    def iter_transcript(self, agent_id):
+        return self.transcripts.iter_lines(agent_id)
+
+    # --- ROW-LEVEL WRITES ---
+    def append_transcript(self, agent_id, line):
+        # Not part of the agents data version: appends never invalidate the agents cache
+        pending = getattr(self._local, "transcript", None)
+        if pending is None:
+            self.transcripts.append(agent_id, line)
+        else:
+            pending.append((agent_id, line))
+
+    def append_ticket_message(self, agent_id, ticket_id, role, text, blocked=False):
+        with self.transaction():
+            self._conn().execute(
+                "INSERT INTO ticket_messages(agent_id, ticket_id, role, text, blocked) VALUES (?, ?, ?, ?, ?)",
+                (agent_id, ticket_id, role, text, int(bool(blocked))))
+            self._bump("agents")
+
+    def append_agent_history(self, agent_id, entry):
+        with self.transaction():
+            self._conn().execute("INSERT INTO violations(agent_id, entry) VALUES (?, ?)", (agent_id, entry))
+            self._bump("agents")
+
+    def set_agent_status(self, agent_id, status, strikes=None):
+        with self.transaction():
+            if strikes is None:
+                self._conn().execute("UPDATE agents SET status = ? WHERE id = ?", (status, agent_id))
+            else:
+                self._conn().execute("UPDATE agents SET status = ?, strikes = ? WHERE id = ?",
+                                     (status, strikes, agent_id))
+            self._bump("agents")
+
+    def add_strike(self, agent_id):
+        with self.transaction():
+            conn = self._conn()
+            conn.execute("UPDATE agents SET strikes = COALESCE(strikes, 0) + 1 WHERE id = ?", (agent_id,))
+            self._bump("agents")
+            return conn.execute("SELECT strikes FROM agents WHERE id = ?", (agent_id,)).fetchone()[0]
+
+    def set_customer_status(self, user_ids, status, risk_score=None):
+        # One prepared statement over the batch, primary-key lookups only:
+        # a 50k-account ring costs 50k row updates, not a rewrite of the ledger
+        with self.transaction():
+            conn = self._conn()
+            if risk_score is None:
+                cur = conn.executemany("UPDATE customers SET status = ? WHERE id = ?",
+                                       ((status, uid) for uid in user_ids))
+            else:
+                cur = conn.executemany("UPDATE customers SET status = ?, risk_score = ? WHERE id = ?",
+                                       ((status, risk_score, uid) for uid in user_ids))
+            self._bump("customers")
+        return cur.rowcount
+
+    def set_risk_score(self, user_ids, risk_score):
+        with self.transaction():
+            cur = self._conn().executemany("UPDATE customers SET risk_score = ? WHERE id = ?",
+                                           ((risk_score, uid) for uid in user_ids))
+            self._bump("customers")
+        return cur.rowcount
+
+    # --- AUDIT LOG ---
+    # Same transaction as the change it describes: both commit or neither does
+    def append_audit(self, entry):
+        with self.transaction():
+            self._conn().execute(
+                "INSERT INTO audit_log(ts, batch_id, actor, op, entry) VALUES (?, ?, ?, ?, ?)",
+                (entry["ts"], entry["batch_id"], entry["actor"], entry["op"], json.dumps(entry)))
+
+    def get_audit(self, limit=100):
+        rows = self._conn().execute("SELECT entry FROM audit_log ORDER BY seq DESC LIMIT ?", (limit,))
+        return [json.loads(r[0]) for r in rows]
+
+    # --- JSON IMPORT / EXPORT ---
+    def import_json(self, src_dir=BASE_DIR, replace_transcripts=False):
+        # replace_transcripts=True (explicit `python storage.py import`) makes the
+        # JSON files' transcripts authoritative. The automatic first-run import
+        # leaves the log alone - it may already hold the JSON backend's
+        # transcripts - and only appends legacy agents.json lines it lacks.
+        with open(os.path.join(src_dir, "customers.json")) as f:
+            customers = json.load(f)
+        with open(os.path.join(src_dir, "agents.json")) as f:
+            agents = json.load(f)
+        with self.transaction():
+            conn = self._conn()
+            for table in ("customers", "agents", "tickets", "ticket_messages", "violations", "transcript"):
+                conn.execute(f"DELETE FROM {table}")
+            conn.executemany(
+                f"INSERT INTO customers({', '.join(CUSTOMER_FIELDS)}, extra) VALUES ({', '.join('?' * (len(CUSTOMER_FIELDS) + 1))})",
+                ([u.get(f) for f in CUSTOMER_FIELDS] + [_extra_fields(u)] for u in customers.values()))
+            for aid, agent in agents.items():
+                conn.execute("INSERT INTO agents(id, name, status, strikes) VALUES (?, ?, ?, ?)",
+                             (aid, agent.get("name"), agent.get("status", "ACTIVE"), agent.get("strikes", 0)))
+                for tid, t in agent.get("tickets", {}).items():
+                    conn.execute("INSERT INTO tickets(agent_id, id, customer_name, risk_score) VALUES (?, ?, ?, ?)",
+                                 (aid, tid, t.get("customer_name"), t.get("risk_score")))
+                    conn.executemany(
+                        "INSERT INTO ticket_messages(agent_id, ticket_id, role, text, blocked) VALUES (?, ?, ?, ?, ?)",
+                        ((aid, tid, m["role"], m["text"], int(bool(m.get("blocked")))) for m in t.get("history", [])))
+                conn.executemany("INSERT INTO violations(agent_id, entry) VALUES (?, ?)",
+                                 ((aid, e) for e in agent.get("history", [])))
+            self._bump("customers")
+            self._bump("agents")
+        for aid, agent in agents.items():
+            lines = agent.get("transcript", [])
+            if replace_transcripts:
+                self.transcripts.reset(aid)
+            elif lines and self.transcripts.count(aid):
+                logged = Counter(self.transcripts.iter_lines(aid))
+                lines = [line for line in lines if not _take(logged, line)]
+            self.transcripts.append_many(aid, lines)
+        return {"customers": len(customers), "agents": len(agents)}
+
+    def export_json(self, dest_dir=BASE_DIR):
+        with open(os.path.join(dest_dir, "customers.json"), "w") as f:
+            json.dump(as_plain(self.get_customers()), f, indent=2)
+        agents = {}
+        for aid, agent in self.get_agents().items():
+            transcript = list(self.transcripts.iter_lines(aid))
+            agents[aid] = {**agent, "transcript": transcript} if transcript else agent
+        with open(os.path.join(dest_dir, "agents.json"), "w") as f:
+            json.dump(agents, f, indent=2)
+
+
+# --- BACKEND SELECTION ---
+_storage = None
+_storage_lock = threading.Lock()
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = JsonStorage() if STORAGE_BACKEND == "json" else SqliteStorage()
+    return _storage
+
+
+if __name__ == "__main__":
+    # python storage.py import  -> (re)load the SQLite DB from customers.json / agents.json
+    # python storage.py export  -> dump the SQLite DB back to customers.json / agents.json
+    import sys
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "import"
+    db = SqliteStorage()
+    if cmd == "import":
+        print(f"✅ Imported {db.import_json(replace_transcripts=True)} into {DB_PATH}")
+        if CUSTOMER_RECORDS == "compact" and SNAPSHOT_MODE == "auto":
+            db.get_customers()  # build the table and write its snapshot now
+            db.flush_snapshot()
+    elif cmd == "export":
+        db.export_json()
+        print(f"✅ Exported {DB_PATH} to JSON")
+    else:
+        print("Usage: python storage.py [import|export]")
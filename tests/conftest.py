@@ -0,0 +1,38 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import storage as storage_module  # noqa: E402
+from repository import JsonRepository  # noqa: E402
+from transcript_log import TranscriptLog  # noqa: E402
+
+
+# --- FIXTURES ---
+# Every test gets its own copy of the demo customers.json / agents.json, so
+# nothing here touches the data files, database or transcripts in the repo.
+@pytest.fixture
+def data_dir(tmp_path):
+    for name in ("customers.json", "agents.json"):
+        shutil.copy(os.path.join(ROOT, name), tmp_path / name)
+    return tmp_path
+
+
+def make_storage(backend, data_dir):
+    transcripts = TranscriptLog(str(data_dir / "transcripts"))
+    if backend == "sqlite":
+        return storage_module.SqliteStorage(str(data_dir / "reguflow.db"), seed_dir=str(data_dir),
+                                            transcripts=transcripts)
+    return storage_module.JsonStorage(JsonRepository(str(data_dir)), transcripts,
+                                      str(data_dir / "audit_log.jsonl"))
+
+
+@pytest.fixture(params=["sqlite", "json"])
+def storage(request, data_dir, monkeypatch):
+    # No ledger snapshot timer outliving the temp dir
+    monkeypatch.setattr(storage_module, "SNAPSHOT_MODE", "off")
+    return make_storage(request.param, data_dir)
@@ -0,0 +1,137 @@
+import copy
+import json
+import os
+import pickle
+
+import pytest
+
+import storage as storage_module
+from conftest import ROOT, make_storage
+from customer_table import CustomerTable, as_plain
+from snapshot import open_snapshot, write_snapshot
+
+
+def demo_records():
+    with open(os.path.join(ROOT, "customers.json")) as f:
+        records = json.load(f)
+    # Edge cases on top of the demo ledger: missing fixed fields, extra fields,
+    # values that must not be normalised, and explicit ints vs floats
+    records.update({
+        "sparse01": {"id": "sparse01", "name": "No Wallet", "status": "ACTIVE", "ip": "10.0.0.1"},
+        "extra001": {"id": "extra001", "name": "Extra", "email": "x@example.org", "ip": "2001:db8::1",
+                     "wallet": "0xabc", "risk_score": 50.5, "status": "FLAGGED",
+                     "last_login_location": "Lagos -> London (5min)", "last_login_time": "N/A",
+                     "deposit_amount": 9900, "kyc": {"level": 2, "docs": ["passport"]}, "notes": None},
+        "oddtime1": {"id": "oddtime1", "name": "Zero Pad", "ip": "010.0.0.1", "status": "ACTIVE",
+                     "last_login_time": "09:00 AM", "deposit_amount": 0.0, "risk_score": 0},
+    })
+    return records
+
+
+@pytest.fixture
+def records():
+    return demo_records()
+
+
+@pytest.fixture
+def table(records):
+    return CustomerTable.from_records(records.values())
+
+
+# --- ROUND TRIP ---
+def test_table_round_trips_to_the_plain_ledger(table, records):
+    assert len(table) == len(records)
+    assert list(table) == list(records)
+    assert table.to_dict() == records
+    assert as_plain(table) == records
+    assert json.loads(json.dumps(as_plain(table))) == records
+
+
+def test_values_keep_their_exact_type(table, records):
+    for uid, rec in records.items():
+        for name, value in rec.items():
+            assert type(table[uid][name]) is type(value), (uid, name)
+
+
+def test_views_behave_like_their_source_dicts(table, records):
+    for uid, rec in records.items():
+        view = table[uid]
+        assert view == rec
+        assert set(view) == set(rec)
+        assert len(view) == len(rec)
+        for name in ("wallet", "deposit_amount", "kyc", "notes", "missing"):
+            assert (name in view) == (name in rec)
+            assert view.get(name, "default") == rec.get(name, "default")
+
+
+def test_absent_fields_raise_key_error(table):
+    view = table["sparse01"]
+    with pytest.raises(KeyError):
+        view["wallet"]
+    with pytest.raises(KeyError):
+        view["kyc"]
+    assert "wallet" not in view.to_dict()
+
+
+def test_copy_deepcopy_and_pickle_give_plain_dicts(table, records):
+    view = table["extra001"]
+    for plain in (copy.copy(view), copy.deepcopy(view), pickle.loads(pickle.dumps(view))):
+        assert type(plain) is dict
+        assert plain == records["extra001"]
+    assert pickle.loads(pickle.dumps(table)) == records
+
+
+def test_items_and_values_walk_rows_in_insertion_order(table, records):
+    assert [uid for uid, _view in table.items()] == list(records)
+    assert [view["id"] for view in table.values()] == list(records)
+
+
+def test_membership_and_lookup(table):
+    assert "sparse01" in table
+    assert "nobody" not in table
+    with pytest.raises(KeyError):
+        table["nobody"]
+
+
+# --- WRITES THROUGH A VIEW ---
+def test_writes_match_dict_semantics(table, records):
+    view, rec = table["sparse01"], dict(records["sparse01"])
+    for name, value in (("status", "BANNED"), ("risk_score", 100), ("wallet", "0xnew"), ("tag", "ring-7")):
+        view[name] = value
+        rec[name] = value
+    del view["ip"]
+    del rec["ip"]
+    assert view == rec
+    assert "ip" not in view
+    with pytest.raises(KeyError):
+        del view["ip"]
+    with pytest.raises(KeyError):
+        del view["never-set"]
+
+
+def test_changing_the_id_reindexes_the_row(table):
+    table["sparse01"]["id"] = "renamed1"
+    assert "sparse01" not in table
+    assert table["renamed1"]["name"] == "No Wallet"
+
+
+# --- SNAPSHOT ---
+def test_snapshot_round_trip_is_read_only(table, records, tmp_path):
+    path = str(tmp_path / "customers.snap")
+    write_snapshot(table, path, source="test:1")
+    mapped = open_snapshot(path, "test:1")
+    assert mapped is not None
+    assert mapped.to_dict() == records
+    assert all(mapped[uid] == rec for uid, rec in records.items())
+    assert open_snapshot(path, "test:2") is None  # written at another version
+    with pytest.raises(TypeError):
+        mapped["sparse01"]["status"] = "BANNED"
+
+
+# --- STORAGE ---
+def test_sqlite_ledger_matches_the_json_one(data_dir, monkeypatch):
+    monkeypatch.setattr(storage_module, "SNAPSHOT_MODE", "off")
+    monkeypatch.setattr(storage_module, "CUSTOMER_RECORDS", "compact")
+    ledger = make_storage("sqlite", data_dir).get_customers()
+    assert isinstance(ledger, CustomerTable)
+    assert as_plain(ledger) == make_storage("json", data_dir).get_customers()
@@ -0,0 +1,78 @@
+import pytest
+
+from mutations import apply_mutations, validate
+
+UIDS = ["bdd640fb", "8b8148f6"]
+AGENT = "agent_007"
+
+
+# --- VALIDATION ---
+@pytest.mark.parametrize("changes, message", [
+    ([], "Empty mutation batch"),
+    (["ban_customers"], "Each change must be an object"),
+    ([{"op": "drop_table"}], "Unknown mutation op"),
+    ([{"op": "ban_customers"}], "missing user_ids"),
+    ([{"op": "override_risk", "user_ids": UIDS}], "missing risk_score"),
+    ([{"op": "ban_customers", "user_ids": UIDS, "status": "ACTIVE"}], "does not take status"),
+    ([{"op": "ban_customers", "user_ids": "bdd640fb"}], "user_ids has the wrong type"),
+    ([{"op": "ban_customers", "user_ids": [1, 2]}], "list of strings"),
+    ([{"op": "override_risk", "user_ids": UIDS, "risk_score": True}], "risk_score has the wrong type"),
+    ([{"op": "override_risk", "user_ids": UIDS, "risk_score": "90"}], "risk_score has the wrong type"),
+    ([{"op": "set_agent_status", "agent_id": AGENT, "status": "LOCKED", "strikes": 1.5}],
+     "strikes has the wrong type"),
+])
+def test_validate_rejects(changes, message):
+    with pytest.raises(ValueError, match=message):
+        validate(changes)
+
+
+def test_validate_accepts_every_op():
+    validate([
+        {"op": "ban_customers", "user_ids": UIDS},
+        {"op": "set_customer_status", "user_ids": UIDS, "status": "FLAGGED", "risk_score": 80},
+        {"op": "override_risk", "user_ids": UIDS, "risk_score": 12.5},
+        {"op": "unlock_agent", "agent_id": AGENT},
+        {"op": "set_agent_status", "agent_id": AGENT, "status": "LOCKED", "strikes": 2},
+    ])
+
+
+# --- APPLYING A BATCH ---
+def test_invalid_change_rejects_the_whole_batch_before_writing(storage):
+    before = {uid: dict(storage.get_customers()[uid]) for uid in UIDS}
+    with pytest.raises(ValueError):
+        apply_mutations([{"op": "ban_customers", "user_ids": UIDS},
+                         {"op": "override_risk", "user_ids": UIDS, "risk_score": "high"}],
+                        actor="tester", storage=storage)
+    assert {uid: dict(storage.get_customers()[uid]) for uid in UIDS} == before
+    assert storage.get_audit() == []
+
+
+def test_failing_change_rolls_back_the_earlier_ones(storage):
+    before = {uid: dict(storage.get_customers()[uid]) for uid in UIDS}
+    with pytest.raises(KeyError, match="Agent not found"):
+        apply_mutations([{"op": "ban_customers", "user_ids": UIDS},
+                         {"op": "unlock_agent", "agent_id": "agent_404"}],
+                        actor="tester", storage=storage)
+    assert {uid: dict(storage.get_customers()[uid]) for uid in UIDS} == before
+    assert storage.get_audit() == []
+
+
+def test_batch_applies_and_audits_every_change(storage):
+    storage.set_agent_status(AGENT, "LOCKED", strikes=3)
+    out = apply_mutations([{"op": "ban_customers", "user_ids": UIDS},
+                           {"op": "unlock_agent", "agent_id": AGENT}],
+                          actor="tester", reason="ring", storage=storage)
+
+    customers = storage.get_customers()
+    assert all(customers[uid]["status"] == "BANNED" and customers[uid]["risk_score"] == 100 for uid in UIDS)
+    agent = storage.get_agent(AGENT)
+    assert (agent["status"], agent["strikes"]) == ("ACTIVE", 0)
+
+    assert [r["op"] for r in out["results"]] == ["ban_customers", "unlock_agent"]
+    assert out["results"][0]["changed"] == len(UIDS)
+    assert out["results"][1]["before"] == {"status": "LOCKED", "strikes": 3}
+
+    audit = storage.get_audit()
+    assert sorted(e["op"] for e in audit) == ["ban_customers", "unlock_agent"]
+    assert {e["batch_id"] for e in audit} == {out["batch_id"]}
+    assert all(e["actor"] == "tester" and e["reason"] == "ring" for e in audit)
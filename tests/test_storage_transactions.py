@@ -0,0 +1,72 @@
+import pytest
+
+from conftest import make_storage
+
+UID = "bdd640fb"
+AGENT = "agent_007"
+
+
+class Boom(Exception):
+    pass
+
+
+def customer(storage, uid=UID):
+    return dict(storage.get_customers()[uid])
+
+
+def test_commit_is_visible_to_a_fresh_storage(storage, data_dir):
+    with storage.transaction():
+        storage.set_customer_status([UID], "FLAGGED", risk_score=77)
+        storage.set_agent_status(AGENT, "LOCKED", strikes=3)
+
+    reopened = make_storage(storage.name, data_dir)
+    assert customer(reopened)["status"] == "FLAGGED"
+    assert customer(reopened)["risk_score"] == 77
+    assert reopened.get_agent(AGENT)["status"] == "LOCKED"
+    assert reopened.get_agent(AGENT)["strikes"] == 3
+
+
+def test_exception_rolls_back_every_write(storage):
+    before_customer = customer(storage)
+    before_agent = storage.get_agent(AGENT)
+    with pytest.raises(Boom):
+        with storage.transaction():
+            storage.set_customer_status([UID], "BANNED", risk_score=100)
+            storage.set_agent_status(AGENT, "LOCKED", strikes=3)
+            storage.append_agent_history(AGENT, "rolled back")
+            storage.append_audit({"ts": 0, "batch_id": "b", "actor": "t", "op": "ban_customers"})
+            raise Boom()
+
+    assert customer(storage) == before_customer
+    assert storage.get_agent(AGENT) == before_agent
+    assert storage.get_audit() == []
+
+
+def test_nested_transaction_joins_the_outer_one(storage):
+    before = customer(storage)
+    with pytest.raises(Boom):
+        with storage.transaction():
+            with storage.transaction():
+                storage.set_risk_score([UID], 55)
+            # The inner block finished, but nothing is committed until the outer one does
+            raise Boom()
+    assert customer(storage) == before
+
+
+def test_reads_inside_a_transaction_see_its_own_writes(storage):
+    with pytest.raises(Boom):
+        with storage.transaction():
+            storage.set_risk_score([UID], 42)
+            assert customer(storage)["risk_score"] == 42
+            raise Boom()
+    assert customer(storage)["risk_score"] != 42
+
+
+def test_failed_transaction_leaves_the_next_one_working(storage):
+    with pytest.raises(Boom):
+        with storage.transaction():
+            storage.set_risk_score([UID], 1)
+            raise Boom()
+    with storage.transaction():
+        storage.set_risk_score([UID], 2)
+    assert customer(storage)["risk_score"] == 2
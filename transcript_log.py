@@ -0,0 +1,234 @@
+import gzip
+import json
+import os
+import threading
+from array import array
+
+import metrics
+from repository import BASE_DIR
+
+try:
+    import fcntl  # cross-process append lock (POSIX); threads are covered by our own locks
+except ImportError:
+    fcntl = None
+
+TRANSCRIPT_DIR = os.getenv("REGUFLOW_TRANSCRIPT_DIR", os.path.join(BASE_DIR, "transcripts"))
+SEGMENT_BYTES = int(os.getenv("REGUFLOW_TRANSCRIPT_SEGMENT_BYTES", str(1 << 20)))  # rotate at ~1 MB
+KEEP_UNCOMPRESSED = 2   # newest segments compact() leaves as plain text
+
+
+# ==========================================
+# SEGMENTED APPEND-ONLY TRANSCRIPT LOG
+# ==========================================
+# transcripts/<agent_id>/
+#     seg-00000001.log      one JSON-encoded line per record (newlines in messages stay escaped)
+#     seg-00000001.idx      start offset of every record, 8 bytes each (array "Q")
+#     seg-00000002.log.gz   compacted segment (index dropped - it is read whole)
+# Appends write one record + one index entry to the newest segment: O(1), no
+# rewrite of anything else. Tail reads seek straight to the Nth-from-last record.
+class TranscriptLog:
+    def __init__(self, base_dir=TRANSCRIPT_DIR, segment_bytes=SEGMENT_BYTES):
+        self.base_dir = base_dir
+        self.segment_bytes = segment_bytes
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._checked = set()  # active segments whose index was verified in this process
+
+    def _lock(self, agent_id):
+        with self._locks_lock:
+            return self._locks.setdefault(agent_id, threading.Lock())
+
+    def _dir(self, agent_id):
+        return os.path.join(self.base_dir, agent_id)
+
+    def segments(self, agent_id):
+        # [(number, path)] oldest first; compressed segments included
+        d = self._dir(agent_id)
+        if not os.path.isdir(d):
+            return []
+        segs = []
+        for name in os.listdir(d):
+            if name.startswith("seg-") and (name.endswith(".log") or name.endswith(".log.gz")):
+                segs.append((int(name[4:12]), os.path.join(d, name)))
+        return sorted(segs)
+
+    def _segment_path(self, agent_id, number):
+        return os.path.join(self._dir(agent_id), f"seg-{number:08d}.log")
+
+    def _active(self, agent_id):
+        # Newest plain segment, or a fresh one once it has reached segment_bytes
+        segs = self.segments(agent_id)
+        if not segs:
+            return self._segment_path(agent_id, 1)
+        number, path = segs[-1]
+        if path.endswith(".gz") or os.path.getsize(path) >= self.segment_bytes:
+            return self._segment_path(agent_id, number + 1)
+        return path
+
+    # --- INDEX ---
+    def _read_index(self, log_path):
+        offsets = array("Q")
+        try:
+            with open(log_path[:-4] + ".idx", "rb") as f:
+                offsets.frombytes(f.read())
+        except FileNotFoundError:
+            pass
+        return offsets
+
+    def _rebuild_index(self, log_path):
+        offsets, pos = array("Q"), 0
+        with open(log_path, "rb") as f:
+            for raw in f:
+                offsets.append(pos)
+                pos += len(raw)
+        with open(log_path[:-4] + ".idx", "wb") as f:
+            f.write(offsets.tobytes())
+        return offsets
+
+    def _verify_index(self, log_path):
+        # A crash between the record write and the index write leaves the index
+        # one entry short; re-derive it from the log the first time we touch it.
+        if log_path in self._checked or not os.path.exists(log_path):
+            return
+        offsets = self._read_index(log_path)
+        with open(log_path, "rb") as f:
+            f.seek(offsets[-1] if offsets else 0)
+            trailing = f.read().count(b"\n")
+        if trailing != (1 if offsets else 0):
+            self._rebuild_index(log_path)
+        self._checked.add(log_path)
+
+    # --- WRITES ---
+    def append(self, agent_id, line):
+        self.append_many(agent_id, [line])
+
+    def append_many(self, agent_id, lines):
+        if not lines:
+            return
+        records = [(json.dumps(line, ensure_ascii=False) + "\n").encode() for line in lines]
+        with self._lock(agent_id):
+            os.makedirs(self._dir(agent_id), exist_ok=True)
+            path = self._active(agent_id)
+            self._verify_index(path)
+            with open(path, "ab") as log, open(path[:-4] + ".idx", "ab") as idx:
+                if fcntl:
+                    fcntl.flock(log, fcntl.LOCK_EX)
+                try:
+                    pos = log.seek(0, os.SEEK_END)
+                    offsets = array("Q")
+                    for rec in records:
+                        offsets.append(pos)
+                        pos += len(rec)
+                    log.write(b"".join(records))
+                    log.flush()
+                    idx.write(offsets.tobytes())
+                finally:
+                    if fcntl:
+                        fcntl.flock(log, fcntl.LOCK_UN)
+            self._checked.add(path)
+        metrics.bytes_written("transcript", pos - offsets[0] + 8 * len(offsets))
+
+    def reset(self, agent_id):
+        # Drops the agent's whole log (used by the JSON -> SQLite re-import)
+        with self._lock(agent_id):
+            for _number, path in self.segments(agent_id):
+                os.remove(path)
+                if path.endswith(".log") and os.path.exists(path[:-4] + ".idx"):
+                    os.remove(path[:-4] + ".idx")
+
+    # --- READS ---
+    def _read_segment(self, path, start=0):
+        if path.endswith(".gz"):
+            with gzip.open(path, "rb") as f:
+                raws = f.read().splitlines()
+            return [json.loads(r) for r in raws[start:]]
+        offsets = self._read_index(path)
+        if start >= len(offsets):
+            return []
+        with open(path, "rb") as f:
+            f.seek(offsets[start])
+            return [json.loads(r) for r in f.read().splitlines()]
+
+    def _count(self, path):
+        if path.endswith(".gz"):
+            with gzip.open(path, "rb") as f:
+                return f.read().count(b"\n")
+        return len(self._read_index(path))
+
+    def tail(self, agent_id, n=200):
+        # Last n lines, oldest first. Walks segments newest -> oldest, touching
+        # only as many as needed; within a plain segment it seeks via the index.
+        with self._lock(agent_id):
+            segs = self.segments(agent_id)
+            if segs:
+                self._verify_index(segs[-1][1])
+            chunks, need = [], n
+            for _number, path in reversed(segs):
+                if need <= 0:
+                    break
+                count = self._count(path)
+                lines = self._read_segment(path, max(0, count - need))
+                chunks.append(lines)
+                need -= len(lines)
+        return [line for chunk in reversed(chunks) for line in chunk]
+
+    def iter_lines(self, agent_id):
+        # Whole history, oldest first, one segment in memory at a time
+        for _number, path in self.segments(agent_id):
+            yield from self._read_segment(path)
+
+    def version(self, agent_id):
+        # Changes on every append: newest segment number + its size
+        segs = self.segments(agent_id)
+        if not segs:
+            return "0-0"
+        number, path = segs[-1]
+        return f"{number}-{os.path.getsize(path)}"
+
+    def count(self, agent_id):
+        return sum(self._count(path) for _number, path in self.segments(agent_id))
+
+    def agents(self):
+        if not os.path.isdir(self.base_dir):
+            return []
+        return sorted(d for d in os.listdir(self.base_dir) if os.path.isdir(os.path.join(self.base_dir, d)))
+
+    # --- COMPACTION ---
+    def compact(self, agent_id, keep=KEEP_UNCOMPRESSED):
+        # gzip every closed segment except the newest `keep`; returns bytes saved
+        saved = 0
+        with self._lock(agent_id):
+            plain = [(n, p) for n, p in self.segments(agent_id) if p.endswith(".log")]
+            active = self._active(agent_id)
+            for _number, path in plain[:max(0, len(plain) - keep)]:
+                if path == active:
+                    continue
+                before = os.path.getsize(path)
+                with open(path, "rb") as src, gzip.open(path + ".gz.tmp", "wb") as dst:
+                    dst.write(src.read())
+                os.replace(path + ".gz.tmp", path + ".gz")
+                os.remove(path)
+                if os.path.exists(path[:-4] + ".idx"):
+                    os.remove(path[:-4] + ".idx")
+                saved += before - os.path.getsize(path + ".gz")
+        return saved
+
+
+# Shared instance (one per process)
+transcript_log = TranscriptLog()
+
+
+if __name__ == "__main__":
+    # python transcript_log.py tail <agent_id> [n]
+    # python transcript_log.py compact [agent_id]
+    import sys
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    if cmd == "tail" and len(sys.argv) > 2:
+        for line in transcript_log.tail(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 20):
+            print(line)
+    elif cmd == "compact":
+        targets = sys.argv[2:] or transcript_log.agents()
+        for aid in targets:
+            print(f"✅ {aid}: saved {transcript_log.compact(aid):,} bytes")
+    else:
+        print("Usage: python transcript_log.py tail <agent_id> [n] | compact [agent_id ...]")
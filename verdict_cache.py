@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from repository import BASE_DIR
+
+# Defaults (override with env vars; REGUFLOW_VERDICT_CACHE_DB="" keeps the cache in memory only)
+CACHE_SIZE = int(os.getenv("REGUFLOW_VERDICT_CACHE_SIZE", "10000"))
+CACHE_TTL = float(os.getenv("REGUFLOW_VERDICT_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_DB = os.getenv("REGUFLOW_VERDICT_CACHE_DB", os.path.join(BASE_DIR, "reguflow_verdicts.db"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_message(message):
+    # Canned responses differ only in case / spacing / trailing punctuation
+    text = unicodedata.normalize("NFKC", message or "").casefold()
+    return _WHITESPACE.sub(" ", text).strip().rstrip(".!? ")
+
+
+def judge_version(model, prompt):
+    # Any change to the prompt or the model yields a new version -> old entries never match
+    return hashlib.sha256(f"{model}\n{prompt}".encode()).hexdigest()[:16]
+
+
+# ==========================================
+# VERDICT CACHE (LRU + TTL, optional SQLite tier)
+# ==========================================
+class VerdictCache:
+    def __init__(self, version, max_size=CACHE_SIZE, ttl=CACHE_TTL, db_path=CACHE_DB):
+        self.version = version
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._mem = OrderedDict()  # key -> (stored_at, verdict)
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS verdicts ("
+                             "key TEXT PRIMARY KEY, version TEXT, stored_at REAL, verdict TEXT)")
+            # Entries from an older prompt/model can never hit again - drop them
+            self._db.execute("DELETE FROM verdicts WHERE version != ? OR stored_at < ?",
+                             (version, time.time() - ttl))
+
+    def key(self, message):
+        return hashlib.sha256(f"{self.version}\n{normalize_message(message)}".encode()).hexdigest()
+
+    def get(self, message):
+        key = self.key(message)
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                if now - hit[0] <= self.ttl:
+                    self._mem.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return dict(hit[1])
+                del self._mem[key]
+                self.stats["expired"] += 1
+
+            if self._db is not None:
+                row = self._db.execute("SELECT stored_at, verdict FROM verdicts WHERE key = ?", (key,)).fetchone()
+                if row and now - row[0] <= self.ttl:
+                    verdict = json.loads(row[1])
+                    self._remember(key, row[0], verdict)
+                    self.stats["disk_hits"] += 1
+                    return dict(verdict)
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, message, verdict):
+        key = self.key(message)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, dict(verdict))
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO verdicts(key, version, stored_at, verdict) VALUES (?, ?, ?, ?)",
+                                 (key, self.version, now, json.dumps(verdict)))
+
+    def _remember(self, key, stored_at, verdict):
+        self._mem[key] = (stored_at, verdict)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_size:
+            self._mem.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM verdicts")
+
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        return (self.stats["hits"] + self.stats["disk_hits"]) / lookups if lookups else 0.0